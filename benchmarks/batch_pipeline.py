@@ -0,0 +1,117 @@
+"""
+批量处理流水线基准测试
+模拟网络共享上的读写延迟（每次打开和保存图片前后等待固定时间），
+比较每个工作线程依次读取、处理、写出与三段流水线的总耗时，并打印流水线各阶段的利用率
+
+运行方式:
+    python -m benchmarks.batch_pipeline
+    python -m benchmarks.batch_pipeline --images 48 --read-latency 0.08 --write-latency 0.05 --read-workers 8
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+from watermark_processor import WatermarkProcessor
+from watermark_processor.pipeline import PIPELINE_READ_WORKERS, PIPELINE_WRITE_WORKERS
+from benchmarks.hot_paths import make_benchmark_image
+
+
+# 图片数量
+IMAGES = 32
+
+# 每张图片的大小（百万像素）
+MEGAPIXELS = 2
+
+# 模拟的读取和写出延迟（秒）
+READ_LATENCY = 0.05
+WRITE_LATENCY = 0.03
+
+
+class LatencyProcessor(WatermarkProcessor):
+    """在打开和保存图片时加入固定延迟，模拟慢速存储"""
+
+    def __init__(self, read_latency, write_latency):
+        super().__init__()
+        self.read_latency = read_latency
+        self.write_latency = write_latency
+
+    def open_image(self, image_path, use_cache=True, output_path=None):
+        time.sleep(self.read_latency)
+        return super().open_image(image_path, use_cache, output_path)
+
+    def _save_image(self, image, output_path, encode_profile=None, metadata=None):
+        success = super()._save_image(image, output_path, encode_profile, metadata)
+        time.sleep(self.write_latency)
+        return success
+
+
+def run_mode(image_paths, output_dir, pipeline, args):
+    """运行一次批量处理，返回耗时和流水线利用率"""
+    processor = LatencyProcessor(args.read_latency, args.write_latency)
+    # 每次都从磁盘解码，与首次处理一批新图片相同
+    processor.image_cache = None
+    if pipeline:
+        processor.read_workers = args.read_workers
+        processor.write_workers = args.write_workers
+    else:
+        processor.read_workers = processor.write_workers = 0
+
+    start = time.perf_counter()
+    results = processor.batch_add_text_watermark(image_paths, "© VisMark Benchmark", output_dir,
+                                                 font_size=48, font_color="#FFFFFF", opacity=60)
+    elapsed = time.perf_counter() - start
+    if not all(result.success for result in results):
+        raise RuntimeError("批量处理失败")
+    return elapsed, processor.pipeline_utilization
+
+
+def run(args):
+    """比较两种方式，返回结果字典"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        image_paths = []
+        sample = make_benchmark_image(args.megapixels)
+        for index in range(args.images):
+            path = os.path.join(temp_dir, f"sample_{index:03d}.jpg")
+            sample.save(path, quality=90)
+            image_paths.append(path)
+
+        results = {"images": args.images, "megapixels": args.megapixels, "cpu_count": os.cpu_count(),
+                   "read_latency": args.read_latency, "write_latency": args.write_latency}
+        for mode in ("sequential", "pipeline"):
+            elapsed, utilization = run_mode(image_paths, os.path.join(temp_dir, mode), mode == "pipeline", args)
+            results[mode] = {"seconds": round(elapsed, 3), "images_per_second": round(args.images / elapsed, 2),
+                             "utilization": utilization}
+            print(f"{mode:<12} {elapsed:>8.2f} s  {args.images / elapsed:>7.2f} 张/秒", flush=True)
+            if utilization:
+                for stage, item in utilization.items():
+                    print(f"    {stage:<8} 线程 {item['workers']:>2}  利用率 {item['utilization']:>5.0%}  "
+                          f"等待输入 {item['starved']:>7.2f} s  等待下游 {item['blocked']:>7.2f} s  "
+                          f"队列峰值 {item['peak_queue']}")
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量处理流水线基准测试")
+    parser.add_argument("--images", type=int, default=IMAGES, help="图片数量")
+    parser.add_argument("--megapixels", type=float, default=MEGAPIXELS, help="每张图片的大小（百万像素）")
+    parser.add_argument("--read-latency", type=float, default=READ_LATENCY, help="模拟的读取延迟（秒）")
+    parser.add_argument("--write-latency", type=float, default=WRITE_LATENCY, help="模拟的写出延迟（秒）")
+    parser.add_argument("--read-workers", type=int, default=PIPELINE_READ_WORKERS, help="流水线读取线程数")
+    parser.add_argument("--write-workers", type=int, default=PIPELINE_WRITE_WORKERS, help="流水线写出线程数")
+    parser.add_argument("--output", help="结果JSON文件路径")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已写入: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
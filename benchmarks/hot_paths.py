@@ -0,0 +1,218 @@
+"""
+水印处理热点路径基准测试
+在1MP、12MP、24MP和50MP的合成样例图片上测量各公开入口的耗时，
+结果写入JSON文件，便于在不同版本之间比较性能回归
+
+运行方式:
+    python -m benchmarks.hot_paths
+    python -m benchmarks.hot_paths --sizes 1 12 --cases text --output before.json
+    python -m benchmarks.hot_paths --output after.json --compare before.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+
+import PIL
+from PIL import Image, ImageDraw
+
+from benchmarks.encode_profiles import make_sample_image
+from watermark_processor import WatermarkProcessor
+
+
+# 样例图片大小（百万像素），宽高比为4:3
+SAMPLE_MEGAPIXELS = [1, 12, 24, 50]
+
+# 直接生成合成图片的最大像素数，更大的图片由其放大得到，避免生成时占用过多内存
+MAX_GENERATED_PIXELS = 12_000_000
+
+# 每项测试的默认重复次数
+REPEAT = 3
+
+# 与基准结果比较时，耗时增加超过该比例视为回归
+REGRESSION_THRESHOLD = 0.10
+
+
+def make_benchmark_image(megapixels):
+    """生成指定像素数（4:3）的合成样例图片"""
+    width = int(round((megapixels * 1_000_000 * 4 / 3) ** 0.5))
+    height = int(round(width * 3 / 4))
+    if width * height <= MAX_GENERATED_PIXELS:
+        return make_sample_image((width, height))
+    scale = (MAX_GENERATED_PIXELS / (width * height)) ** 0.5
+    sample = make_sample_image((int(width * scale), int(height * scale)))
+    return sample.resize((width, height), Image.BICUBIC)
+
+
+def make_logo(path):
+    """生成带透明通道的测试Logo"""
+    logo = Image.new("RGBA", (400, 200), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(logo)
+    for x in range(0, 400, 80):
+        draw.rectangle((x, 40, x + 39, 159), fill=(30, 90, 200, 255))
+    draw.ellipse((150, 20, 250, 180), fill=(200, 60, 30, 200))
+    logo.save(path)
+    return path
+
+
+def build_cases(logo_path, temp_dir):
+    """
+    构建测试项列表
+
+    每项为 (名称, 函数)，函数接收 (processor, image) 并执行一次被测操作。
+    DCT安全水印的提取目前无法还原嵌入的文字（只会走错误路径），暂不测量。
+    """
+    text = "© VisMark Benchmark"
+
+    def text_case(**kwargs):
+        options = {"font_size": 96, "font_color": "#FFFFFF", "position": "bottom-right", "opacity": 60}
+        options.update(kwargs)
+        return lambda processor, image: processor.add_text_watermark_to_image(image, text, **options)
+
+    def logo_case(**kwargs):
+        options = {"logo_size": 400, "position": "bottom-right", "opacity": 60}
+        options.update(kwargs)
+        return lambda processor, image: processor.add_logo_watermark_to_image(image, logo_path, **options)
+
+    def save_case(ext):
+        output_path = os.path.join(temp_dir, f"output{ext}")
+        return lambda processor, image: processor._save_image(image, output_path)
+
+    return [
+        ("text_plain", text_case()),
+        ("text_bold", text_case(bold=True)),
+        ("text_italic", text_case(italic=True)),
+        ("text_underline", text_case(underline=True)),
+        ("text_shadow", text_case(enable_shadow=True, shadow_opacity=40)),
+        ("text_full_cover", text_case(position="full_cover", font_size=48, rotation=30)),
+        ("text_scattered", text_case(scattered_watermark=True, font_size=48)),
+        ("text_texture", text_case(texture_watermark=True, font_size=48)),
+        ("text_invisible", text_case(invisible_watermark=True)),
+        ("logo_recolor_rotate", logo_case(recolor_color="#FF8800", rotation=30)),
+        ("logo_full_cover", logo_case(position="full_cover", logo_size=200)),
+        ("dct_embed", lambda processor, image:
+            processor.embed_security_watermark(image, text, "benchmark-key")),
+        ("save_jpg", save_case(".jpg")),
+        ("save_png", save_case(".png")),
+        ("save_webp", save_case(".webp")),
+        ("save_tiff", save_case(".tiff")),
+    ]
+
+
+def clear_caches(processor):
+    """清空处理器的覆盖层和纹理块缓存，保证每次测量的都是完整渲染"""
+    processor.overlay_cache.clear()
+    processor._scatter_tile_cache.clear()
+    processor._texture_tile_cache.clear()
+
+
+def time_case(func, processor, image, repeat):
+    """多次执行测试项，返回每次的耗时（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        clear_caches(processor)
+        start = time.perf_counter()
+        func(processor, image)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def get_git_revision():
+    """获取当前代码的git提交，非git环境时返回None"""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(megapixels_list, case_filter=None, repeat=REPEAT):
+    """运行基准测试，返回可写入JSON的结果字典"""
+    processor = WatermarkProcessor()
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        logo_path = make_logo(os.path.join(temp_dir, "logo.png"))
+        cases = [(name, func) for name, func in build_cases(logo_path, temp_dir)
+                 if not case_filter or any(pattern in name for pattern in case_filter)]
+
+        for megapixels in megapixels_list:
+            image = make_benchmark_image(megapixels)
+            for name, func in cases:
+                timings = time_case(func, processor, image, repeat)
+                result = {
+                    "case": name,
+                    "megapixels": megapixels,
+                    "size": list(image.size),
+                    "repeat": repeat,
+                    "best_ms": round(min(timings), 2),
+                    "median_ms": round(statistics.median(timings), 2),
+                }
+                results.append(result)
+                print(f"{name:<22} {megapixels:>3}MP  best {result['best_ms']:>10.1f} ms  "
+                      f"median {result['median_ms']:>10.1f} ms", flush=True)
+
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": get_git_revision(),
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """与基准结果比较最短耗时，打印变化比例，返回回归的测试项数量"""
+    baseline_results = {(item["case"], item["megapixels"]): item for item in baseline["results"]}
+    regressions = 0
+    print(f"\n与基准 {baseline['meta'].get('git_revision')} 比较（最短耗时）:")
+    for item in current["results"]:
+        old = baseline_results.get((item["case"], item["megapixels"]))
+        if not old or not old["best_ms"]:
+            continue
+        ratio = item["best_ms"] / old["best_ms"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  <- 回归"
+            regressions += 1
+        print(f"{item['case']:<22} {item['megapixels']:>3}MP  {old['best_ms']:>10.1f} -> "
+              f"{item['best_ms']:>10.1f} ms  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="水印处理热点路径基准测试")
+    parser.add_argument("--sizes", type=float, nargs="+", default=SAMPLE_MEGAPIXELS,
+                        help="样例图片大小（百万像素）")
+    parser.add_argument("--cases", nargs="+", help="只运行名称包含这些字符串的测试项")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="每项测试的重复次数")
+    parser.add_argument("--output", default="benchmark_hot_paths.json", help="结果JSON文件路径")
+    parser.add_argument("--compare", help="用于比较的基准结果JSON文件")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) if size == int(size) else size for size in args.sizes]
+    current = run(sizes, args.cases, args.repeat)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2, ensure_ascii=False)
+    print(f"\n结果已写入: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(current, baseline):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
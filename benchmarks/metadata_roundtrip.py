@@ -0,0 +1,104 @@
+"""
+源图片元数据往返检查
+用带EXIF和DPI的TIFF源图片添加文字和Logo水印，保存为TIFF、PNG和JPEG后重新打开，
+检查输出文件可以完整解码、尺寸不变，EXIF标签和DPI被保留，
+且ICC配置文件的色彩空间与输出的颜色模式一致（CMYK源图片输出RGB时不能带有CMYK配置文件）
+
+运行方式:
+    python -m benchmarks.metadata_roundtrip
+"""
+
+import os
+import sys
+import tempfile
+from PIL import Image, ImageCms
+
+from watermark_processor import WatermarkProcessor
+from watermark_processor.base_processor import ICC_COLOR_SPACES
+
+
+# 源图片的颜色模式
+SOURCE_MODES = ["L", "RGB", "RGBA", "CMYK"]
+
+# 输出格式
+OUTPUT_FORMATS = [".tif", ".png", ".jpg"]
+
+# 样例图片尺寸，宽高不同，输出沿用源文件尺寸标签时可以发现
+SAMPLE_SIZE = (555, 777)
+
+# 写入源图片的EXIF标签：Artist
+EXIF_ARTIST = 0x013B
+ARTIST = "VisMark"
+
+# 源图片DPI
+DPI = (300, 300)
+
+
+def make_icc_profile(mode):
+    """生成色彩空间与颜色模式一致的ICC配置文件（在sRGB配置文件上改写文件头中的色彩空间）"""
+    profile = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+    return profile[:16] + ICC_COLOR_SPACES[mode] + profile[20:]
+
+
+def make_source(path, mode):
+    """生成带EXIF、DPI和ICC配置文件的TIFF源图片"""
+    image = Image.radial_gradient("L").resize(SAMPLE_SIZE).convert(mode)
+    exif = Image.Exif()
+    exif[EXIF_ARTIST] = ARTIST
+    image.save(path, exif=exif, dpi=DPI, icc_profile=make_icc_profile(mode))
+    return path
+
+
+def make_logo(path):
+    """生成半透明的Logo图片"""
+    logo = Image.new("RGBA", (120, 60), (255, 64, 0, 160))
+    logo.save(path)
+    return path
+
+
+def check_output(output_path):
+    """重新打开输出文件，返回发现的问题列表"""
+    problems = []
+    try:
+        with Image.open(output_path) as image:
+            image.load()
+            if image.size != SAMPLE_SIZE:
+                problems.append(f"尺寸为{image.size}")
+            if image.getexif().get(EXIF_ARTIST) != ARTIST:
+                problems.append("EXIF标签丢失")
+            dpi = image.info.get("dpi")
+            if output_path.endswith((".tif", ".jpg")) and (dpi is None or tuple(round(v) for v in dpi) != DPI):
+                problems.append(f"DPI为{dpi}")
+            icc_profile = image.info.get("icc_profile")
+            if icc_profile and icc_profile[16:20] != ICC_COLOR_SPACES.get(image.mode, icc_profile[16:20]):
+                problems.append(f"{image.mode}图片带有{icc_profile[16:20].decode().strip()}配置文件")
+    except Exception as e:
+        problems.append(f"无法读取: {e}")
+    return problems
+
+
+def run():
+    """运行全部组合并打印结果，返回失败的数量"""
+    processor = WatermarkProcessor()
+    failures = 0
+    with tempfile.TemporaryDirectory() as temp_dir:
+        logo_path = make_logo(os.path.join(temp_dir, "logo.png"))
+        for mode in SOURCE_MODES:
+            source_path = make_source(os.path.join(temp_dir, f"source_{mode}.tif"), mode)
+            for ext in OUTPUT_FORMATS:
+                for kind in ("text", "logo"):
+                    output_path = os.path.join(temp_dir, f"{kind}_{mode}{ext}")
+                    if kind == "text":
+                        success = processor.add_text_watermark(source_path, "© VisMark", output_path,
+                                                               font_size=48, font_color="#FFFFFF")
+                    else:
+                        success = processor.add_logo_watermark(source_path, logo_path, output_path)
+                    problems = check_output(output_path) if success else ["处理失败"]
+                    failures += bool(problems)
+                    status = "通过" if not problems else "失败: " + "，".join(problems)
+                    print(f"{mode:<5} -> {ext:<5} {kind:<5} {status}")
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if run() else 0)
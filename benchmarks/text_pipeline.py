@@ -0,0 +1,152 @@
+"""
+文字水印处理流程的内存与耗时基准测试
+从文件读取、添加水印到写出文件，测量每种水印的峰值内存增量和耗时。
+每项测试在独立的子进程中运行，峰值内存互不影响；
+峰值增量同时折算为整图RGB帧数，反映处理过程中整图大小的副本数量
+
+运行方式:
+    python -m benchmarks.text_pipeline
+    python -m benchmarks.text_pipeline --megapixels 24 --cases text_plain text_texture --output pipeline.json
+    python -m benchmarks.text_pipeline --source tif --output-ext .tif
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+import tempfile
+
+from PIL import Image
+
+
+# 样例图片大小（百万像素）
+MEGAPIXELS = 24
+
+# 每项测试的重复次数，取最短耗时
+REPEAT = 3
+
+# 源图片格式：扩展名 -> (颜色模式, 保存参数)；tif为未压缩RGBA TIFF，可以内存映射
+SOURCES = {
+    "jpg": ("RGB", {"quality": 95}),
+    "tif": ("RGBA", {}),
+}
+
+# 测试项：名称 -> add_text_watermark/add_logo_watermark的关键字参数
+CASES = {
+    "text_plain": {"position": "bottom-right"},
+    "text_full_cover": {"position": "full_cover", "font_size": 48, "rotation": 30},
+    "text_scattered": {"scattered_watermark": True, "font_size": 48},
+    "text_invisible": {"invisible_watermark": True},
+    "text_texture": {"texture_watermark": True, "font_size": 48},
+    "logo_corner": {"logo": True, "position": "bottom-right", "logo_size": 200},
+    "logo_full_cover": {"logo": True, "position": "full_cover", "logo_size": 200},
+}
+
+
+def get_peak_rss():
+    """当前进程的峰值常驻内存（字节）"""
+    # Linux上ru_maxrss会继承exec之前父进程的峰值，优先读取本进程的VmHWM
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux上单位为KB，macOS上为字节
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_case(case, image_path, output_path, logo_path, repeat):
+    """在子进程中运行单项测试，返回耗时和峰值内存增量"""
+    from watermark_processor import WatermarkProcessor
+    from benchmarks.hot_paths import clear_caches
+
+    processor = WatermarkProcessor()
+    options = dict(CASES[case])
+    if options.pop("logo", False):
+        call = lambda: processor.add_logo_watermark(image_path, logo_path, output_path, **options)
+    else:
+        options.setdefault("font_size", 96)
+        call = lambda: processor.add_text_watermark(image_path, "© VisMark Benchmark", output_path,
+                                                    font_color="#FFFFFF", opacity=60, **options)
+
+    baseline = get_peak_rss()
+    timings = []
+    for _ in range(repeat):
+        clear_caches(processor)
+        start = time.perf_counter()
+        if not call():
+            raise RuntimeError(f"{case} 处理失败")
+        timings.append((time.perf_counter() - start) * 1000)
+    return {"best_ms": round(min(timings), 2), "peak_delta_bytes": get_peak_rss() - baseline}
+
+
+def run(megapixels=MEGAPIXELS, case_filter=None, repeat=REPEAT, source="jpg", output_ext=".jpg"):
+    """运行所有测试项，返回结果列表"""
+    from benchmarks.hot_paths import make_benchmark_image, make_logo
+
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        image = make_benchmark_image(megapixels)
+        mode, save_kwargs = SOURCES[source]
+        image_path = os.path.join(temp_dir, f"sample.{source}")
+        image.convert(mode).save(image_path, **save_kwargs)
+        frame_bytes = image.width * image.height * 3
+        del image
+        logo_path = make_logo(os.path.join(temp_dir, "logo.png"))
+
+        for case in CASES:
+            if case_filter and not any(pattern in case for pattern in case_filter):
+                continue
+            output_path = os.path.join(temp_dir, case + output_ext)
+            child = subprocess.run(
+                [sys.executable, "-m", "benchmarks.text_pipeline", "--child", case,
+                 image_path, output_path, logo_path, "--repeat", str(repeat)],
+                capture_output=True, text=True, check=True)
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            result.update({
+                "case": case,
+                "megapixels": megapixels,
+                "source": source,
+                "output_ext": output_ext,
+                "peak_delta_mb": round(result["peak_delta_bytes"] / 1024 / 1024, 1),
+                "rgb_frames": round(result["peak_delta_bytes"] / frame_bytes, 2),
+            })
+            results.append(result)
+            print(f"{case:<18} {megapixels:>3}MP  best {result['best_ms']:>9.1f} ms  "
+                  f"peak +{result['peak_delta_mb']:>8.1f} MB  ({result['rgb_frames']:.2f} RGB帧)", flush=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="文字水印处理流程的内存与耗时基准测试")
+    parser.add_argument("--megapixels", type=float, default=MEGAPIXELS, help="样例图片大小（百万像素）")
+    parser.add_argument("--cases", nargs="+", help="只运行名称包含这些字符串的测试项")
+    parser.add_argument("--source", choices=sorted(SOURCES), default="jpg", help="源图片格式")
+    parser.add_argument("--output-ext", default=".jpg", help="输出文件扩展名")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="每项测试的重复次数")
+    parser.add_argument("--output", help="结果JSON文件路径")
+    parser.add_argument("--child", nargs=4, metavar=("CASE", "IMAGE", "OUTPUT", "LOGO"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        Image.MAX_IMAGE_PIXELS = None
+        print(json.dumps(run_case(*args.child, args.repeat)))
+        return 0
+
+    megapixels = int(args.megapixels) if args.megapixels == int(args.megapixels) else args.megapixels
+    results = run(megapixels, args.cases, args.repeat, args.source, args.output_ext)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已写入: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
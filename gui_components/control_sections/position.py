@@ -47,7 +47,8 @@ class PositionSection:
             "bottom": "底部居中",
             "bottom-right": "右下角",
             "full_cover": "覆盖全图",
-            "custom": "自定义位置"
+            "custom": "自定义位置",
+            "smart": "逐张智能放置"
         }
         
         # 创建9宫格按钮布局
@@ -104,6 +105,16 @@ class PositionSection:
         custom_btn.pack(side="left", padx=5, pady=5)
         self.position_buttons["custom"] = custom_btn
         
+        # 逐张智能放置按钮（批量处理时为每张图片单独计算位置）
+        smart_btn = tk.Button(special_frame, text="逐张智能", 
+                            font=("黑体", 10), width=10, height=1,
+                            bg="#e0e0e0", fg="black",
+                            activebackground="#d0d0d0", activeforeground="black",
+                            relief="solid", bd=1,
+                            command=lambda: self._select_position("smart"))
+        smart_btn.pack(side="left", padx=5, pady=5)
+        self.position_buttons["smart"] = smart_btn
+        
         # 位置显示标签
         self.position_label = tk.Label(position_frame, text="当前位置：居中", 
                                      bg="#f5f5f5", font=("黑体", 10))
@@ -170,7 +181,7 @@ class PositionSection:
             "top-left": "左上角", "top": "顶部居中", "top-right": "右上角",
             "left": "左侧居中", "center": "居中", "right": "右侧居中",
             "bottom-left": "左下角", "bottom": "底部居中", "bottom-right": "右下角",
-            "full_cover": "覆盖全图", "custom": "自定义位置"
+            "full_cover": "覆盖全图", "custom": "自定义位置", "smart": "逐张智能放置"
         }
         self.position_label.config(text=f"当前位置：{position_names.get(position, position)}")
         
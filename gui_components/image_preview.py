@@ -9,6 +9,8 @@ class ImagePreview:
     def __init__(self, parent, gui):
         self.parent = parent
         self.gui = gui
+        # 原图缩放帧缓存，源图片和Canvas尺寸不变时无需重新缩放
+        self._original_frame = None
         self.create_image_preview()
     
     def create_image_preview(self):
@@ -55,19 +57,30 @@ class ImagePreview:
         self.display_image(self.watermarked_canvas, blank_image)
     
     def display_original_image(self, image):
-        """显示原始图片"""
-        self.display_image(self.original_canvas, image)
+        """显示原始图片（源图片和Canvas尺寸未变化时跳过重绘）"""
+        canvas = self.original_canvas
+        frame = self._get_original_frame(image, self._get_canvas_size(canvas))
+        if getattr(canvas, "current_frame", None) is frame:
+            return
+        self._draw_frame(canvas, frame)
     
     def display_watermarked_image(self, image):
         """显示水印图片"""
-        self.display_image(self.watermarked_canvas, image)
+        canvas = self.watermarked_canvas
+        canvas_size = self._get_canvas_size(canvas)
+        if image is self.gui.original_image:
+            # 显示的是原图（如清除水印），复用原图的缩放帧
+            frame = self._get_original_frame(image, canvas_size)
+        else:
+            frame = self._build_frame(image, canvas_size)
+        self._draw_frame(canvas, frame)
     
     def display_image(self, canvas, image):
         """在Canvas上显示图片"""
-        # 清除Canvas内容
-        canvas.delete("all")
-        
-        # 获取Canvas大小
+        self._draw_frame(canvas, self._build_frame(image, self._get_canvas_size(canvas)))
+    
+    def _get_canvas_size(self, canvas):
+        """获取Canvas大小"""
         canvas_width = canvas.winfo_width()
         canvas_height = canvas.winfo_height()
         
@@ -76,6 +89,20 @@ class ImagePreview:
             # 使用默认尺寸
             canvas_width = 800
             canvas_height = 600
+        return canvas_width, canvas_height
+    
+    def _get_original_frame(self, image, canvas_size):
+        """获取原图的缩放帧，只有源图片或Canvas尺寸变化时才重新生成"""
+        frame = self._original_frame
+        if frame is None or frame["source"] is not image or frame["canvas_size"] != canvas_size:
+            frame = self._build_frame(image, canvas_size)
+            frame["source"] = image
+            self._original_frame = frame
+        return frame
+    
+    def _build_frame(self, image, canvas_size):
+        """生成适应Canvas大小的显示帧（缩放后的图片和PhotoImage）"""
+        canvas_width, canvas_height = canvas_size
         
         # 计算图片大小（保持宽高比）
         img_width, img_height = image.size
@@ -83,6 +110,7 @@ class ImagePreview:
         if img_width <= canvas_width and img_height <= canvas_height:
             # 图片小于Canvas，直接显示
             display_image = image
+            scale = 1.0
         else:
             # 缩放图片以适应Canvas
             scale = min(canvas_width / img_width, canvas_height / img_height)
@@ -97,27 +125,34 @@ class ImagePreview:
         x = (canvas_width - display_image.width) // 2
         y = (canvas_height - display_image.height) // 2
         
-        # 转换为Tkinter兼容的图像
-        tk_image = ImageTk.PhotoImage(display_image)
+        return {
+            "source": None,
+            "canvas_size": canvas_size,
+            # 转换为Tkinter兼容的图像
+            "tk_image": ImageTk.PhotoImage(display_image),
+            "image_info": {
+                "original_size": (img_width, img_height),
+                "display_size": (display_image.width, display_image.height),
+                "position": (x, y),
+                "scale": scale
+            }
+        }
+    
+    def _draw_frame(self, canvas, frame):
+        """将显示帧绘制到Canvas上"""
+        # 清除Canvas内容
+        canvas.delete("all")
         
         # 保存图像引用（避免被垃圾回收）
-        canvas.tk_image = tk_image
+        canvas.tk_image = frame["tk_image"]
+        canvas.current_frame = frame
         
         # 显示图像
-        canvas.create_image(x, y, anchor="nw", image=tk_image)
+        x, y = frame["image_info"]["position"]
+        canvas.create_image(x, y, anchor="nw", image=frame["tk_image"])
         
         # 保存图片相关信息到canvas
-        # 如果图片小于Canvas，scale设为1
-        scale = getattr(canvas.image_info, "scale", 1.0) if hasattr(canvas, "image_info") else 1.0
-        if img_width > canvas_width or img_height > canvas_height:
-            scale = min(canvas_width / img_width, canvas_height / img_height)
-        
-        canvas.image_info = {
-            "original_size": (img_width, img_height),
-            "display_size": (display_image.width, display_image.height),
-            "position": (x, y),
-            "scale": scale
-        }
+        canvas.image_info = frame["image_info"]
         
         # 添加鼠标事件监听器（仅当选择了自定义位置时）
         if hasattr(self.gui, 'watermark_position') and self.gui.watermark_position == "custom":
@@ -62,6 +62,25 @@ class MenuBar:
         tools_menu.add_command(label="水印设置 F2", command=self.show_watermark_settings)
         tools_menu.add_command(label="批量处理向导 Ctrl+B", command=self.gui.batch_process)
         
+        # 批量输出编码配置子菜单
+        encode_menu = tk.Menu(tools_menu, tearoff=0,
+                            bg=COLORS['background_light'], fg=COLORS['text_primary'],
+                            activebackground=COLORS['primary_light'], activeforeground=COLORS['background_light'])
+        tools_menu.add_cascade(label="批量输出编码", menu=encode_menu)
+        encode_menu.add_radiobutton(label="快速（编码最快）", variable=self.gui.encode_profile_var, value="fast")
+        encode_menu.add_radiobutton(label="均衡（默认）", variable=self.gui.encode_profile_var, value="balanced")
+        encode_menu.add_radiobutton(label="最小体积（编码最慢）", variable=self.gui.encode_profile_var, value="smallest")
+        
+        # 批量输出命名模板子菜单
+        naming_menu = tk.Menu(tools_menu, tearoff=0,
+                            bg=COLORS['background_light'], fg=COLORS['text_primary'],
+                            activebackground=COLORS['primary_light'], activeforeground=COLORS['background_light'])
+        tools_menu.add_cascade(label="批量输出命名", menu=naming_menu)
+        naming_menu.add_radiobutton(label="原文件名（重名追加序号）", variable=self.gui.naming_var, value="stem")
+        naming_menu.add_radiobutton(label="保留源目录结构", variable=self.gui.naming_var, value="mirror")
+        naming_menu.add_radiobutton(label="文件名+路径哈希", variable=self.gui.naming_var, value="hash")
+        tools_menu.add_checkbutton(label="增量批量处理（跳过未变化的图片）", variable=self.gui.incremental_var)
+        
         # 帮助菜单
         help_menu = tk.Menu(menu_bar, tearoff=0,
                           bg=COLORS['background_light'], fg=COLORS['text_primary'],
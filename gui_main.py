@@ -2,8 +2,14 @@ import tkinter as tk
 from tkinter import ttk, filedialog, colorchooser, messagebox
 from PIL import Image
 from watermark_processor.watermark_processor import WatermarkProcessor
-from utils import DEFAULT_CONFIG, validate_color
+from watermark_processor.watermark_style import WatermarkStyle, TextStyle, LogoStyle, ShadowStyle, SecurityStyle
+from watermark_processor.base_processor import DEFAULT_SEED
+from watermark_processor.events import configure_logging
+from utils import DEFAULT_CONFIG, validate_color, cleanup_temp_dirs
 import os
+import uuid
+import errno
+import shutil
 
 from gui_components.menu_bar import MenuBar
 from gui_components.toolbar import Toolbar
@@ -18,9 +24,15 @@ class WatermarkGUI:
     def __init__(self, root):
         self.root = root
         self.watermark_processor = WatermarkProcessor()
+        self.watermark_processor.memory_budget = DEFAULT_CONFIG["batch_memory_budget_mb"] * 1024 * 1024
+        self.watermark_processor.read_workers = DEFAULT_CONFIG["batch_read_workers"]
+        self.watermark_processor.write_workers = DEFAULT_CONFIG["batch_write_workers"]
+        # 预览、切换批量图片和重新批量处理共用解码缓存，调整参数时不再重复读取磁盘
+        self.watermark_processor.image_cache.set_max_bytes(DEFAULT_CONFIG["decode_cache_mb"] * 1024 * 1024)
         
         # 初始化变量
         self.original_image = None
+        self.original_metadata = None  # 原图的格式、EXIF、ICC和DPI信息
         self.watermarked_image = None
         self.logo_path = None
         
@@ -32,6 +44,7 @@ class WatermarkGUI:
         self.batch_images = []  # 存储批量处理的图片路径列表
         self.current_batch_index = 0  # 当前预览的图片索引
         self.batch_output_dir = None  # 批量处理输出目录
+        self.batch_direct_output_dir = None  # 直接输出模式下的目标目录，为None时先输出到临时目录
         
         # 初始化所有必要的变量，避免后续引用错误
         self._initialize_gui_variables()
@@ -103,6 +116,18 @@ class WatermarkGUI:
         # 操作范围相关
         self.operation_scope = tk.StringVar(value="single")
         
+        # 批量输出编码配置（fast、balanced、smallest）
+        self.encode_profile_var = tk.StringVar(value=DEFAULT_CONFIG["default_encode_profile"])
+        
+        # 批量输出命名模板（stem、mirror、hash）
+        self.naming_var = tk.StringVar(value=DEFAULT_CONFIG["default_naming"])
+        
+        # 直接输出模式下是否增量处理（跳过已是最新的输出）
+        self.incremental_var = tk.BooleanVar(value=DEFAULT_CONFIG["batch_incremental"])
+        
+        # 分散和纹理水印的样式种子，随样式文件保存和加载
+        self.watermark_seed = DEFAULT_SEED
+        
         # UI组件引用（避免hasattr检查）
         self.color_entry = None
         self.color_button = None
@@ -168,12 +193,12 @@ class WatermarkGUI:
         
         if file_path:
             try:
-                # 打开图片并确保转换为RGB模式
-                image = Image.open(file_path)
-                if image.mode not in ('RGB', 'RGBA'):
-                    self.original_image = image.convert("RGB")
-                else:
-                    self.original_image = image.copy().convert("RGB")
+                # 打开图片（应用EXIF方向并读取元数据）并确保转换为RGB模式；
+                # open_image返回的是解码缓存的副本，RGB图片无需再复制
+                image, self.original_metadata = self.watermark_processor.open_image(file_path)
+                if image.mode != 'RGB':
+                    image = image.convert("RGB")
+                self.original_image = image
                 
                 self.image_preview.display_original_image(self.original_image)
                 self.update_preview()
@@ -270,10 +295,8 @@ class WatermarkGUI:
         # 如果用户选择了"所有图片"且有批量图片加载
         if hasattr(self, 'operation_scope') and self.operation_scope.get() == "all" and hasattr(self, 'batch_images') and self.batch_images:
             try:
-                # 创建临时目录用于存储重新处理的结果
-                import tempfile
-                temp_dir = tempfile.mkdtemp()
-                output_dir = temp_dir
+                # 获取输出目录（直接输出模式下写入目标目录）
+                output_dir = self._create_batch_output_dir()
                 
                 # 收集所有原始图片路径
                 original_paths = [original_path for original_path, _ in self.batch_images]
@@ -299,6 +322,7 @@ class WatermarkGUI:
                         scattered_watermark=self.scattered_watermark_var.get(),
                         invisible_watermark=self.invisible_watermark_var.get(),
                         texture_watermark=self.texture_watermark_var.get(),
+                        seed=self.watermark_seed,
                         enable_shadow=self.shadow_enable_var.get(),
                         shadow_color=self.shadow_color,
                         shadow_offset_x=self.shadow_offset_x_var.get(),
@@ -306,7 +330,9 @@ class WatermarkGUI:
                         shadow_opacity=self.shadow_opacity_var.get(),
                         security_watermark=self.security_watermark_var.get(),
                         security_key=self.security_key_entry.get() if hasattr(self, 'security_key_entry') and self.security_key_entry is not None else "watermark123",
-                        security_strength=self.security_strength_var.get()
+                        security_strength=self.security_strength_var.get(),
+                        encode_profile=self.encode_profile_var.get(),
+                        naming=self.naming_var.get()
                     )
                 elif self.watermark_type.get() == "logo":
                     if not self.logo_path:
@@ -326,7 +352,9 @@ class WatermarkGUI:
                         self.control_panel.rotation_var.get(),
                         self.control_panel.flip_horizontal.get(),
                         self.control_panel.flip_vertical.get(),
-                        recolor_color
+                        recolor_color,
+                        encode_profile=self.encode_profile_var.get(),
+                        naming=self.naming_var.get()
                     )
 
                 
@@ -335,6 +363,7 @@ class WatermarkGUI:
                 for original_path, output_path, success in result:
                     if success:
                         self.batch_images.append((original_path, output_path))
+                self.batch_output_dir = output_dir
                 
             except Exception as e:
                 messagebox.showerror("错误", f"批量应用水印失败: {str(e)}")
@@ -408,7 +437,8 @@ class WatermarkGUI:
                 # 添加水印功能参数
                 scattered_watermark=not normal_watermark and scattered_watermark,
                 invisible_watermark=not normal_watermark and invisible_watermark,
-                texture_watermark=not normal_watermark and texture_watermark
+                texture_watermark=not normal_watermark and texture_watermark,
+                seed=self.watermark_seed
             )
         elif hasattr(self, 'watermark_type') and self.watermark_type.get() == "logo":
             if hasattr(self, 'logo_path') and self.logo_path:
@@ -621,17 +651,35 @@ class WatermarkGUI:
                     return
                 
                 # 保存所有图片
-                import shutil
                 success_count = 0
                 saved_paths = []
                 for original_path, temp_path in self.batch_images:
                     try:
-                        # 获取原始文件名
-                        filename = os.path.basename(original_path)
-                        output_path = os.path.join(output_dir, filename)
+                        # 沿用批量处理时分配的相对路径，同名文件不会互相覆盖
+                        relative_path = os.path.basename(temp_path)
+                        if self.batch_output_dir:
+                            batch_relative_path = os.path.relpath(temp_path, self.batch_output_dir)
+                            if not batch_relative_path.startswith(os.pardir):
+                                relative_path = batch_relative_path
+                        output_path = os.path.join(output_dir, relative_path)
+                        os.makedirs(os.path.dirname(output_path), exist_ok=True)
                         
-                        # 复制文件到目标目录
-                        shutil.copy2(temp_path, output_path)
+                        if os.path.abspath(temp_path) == os.path.abspath(output_path):
+                            # 直接输出模式下结果已在目标位置
+                            pass
+                        elif self._is_in_temp_dir(temp_path):
+                            # 临时结果直接移动到目标目录，与_save_image一样用os.replace覆盖已有文件；
+                            # 临时目录与目标目录不在同一文件系统时改为复制
+                            try:
+                                os.replace(temp_path, output_path)
+                            except OSError as e:
+                                if e.errno != errno.EXDEV:
+                                    raise
+                                shutil.copy2(temp_path, output_path)
+                                os.remove(temp_path)
+                        else:
+                            # 复制文件到目标目录
+                            shutil.copy2(temp_path, output_path)
                         success_count += 1
                         saved_paths.append((original_path, output_path))
                     except Exception as e:
@@ -662,31 +710,12 @@ class WatermarkGUI:
                 if not file_path:
                     return
                 
-                try:
-                    # 获取文件扩展名
-                    ext = os.path.splitext(file_path)[1].lower()
-                    
-                    # 根据扩展名选择保存格式
-                    if ext in [".jpg", ".jpeg"]:
-                        # JPEG格式不支持透明度，需要转换为RGB
-                        if self.watermarked_image.mode in ["RGBA", "LA"]:
-                            self.watermarked_image = self.watermarked_image.convert("RGB")
-                        self.watermarked_image.save(file_path, "JPEG", quality=95)
-                    elif ext == ".png":
-                        self.watermarked_image.save(file_path, "PNG")
-                    elif ext == ".bmp":
-                        self.watermarked_image.save(file_path, "BMP")
-                    elif ext in [".gif", ".tif", ".tiff"]:
-                        self.watermarked_image.save(file_path)
-                    else:
-                        # 默认保存为JPEG
-                        if self.watermarked_image.mode in ["RGBA", "LA"]:
-                            self.watermarked_image = self.watermarked_image.convert("RGB")
-                        self.watermarked_image.save(file_path, "JPEG", quality=95)
-                    
+                # 按扩展名选择格式保存，并保留原图的EXIF、ICC和DPI
+                if self.watermark_processor.save_image(self.watermarked_image, file_path,
+                                                       self.encode_profile_var.get(), self.original_metadata):
                     messagebox.showinfo("成功", "图片保存成功")
-                except Exception as e:
-                    messagebox.showerror("错误", f"保存图片失败: {str(e)}")
+                else:
+                    messagebox.showerror("错误", "保存图片失败")
         else:  # 单张图片保存
             # 选择保存路径和格式
             file_path = filedialog.asksaveasfilename(
@@ -706,31 +735,12 @@ class WatermarkGUI:
             if not file_path:
                 return
             
-            try:
-                # 获取文件扩展名
-                ext = os.path.splitext(file_path)[1].lower()
-                
-                # 根据扩展名选择保存格式
-                if ext in [".jpg", ".jpeg"]:
-                    # JPEG格式不支持透明度，需要转换为RGB
-                    if self.watermarked_image.mode in ["RGBA", "LA"]:
-                        self.watermarked_image = self.watermarked_image.convert("RGB")
-                    self.watermarked_image.save(file_path, "JPEG", quality=95)
-                elif ext == ".png":
-                    self.watermarked_image.save(file_path, "PNG")
-                elif ext == ".bmp":
-                    self.watermarked_image.save(file_path, "BMP")
-                elif ext in [".gif", ".tif", ".tiff"]:
-                    self.watermarked_image.save(file_path)
-                else:
-                    # 默认保存为JPEG
-                    if self.watermarked_image.mode in ["RGBA", "LA"]:
-                        self.watermarked_image = self.watermarked_image.convert("RGB")
-                    self.watermarked_image.save(file_path, "JPEG", quality=95)
-                
+            # 按扩展名选择格式保存，并保留原图的EXIF、ICC和DPI
+            if self.watermark_processor.save_image(self.watermarked_image, file_path,
+                                                   self.encode_profile_var.get(), self.original_metadata):
                 messagebox.showinfo("成功", "图片保存成功")
-            except Exception as e:
-                messagebox.showerror("错误", f"保存图片失败: {str(e)}")
+            else:
+                messagebox.showerror("错误", "保存图片失败")
     
     def load_first_batch_image(self, result, output_dir):
         """加载批量处理后的第一张图片"""
@@ -760,12 +770,11 @@ class WatermarkGUI:
         original_path, output_path = self.batch_images[index]
         
         try:
-            # 加载原始图片和处理后的图片
-            self.original_image = Image.open(original_path)
-            self.watermarked_image = Image.open(output_path)
+            # 加载原始图片和处理后的图片，来回切换时从解码缓存读取
+            self.original_image, self.original_metadata = self.watermark_processor.open_image(original_path)
+            self.watermarked_image, _ = self.watermark_processor.open_image(output_path)
             
-            # 显示原始图片和处理后的图片
-            self.image_preview.display_original_image(self.original_image)
+            # 原图与预览共用同一画布，只需重绘水印预览
             self.image_preview.display_watermarked_image(self.watermarked_image)
             
             # 更新图片信息
@@ -826,13 +835,24 @@ class WatermarkGUI:
             self.progress_window.destroy()  # 关闭进度条窗口
             return
         
-        # 使用应用程序级别的临时目录存储处理结果
-        import os
-        # 在应用程序临时目录内创建一个唯一的子目录
-        import uuid
-        batch_temp_dir = os.path.join(self.app_temp_dir, str(uuid.uuid4()))
-        os.makedirs(batch_temp_dir, exist_ok=True)
-        output_dir = batch_temp_dir
+        # 选择输出方式：直接写入目标目录，或先写入临时目录预览后再保存
+        self.batch_direct_output_dir = None
+        if messagebox.askyesno(
+            "输出方式",
+            "是否将处理结果直接保存到输出目录？\n\n"
+            "是: 选择输出目录，处理结果直接写入该目录\n"
+            "否: 先保存到临时目录，预览后再点击'保存'",
+            parent=self.progress_window
+        ):
+            direct_dir = filedialog.askdirectory(
+                parent=self.progress_window,
+                title="选择输出目录",
+                initialdir=os.path.dirname(file_paths[0])
+            )
+            if direct_dir:
+                self.batch_direct_output_dir = direct_dir
+        
+        output_dir = self._create_batch_output_dir()
         
         # 进度回调函数
         def update_progress(completed, total):
@@ -874,6 +894,7 @@ class WatermarkGUI:
                 scattered_watermark=self.scattered_watermark_var.get() if hasattr(self, 'scattered_watermark_var') else False,
                 invisible_watermark=self.invisible_watermark_var.get() if hasattr(self, 'invisible_watermark_var') else False,
                 texture_watermark=self.texture_watermark_var.get() if hasattr(self, 'texture_watermark_var') else False,
+                seed=self.watermark_seed,
                 enable_shadow=self.shadow_enable_var.get() if hasattr(self, 'shadow_enable_var') else False,
                 shadow_color=self.shadow_color if hasattr(self, 'shadow_color') else "#000000",
                 shadow_offset_x=self.shadow_offset_x_var.get() if hasattr(self, 'shadow_offset_x_var') else 2,
@@ -881,7 +902,10 @@ class WatermarkGUI:
                 shadow_opacity=self.shadow_opacity_var.get() if hasattr(self, 'shadow_opacity_var') else 30,
                 security_watermark=self.security_watermark_var.get() if hasattr(self, 'security_watermark_var') else False,
                 security_key=self.security_key_entry.get() if hasattr(self, 'security_key_entry') and self.security_key_entry is not None else "watermark123",
-                security_strength=self.security_strength_var.get() if hasattr(self, 'security_strength_var') else 0.02
+                security_strength=self.security_strength_var.get() if hasattr(self, 'security_strength_var') else 0.02,
+                encode_profile=self.encode_profile_var.get(),
+                naming=self.naming_var.get(),
+                incremental=bool(self.batch_direct_output_dir) and self.incremental_var.get()
             )
         else:
             if not self.logo_path:
@@ -902,7 +926,10 @@ class WatermarkGUI:
                 self.flip_horizontal.get() if hasattr(self, 'flip_horizontal') else False,
                 self.flip_vertical.get() if hasattr(self, 'flip_vertical') else False,
                 recolor_color,
-                progress_callback=update_progress
+                progress_callback=update_progress,
+                encode_profile=self.encode_profile_var.get(),
+                naming=self.naming_var.get(),
+                incremental=bool(self.batch_direct_output_dir) and self.incremental_var.get()
             )
         
         # 统计结果
@@ -919,12 +946,45 @@ class WatermarkGUI:
         # 更新控件状态，确保按钮可用
         self._update_control_states()
         
+        if self.batch_direct_output_dir:
+            save_hint = f"处理结果已直接保存到目录: {output_dir}"
+        else:
+            save_hint = "您可以在预览界面查看处理结果，点击'保存'按钮选择输出目录保存图片"
         messagebox.showinfo(
             "批量处理完成",
             f"已处理 {total_count} 张图片，成功 {success_count} 张，失败 {total_count - success_count} 张\n\n" \
-            f"您可以在预览界面查看处理结果，点击'保存'按钮选择输出目录保存图片"
+            f"{save_hint}"
         )
     
+    def _create_batch_output_dir(self):
+        """
+        获取批量处理的输出目录
+        
+        直接输出模式下返回用户选择的目标目录；否则在应用程序临时目录内
+        创建新的子目录，并按空间预算清理旧的批量临时目录。
+        """
+        if self.batch_direct_output_dir:
+            return self.batch_direct_output_dir
+        
+        # 清理旧的批量临时目录，保留当前预览使用的目录
+        budget_bytes = DEFAULT_CONFIG["batch_temp_budget_mb"] * 1024 * 1024
+        keep = [self.batch_output_dir] if self.batch_output_dir and self._is_in_temp_dir(self.batch_output_dir) else []
+        cleanup_temp_dirs(self.app_temp_dir, budget_bytes, keep=keep)
+        
+        # 在应用程序临时目录内创建一个唯一的子目录
+        batch_temp_dir = os.path.join(self.app_temp_dir, str(uuid.uuid4()))
+        os.makedirs(batch_temp_dir, exist_ok=True)
+        return batch_temp_dir
+    
+    def _is_in_temp_dir(self, path):
+        """判断路径是否位于应用程序临时目录内"""
+        temp_dir = os.path.abspath(self.app_temp_dir)
+        try:
+            return os.path.commonpath([os.path.abspath(path), temp_dir]) == temp_dir
+        except ValueError:
+            # 不同驱动器上的路径
+            return False
+    
     def _update_logo_size_range(self):
         """更新Logo大小滑块的范围"""
         if hasattr(self, 'control_panel') and hasattr(self.control_panel, 'sections'):
@@ -950,7 +1010,7 @@ class WatermarkGUI:
     def clear_watermark(self):
         """清除水印"""
         if self.original_image:
-            self.image_preview.display_original_image(self.original_image)
+            # 原图的缩放帧已缓存，直接复用而无需重新缩放
             self.image_preview.display_watermarked_image(self.original_image)
             self.watermarked_image = self.original_image.copy()
     
@@ -960,36 +1020,88 @@ class WatermarkGUI:
             messagebox.showwarning("警告", "请先加载图片")
             return
         
-        # 简单的智能水印位置算法：选择图片中最不复杂的区域
-        img = self.original_image.convert("L")  # 转换为灰度图
-        width, height = img.size
-        
-        # 定义四个角落的区域大小
-        corner_size = 50
-        
-        # 计算四个角落的平均亮度
-        corners = [
-            ("top-left", img.crop((0, 0, corner_size, corner_size))),
-            ("top-right", img.crop((width - corner_size, 0, width, corner_size))),
-            ("bottom-left", img.crop((0, height - corner_size, corner_size, height))),
-            ("bottom-right", img.crop((width - corner_size, height - corner_size, width, height)))
-        ]
-        
-        corner_brightness = {}
-        for corner_name, corner_img in corners:
-            # 计算平均亮度
-            pixels = list(corner_img.getdata())
-            avg_brightness = sum(pixels) / len(pixels)
-            corner_brightness[corner_name] = avg_brightness
+        # 按水印的实际大小计算候选区域
+        rotation = self.rotation_var.get() if hasattr(self, 'rotation_var') else 0
+        if self.watermark_type.get() == "logo" and self.logo_path:
+            watermark_size = self.watermark_processor.get_logo_watermark_size(
+                self.logo_path, self.logo_size_var.get(), rotation
+            )
+            watermark_color = self.logo_recolor_var.get()[:7] if validate_color(self.logo_recolor_var.get()[:7]) else None
+        else:
+            text = self.text_entry.get() if self.text_entry is not None else DEFAULT_CONFIG["default_text"]
+            watermark_size = self.watermark_processor.get_text_watermark_size(
+                text,
+                self.font_size_var.get(),
+                self.font_family_var.get(),
+                self.bold_var.get(),
+                self.italic_var.get(),
+                self.underline_var.get(),
+                rotation
+            )
+            watermark_color = self.font_color
         
-        # 选择最亮的角落（最不复杂的区域）
-        best_corner = max(corner_brightness, key=corner_brightness.get)
+        # 根据局部方差、边缘密度和对比度选择最佳位置
+        best_position = self.watermark_processor.find_smart_position(
+            self.original_image, watermark_size, watermark_color
+        )
         
         # 应用最佳位置
-        self.control_panel.set_position(best_corner)
-        self.update_preview()
+        if isinstance(best_position, tuple):
+            image_width, image_height = self.original_image.size
+            self.custom_x_var.set(int(best_position[0] / image_width * 100))
+            self.custom_y_var.set(int(best_position[1] / image_height * 100))
+            self.position_var.set("custom")
+            self.watermark_position = "custom"
+            self.custom_position = best_position
+            self.update_preview()
+            position_text = f"自定义坐标 ({best_position[0]}, {best_position[1]})"
+        else:
+            self.control_panel.set_position(best_position)
+            position_text = best_position
         
-        messagebox.showinfo("智能位置选择", f"已自动选择最佳水印位置：{best_corner}\n\n系统根据图片内容复杂度选择了最不显眼的区域。")
+        messagebox.showinfo("智能位置选择", f"已自动选择最佳水印位置：{position_text}\n\n系统根据图片内容复杂度和水印颜色对比度选择了最合适的区域。")
+    
+    def get_current_style(self):
+        """根据当前界面设置构建WatermarkStyle对象"""
+        recolor_color = self.logo_recolor_var.get()
+        return WatermarkStyle(
+            watermark_type=self.watermark_type.get(),
+            text=TextStyle(
+                text=self.text_entry.get() if hasattr(self, 'text_entry') and self.text_entry is not None else DEFAULT_CONFIG["default_text"],
+                font_size=self.font_size_var.get(),
+                font_color=self.font_color,
+                font_family=self.font_family_var.get(),
+                bold=self.bold_var.get(),
+                italic=self.italic_var.get(),
+                underline=self.underline_var.get(),
+                scattered=self.scattered_watermark_var.get(),
+                invisible=self.invisible_watermark_var.get(),
+                texture=self.texture_watermark_var.get(),
+                seed=self.watermark_seed
+            ),
+            logo=LogoStyle(
+                path=self.logo_path or "",
+                size=self.logo_size_var.get(),
+                recolor_color=recolor_color if recolor_color and validate_color(recolor_color[:7]) else None
+            ),
+            shadow=ShadowStyle(
+                enabled=self.shadow_enable_var.get(),
+                color=self.shadow_color,
+                offset_x=self.shadow_offset_x_var.get(),
+                offset_y=self.shadow_offset_y_var.get(),
+                opacity=self.shadow_opacity_var.get()
+            ),
+            security=SecurityStyle(
+                enabled=self.security_watermark_var.get(),
+                key=self.security_key_entry.get() if self.security_key_entry is not None else "",
+                strength=self.security_strength_var.get()
+            ),
+            position=self.watermark_position,
+            opacity=self.opacity_var.get(),
+            rotation=self.rotation_var.get(),
+            flip_horizontal=self.flip_horizontal.get(),
+            flip_vertical=self.flip_vertical.get()
+        )
     
     def save_style(self):
         """保存样式"""
@@ -1000,36 +1112,9 @@ class WatermarkGUI:
         )
         
         if style_name:
-            import json
-            
-            # 构建字体样式字符串
-            font_style = ""
-            if self.bold_var.get():
-                font_style += "bold "
-            if self.italic_var.get():
-                font_style += "italic "
-            if self.underline_var.get():
-                font_style += "underline "
-            font_style = font_style.strip() or "normal"
-            
-            style = {
-                "text": self.text_entry.get() if hasattr(self, 'text_entry') and self.text_entry is not None else DEFAULT_CONFIG["default_text"],
-                "font_size": self.font_size_var.get(),
-                "font_color": self.font_color,
-                "font_style": font_style,
-                "position": self.watermark_position,
-                "opacity": self.opacity_var.get(),
-                "rotation": self.rotation_var.get(),
-                "flip_horizontal": self.flip_horizontal.get(),
-                "flip_vertical": self.flip_vertical.get(),
-                "watermark_type": self.watermark_type.get(),
-                "logo_path": self.logo_path,
-                "logo_size": self.logo_size_var.get()
-            }
-            
             try:
-                with open(style_name, "w") as f:
-                    json.dump(style, f, indent=4)
+                with open(style_name, "w", encoding="utf-8") as f:
+                    f.write(self.get_current_style().to_json())
                 messagebox.showinfo("成功", "样式保存成功")
             except Exception as e:
                 messagebox.showerror("错误", f"保存样式失败: {str(e)}")
@@ -1042,17 +1127,20 @@ class WatermarkGUI:
         )
         
         if style_name:
-            import json
             try:
-                with open(style_name, "r") as f:
-                    style = json.load(f)
+                # 样式文件不保存安全水印密钥，沿用界面中当前输入的密钥
+                security_key = self.security_key_entry.get() if self.security_key_entry is not None else None
+                with open(style_name, "r", encoding="utf-8") as f:
+                    style = WatermarkStyle.from_json(f.read(), security_key)
                 
-                # 应用样式
+                # 应用文字样式
+                text = style.text
                 if hasattr(self, 'text_entry') and self.text_entry is not None:
                     self.text_entry.delete(0, tk.END)
-                    self.text_entry.insert(0, style.get("text", ""))
-                self.font_size_var.set(style.get("font_size", DEFAULT_CONFIG["default_font_size"]))
-                self.font_color = style.get("font_color", DEFAULT_CONFIG["default_font_color"])
+                    self.text_entry.insert(0, text.text)
+                self.font_size_var.set(text.font_size)
+                self.font_family_var.set(text.font_family)
+                self.font_color = text.font_color
                 if hasattr(self, 'color_button'):
                     self.color_button.config(bg=self.font_color)
                 if hasattr(self, 'color_entry'):
@@ -1060,28 +1148,47 @@ class WatermarkGUI:
                     self.color_entry.insert(0, self.font_color)
                 
                 # 设置字体样式
-                font_style = style.get("font_style", DEFAULT_CONFIG["default_font_style"])
-                self.bold_var.set("bold" in font_style)
-                self.italic_var.set("italic" in font_style)
-                self.underline_var.set("underline" in font_style)
+                self.bold_var.set(text.bold)
+                self.italic_var.set(text.italic)
+                self.underline_var.set(text.underline)
+                
+                # 设置水印功能
+                self.scattered_watermark_var.set(text.scattered)
+                self.invisible_watermark_var.set(text.invisible)
+                self.texture_watermark_var.set(text.texture)
+                self.watermark_seed = text.seed
+                
+                # 设置阴影
+                self.shadow_enable_var.set(style.shadow.enabled)
+                self.shadow_color = style.shadow.color
+                self.shadow_offset_x_var.set(style.shadow.offset_x)
+                self.shadow_offset_y_var.set(style.shadow.offset_y)
+                self.shadow_opacity_var.set(style.shadow.opacity)
+                
+                # 设置安全水印（样式中没有密钥时保留已输入的密钥）
+                self.security_watermark_var.set(style.security.enabled)
+                self.security_strength_var.set(style.security.strength)
+                if self.security_key_entry is not None and style.security.key:
+                    self.security_key_entry.delete(0, tk.END)
+                    self.security_key_entry.insert(0, style.security.key)
                 
-                self.set_position(style.get("position", DEFAULT_CONFIG["default_position"]))
-                self.opacity_var.set(style.get("opacity", DEFAULT_CONFIG["default_opacity"]))
-                self.rotation_var.set(style.get("rotation", DEFAULT_CONFIG["default_rotation"]))
+                self.set_position(style.position)
+                self.opacity_var.set(style.opacity)
+                self.rotation_var.set(style.rotation)
                 
                 # 设置翻转
-                self.flip_horizontal.set(style.get("flip_horizontal", False))
-                self.flip_vertical.set(style.get("flip_vertical", False))
+                self.flip_horizontal.set(style.flip_horizontal)
+                self.flip_vertical.set(style.flip_vertical)
                 
                 # 设置水印类型
-                watermark_type = style.get("watermark_type", "text")
-                self.watermark_type.set(watermark_type)
+                self.watermark_type.set(style.watermark_type)
                 self.control_panel.toggle_watermark_type()
                 
                 # 设置Logo相关参数
-                self.logo_path = style.get("logo_path", "")
+                self.logo_path = style.logo.path
                 self.logo_path_var.set(os.path.basename(self.logo_path) if self.logo_path else "未选择Logo")
-                self.logo_size_var.set(style.get("logo_size", 100))
+                self.logo_size_var.set(style.logo.size)
+                self.logo_recolor_var.set(style.logo.recolor_color or "")
                 
                 self.update_preview()
                 messagebox.showinfo("成功", "样式加载成功")
@@ -1108,6 +1215,9 @@ class WatermarkGUI:
 
 def main():
     """主函数"""
+    configure_logging(quiet=DEFAULT_CONFIG["log_quiet"], json_format=DEFAULT_CONFIG["log_json"])
+    # 扫描地图和全景图可能超过Pillow默认的像素上限，超大图片由分块处理控制内存
+    Image.MAX_IMAGE_PIXELS = DEFAULT_CONFIG["max_image_megapixels"] * 1_000_000
     root = tk.Tk()
     app = WatermarkGUI(root)
     root.mainloop()
@@ -1,9 +1,15 @@
 import tkinter as tk
+from PIL import Image
 from gui_main import WatermarkGUI
+from utils import DEFAULT_CONFIG
+from watermark_processor.events import configure_logging
 
 
 def main():
     """主程序入口"""
+    configure_logging(quiet=DEFAULT_CONFIG["log_quiet"], json_format=DEFAULT_CONFIG["log_json"])
+    # 扫描地图和全景图可能超过Pillow默认的像素上限，超大图片由分块处理控制内存
+    Image.MAX_IMAGE_PIXELS = DEFAULT_CONFIG["max_image_megapixels"] * 1_000_000
     root = tk.Tk()
     app = WatermarkGUI(root)
     root.mainloop()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+测试批量处理的两条路径输出一致：流水线（read_workers>0，按样式原地混合）
+与逐张完成读取、处理和写出（read_workers=0）得到相同的像素
+
+运行方式:
+    python -m pytest -q test_batch_lanes.py
+"""
+
+import os
+import pytest
+from PIL import Image, ImageChops
+
+from watermark_processor import WatermarkProcessor
+
+
+def make_sources(directory, count=3):
+    """生成若干张无损格式的样例图片"""
+    paths = []
+    for index in range(count):
+        path = os.path.join(directory, f"sample_{index}.png")
+        Image.radial_gradient("L").resize((320, 240)).convert("RGB").save(path)
+        paths.append(path)
+    return paths
+
+
+def make_logo(path):
+    """生成带透明度的Logo图片"""
+    logo = Image.new("RGBA", (80, 40), (0, 0, 0, 0))
+    logo.paste((30, 200, 60, 220), (10, 5, 70, 35))
+    logo.save(path)
+    return path
+
+
+def run_lane(method, image_paths, output_dir, read_workers, *args, **kwargs):
+    """以指定的读取线程数批量处理，返回{源路径: 输出图片}"""
+    processor = WatermarkProcessor()
+    processor.image_cache = None
+    processor.read_workers = read_workers
+    results = getattr(processor, method)(image_paths, *args, output_dir, **kwargs)
+    assert all(result.success for result in results)
+    outputs = {}
+    for result in results:
+        with Image.open(result.output_path) as image:
+            outputs[result.image_path] = image.convert("RGB")
+    return outputs
+
+
+def assert_same_outputs(first, second):
+    assert first.keys() == second.keys()
+    for path in first:
+        assert ImageChops.difference(first[path], second[path]).getbbox() is None, path
+
+
+@pytest.mark.parametrize("recolor_color", [None, "#FF0000"])
+def test_logo_lanes_match(tmp_path, recolor_color):
+    image_paths = make_sources(str(tmp_path))
+    logo_path = make_logo(str(tmp_path / "logo.png"))
+    kwargs = {"logo_size": 60, "opacity": 80, "recolor_color": recolor_color}
+    pipeline = run_lane("batch_add_logo_watermark", image_paths, str(tmp_path / "pipeline"), 4,
+                        logo_path, **kwargs)
+    whole = run_lane("batch_add_logo_watermark", image_paths, str(tmp_path / "whole"), 0,
+                     logo_path, **kwargs)
+    assert_same_outputs(pipeline, whole)
+
+
+def test_logo_recolor_is_applied(tmp_path):
+    image_paths = make_sources(str(tmp_path), count=1)
+    logo_path = make_logo(str(tmp_path / "logo.png"))
+    plain = run_lane("batch_add_logo_watermark", image_paths, str(tmp_path / "plain"), 0,
+                     logo_path, logo_size=60, opacity=80)
+    recolored = run_lane("batch_add_logo_watermark", image_paths, str(tmp_path / "recolored"), 0,
+                         logo_path, logo_size=60, opacity=80, recolor_color="#FF0000")
+    path = image_paths[0]
+    assert ImageChops.difference(plain[path], recolored[path]).getbbox() is not None
+
+
+def test_text_lanes_match(tmp_path):
+    image_paths = make_sources(str(tmp_path))
+    kwargs = {"font_size": 28, "font_color": "#FFFFFF", "opacity": 70,
+              "scattered_watermark": True, "enable_shadow": True}
+    pipeline = run_lane("batch_add_text_watermark", image_paths, str(tmp_path / "pipeline"), 4,
+                        "© VisMark", **kwargs)
+    whole = run_lane("batch_add_text_watermark", image_paths, str(tmp_path / "whole"), 0,
+                     "© VisMark", **kwargs)
+    assert_same_outputs(pipeline, whole)
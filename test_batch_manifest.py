@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+测试增量批量处理清单：第二次运行跳过已是最新的图片，源文件变化后重新处理，
+源文件不存在时只记为单张图片的失败
+
+运行方式:
+    python -m pytest -q test_batch_manifest.py
+"""
+
+import os
+import pytest
+from PIL import Image
+
+from watermark_processor import WatermarkProcessor
+from watermark_processor.batch_manifest import BatchManifest, MANIFEST_FILENAME
+
+
+def make_sources(directory, count=3):
+    """生成若干张样例图片"""
+    paths = []
+    for index in range(count):
+        path = os.path.join(directory, f"sample_{index}.jpg")
+        Image.new("RGB", (320, 240), (40 * index, 90, 160)).save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def run_batch(image_paths, output_dir, verify="stat"):
+    """增量批量添加文字水印，返回结果列表"""
+    processor = WatermarkProcessor()
+    processor.image_cache = None
+    return processor.batch_add_text_watermark(image_paths, "© VisMark", output_dir, font_size=24,
+                                              incremental=True, manifest_verify=verify)
+
+
+def output_mtimes(results):
+    """各输出文件的修改时间"""
+    return {result.output_path: os.stat(result.output_path).st_mtime_ns for result in results}
+
+
+@pytest.mark.parametrize("verify", ["stat", "hash"])
+def test_second_run_skips_up_to_date_outputs(tmp_path, verify):
+    image_paths = make_sources(str(tmp_path))
+    output_dir = str(tmp_path / "out")
+    first = run_batch(image_paths, output_dir, verify)
+    assert all(result.success for result in first)
+    before = output_mtimes(first)
+
+    second = run_batch(image_paths, output_dir, verify)
+    assert all(result.success for result in second)
+    assert output_mtimes(second) == before
+    assert os.path.exists(os.path.join(output_dir, MANIFEST_FILENAME))
+
+
+@pytest.mark.parametrize("verify", ["stat", "hash"])
+def test_changed_source_is_processed_again(tmp_path, verify):
+    image_paths = make_sources(str(tmp_path))
+    output_dir = str(tmp_path / "out")
+    before = output_mtimes(run_batch(image_paths, output_dir, verify))
+
+    # 内容和修改时间都改变
+    Image.new("RGB", (320, 240), (255, 0, 0)).save(image_paths[1], quality=90)
+    stat = os.stat(image_paths[1])
+    os.utime(image_paths[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    results = run_batch(image_paths, output_dir, verify)
+    assert all(result.success for result in results)
+    after = output_mtimes(results)
+    changed = {result.image_path for result in results
+               if after[result.output_path] != before[result.output_path]}
+    assert changed == {image_paths[1]}
+
+
+@pytest.mark.parametrize("verify", ["stat", "hash"])
+def test_missing_source_is_a_per_image_failure(tmp_path, verify):
+    image_paths = make_sources(str(tmp_path))
+    output_dir = str(tmp_path / "out")
+    missing = str(tmp_path / "missing.jpg")
+
+    results = run_batch(image_paths + [missing], output_dir, verify)
+    by_path = {result.image_path: result for result in results}
+    assert len(results) == len(image_paths) + 1
+    assert not by_path[missing].success
+    assert by_path[missing].error_class == "io"
+    assert all(by_path[path].success for path in image_paths)
+
+    # 第二次运行：其余图片跳过，缺失的图片仍然报告失败
+    results = run_batch(image_paths + [missing], output_dir, verify)
+    assert [result.success for result in results].count(False) == 1
+
+
+def test_manifest_tolerates_missing_source(tmp_path):
+    output_dir = str(tmp_path)
+    missing = str(tmp_path / "missing.jpg")
+    with BatchManifest(output_dir, "hash") as manifest:
+        assert not manifest.is_up_to_date(missing, str(tmp_path / "out.jpg"), "style")
+        manifest.record(missing, str(tmp_path / "out.jpg"), "style")
+    assert not os.path.exists(os.path.join(output_dir, MANIFEST_FILENAME))
@@ -1,5 +1,6 @@
 import os
 import random
+import shutil
 from tkinter import messagebox
 
 # 默认配置
@@ -10,7 +11,18 @@ DEFAULT_CONFIG = {
     "default_rotation": 0,
     "default_position": "center",
     "default_font_color": "#FFFFFF",
-    "default_font_style": "normal"
+    "default_font_style": "normal",
+    "default_encode_profile": "balanced",
+    "default_naming": "stem",
+    "batch_temp_budget_mb": 1024,
+    "batch_memory_budget_mb": 4096,
+    "decode_cache_mb": 512,
+    "batch_read_workers": 4,
+    "batch_write_workers": 2,
+    "max_image_megapixels": 1000,
+    "batch_incremental": True,
+    "log_quiet": False,
+    "log_json": False
 }
 
 # 预设样式
@@ -85,6 +97,47 @@ def get_unique_filename(directory, filename):
     return new_filename
 
 
+def get_directory_size(directory):
+    """计算目录中所有文件的总字节数"""
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def cleanup_temp_dirs(parent_dir, budget_bytes, keep=()):
+    """
+    清理临时目录，使其子目录的总大小不超过预算
+    
+    按修改时间从旧到新删除子目录，keep中的目录不会被删除。
+    
+    返回:
+        int: 删除的子目录数量
+    """
+    keep = {os.path.abspath(path) for path in keep if path}
+    subdirs = []
+    for name in os.listdir(parent_dir):
+        path = os.path.abspath(os.path.join(parent_dir, name))
+        if os.path.isdir(path):
+            subdirs.append((os.path.getmtime(path), path, get_directory_size(path)))
+    
+    total = sum(size for _, _, size in subdirs)
+    removed = 0
+    for _, path, size in sorted(subdirs):
+        if total <= budget_bytes:
+            break
+        if path in keep:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        removed += 1
+    return removed
+
+
 def show_error(message):
     """显示错误消息"""
     messagebox.showerror("错误", message)
@@ -7,7 +7,18 @@ from .base_processor import BaseWatermarkProcessor
 from .text_watermark import TextWatermarkProcessor
 from .logo_watermark import LogoWatermarkProcessor
 from .security_watermark import SecurityWatermarkProcessor
+from .tiled_processing import TiledWatermarkProcessor, StripTiffWriter
+from .smart_placement import SmartPlacementProcessor
+from .output_naming import OutputNamer, NAMING_TEMPLATES
+from .batch_manifest import BatchManifest
+from .instrumentation import ProcessingStats
+from .image_cache import DecodedImageCache, decoded_image_cache
+from .events import BatchResult, configure_logging
+from .watermark_style import WatermarkStyle, TextStyle, LogoStyle, ShadowStyle, SecurityStyle
 from .watermark_processor import WatermarkProcessor
 
 # 保持向后兼容性
-__all__ = ['WatermarkProcessor', 'BaseWatermarkProcessor', 'TextWatermarkProcessor', 'LogoWatermarkProcessor', 'SecurityWatermarkProcessor']
\ No newline at end of file
+__all__ = ['WatermarkProcessor', 'BaseWatermarkProcessor', 'TextWatermarkProcessor', 'LogoWatermarkProcessor', 'SecurityWatermarkProcessor',
+           'TiledWatermarkProcessor', 'StripTiffWriter',
+           'SmartPlacementProcessor', 'OutputNamer', 'NAMING_TEMPLATES',
+           'BatchManifest', 'ProcessingStats', 'DecodedImageCache', 'decoded_image_cache', 'BatchResult', 'configure_logging', 'WatermarkStyle', 'TextStyle', 'LogoStyle', 'ShadowStyle', 'SecurityStyle']
\ No newline at end of file
@@ -4,8 +4,105 @@
 """
 
 import os
-import traceback
-from PIL import Image, ImageDraw, ImageFont
+import time
+import math
+import hashlib
+import uuid
+import logging
+import threading
+import collections
+import functools
+import concurrent.futures
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+from .batch_manifest import BatchManifest, style_fingerprint
+from .output_naming import OutputNamer
+from .overlay_cache import OverlayCache
+from .image_cache import decoded_image_cache
+from .mapped_io import map_image, write_mapped, close_mapping
+from .pipeline import BatchPipeline, PIPELINE_READ_WORKERS, PIPELINE_WRITE_WORKERS
+from .instrumentation import ProcessingStats, NULL_STAGE
+from .events import (BatchResult, batch_logger, report_error, clear_last_error, get_last_error,
+                     classify_error, ERROR_UNKNOWN)
+
+
+logger = logging.getLogger(__name__)
+
+
+# 输出编码配置：在编码速度和文件大小之间取舍
+# jpeg_subsampling: 0 = 4:4:4, 1 = 4:2:2, 2 = 4:2:0
+ENCODE_PROFILES = {
+    "fast": {
+        "png_compress_level": 1,
+        "png_optimize": False,
+        "jpeg_quality": 90,
+        "jpeg_subsampling": 2,
+        "jpeg_progressive": False,
+        "jpeg_optimize": False,
+    },
+    "balanced": {
+        "png_compress_level": 6,
+        "png_optimize": False,
+        "jpeg_quality": 95,
+        "jpeg_subsampling": 2,
+        "jpeg_progressive": False,
+        "jpeg_optimize": False,
+    },
+    "smallest": {
+        "png_compress_level": 9,
+        "png_optimize": True,
+        "jpeg_quality": 85,
+        "jpeg_subsampling": 2,
+        "jpeg_progressive": True,
+        "jpeg_optimize": True,
+    },
+}
+
+DEFAULT_ENCODE_PROFILE = "balanced"
+
+# 各输出格式支持写入的元数据
+METADATA_FORMATS = {
+    "exif": {"JPEG", "PNG", "WEBP", "TIFF"},
+    "icc_profile": {"JPEG", "PNG", "WEBP", "TIFF"},
+    "dpi": {"JPEG", "PNG", "TIFF", "BMP"},
+}
+
+# EXIF方向标签
+EXIF_ORIENTATION = 0x0112
+
+# 各颜色模式对应的ICC配置文件色彩空间（配置文件头第16~20字节）；
+# 图片在处理中转换了色彩空间（如CMYK源图片添加文字水印后输出RGB）时，源配置文件不再适用
+ICC_COLOR_SPACES = {
+    "1": b"GRAY", "L": b"GRAY", "LA": b"GRAY", "I": b"GRAY", "I;16": b"GRAY", "F": b"GRAY",
+    "RGB": b"RGB ", "RGBA": b"RGB ", "RGBX": b"RGB ", "P": b"RGB ", "PA": b"RGB ",
+    "CMYK": b"CMYK", "LAB": b"Lab ", "YCbCr": b"YCbr",
+}
+
+# TIFF源图片的getexif()返回整个IFD0，其中的图像结构标签（尺寸、压缩、条带偏移、色彩映射等）
+# 描述的是源文件，随EXIF写入输出文件会覆盖输出的实际布局，读取元数据时去掉
+TIFF_STRUCTURE_TAGS = (254, 255, 256, 257, 258, 259, 262, 266, 273, 277, 278, 279, 280, 281,
+                       282, 283, 284, 296, 317, 320, 322, 323, 324, 325, 338, 339, 347,
+                       513, 514, 530, 531, 532, 34675)
+
+# 分散和纹理水印的默认样式种子
+DEFAULT_SEED = 0
+
+# 透明度查找表缓存，键为alpha缩放系数，所有处理器实例共用
+_ALPHA_LUTS = {}
+
+# 文件头探测结果：存储的宽高、颜色模式、格式和EXIF方向
+ImageProbe = collections.namedtuple("ImageProbe", ["size", "mode", "format", "orientation"])
+
+# 批量处理的默认内存预算（字节），同时处理的图片估算工作集之和不超过该值
+BATCH_MEMORY_BUDGET = 4 * 1024 * 1024 * 1024
+
+# 每像素的估算工作集（字节）：解码RGB(3) + RGBA转换(4) + RGB副本(3) + 覆盖层与混合区域(4) + 编码前转换(2，按部分格式摊销)
+WORKING_SET_BYTES_PER_PIXEL = 16
+
+# 估算工作集超过内存预算该比例的图片进入大图通道
+LARGE_IMAGE_BUDGET_FRACTION = 0.25
+
+# 大图通道的并发数
+LARGE_IMAGE_WORKERS = 1
 
 
 class BaseWatermarkProcessor:
@@ -13,9 +110,53 @@ class BaseWatermarkProcessor:
     
     def __init__(self):
         self.font_cache = {}
+        self.overlay_cache = OverlayCache()
+        # 解码图片缓存，默认为进程内共用的实例；设为None时每次都从磁盘解码
+        self.image_cache = decoded_image_cache
+        # 批量处理线程的状态：批量读取只查询解码缓存，不把解码结果放入缓存
+        self._batch_reads = threading.local()
+        # 是否以内存映射方式打开未压缩的源图片
+        self.mapped_io = True
+        self.stats = None
+        self.memory_budget = BATCH_MEMORY_BUDGET
+        # 批量处理的读取和写出线程数；设为0时每个工作线程依次完成读取、处理和写出
+        self.read_workers = PIPELINE_READ_WORKERS
+        self.write_workers = PIPELINE_WRITE_WORKERS
+        # 最近一次流水线批量处理的各阶段利用率
+        self.pipeline_utilization = None
+    
+    def enable_instrumentation(self, callback=None):
+        """
+        启用处理阶段计时
+        
+        参数:
+            callback: 可选回调函数，每记录一个阶段调用一次，参数为
+                      {"image", "stage", "seconds", "bytes"}
+        
+        返回:
+            ProcessingStats对象，可通过summary()获取各阶段的百分位数
+        """
+        self.stats = ProcessingStats(callback)
+        return self.stats
+    
+    def disable_instrumentation(self):
+        """停用处理阶段计时"""
+        self.stats = None
+    
+    def _stage(self, name):
+        """返回阶段计时上下文管理器，未启用计时时返回空操作对象"""
+        stats = self.stats
+        if stats is None:
+            return NULL_STAGE
+        return stats.stage(name)
     
     def _get_font(self, font_size, font_family, bold=False, italic=False, underline=False):
         """获取字体对象"""
+        with self._stage("font"):
+            return self._load_font(font_size, font_family, bold, italic, underline)
+    
+    def _load_font(self, font_size, font_family, bold=False, italic=False, underline=False):
+        """查找并加载字体文件"""
         # 根据字体家族和样式生成字体样式名称
         style_name = ""
         if bold:
@@ -200,21 +341,627 @@ class BaseWatermarkProcessor:
         
         return positions.get(position_name, positions["center"])
     
-    def _save_image(self, image, output_path):
-        """保存图片，根据文件格式设置不同的保存参数"""
+    def _build_output_paths(self, image_paths, output_dir, naming=None):
+        """
+        为批量处理的图片生成输出路径
+        
+        参数:
+            naming: 命名模板（stem、mirror、hash或自定义模板字符串），
+                    同名文件在本批次内自动追加序号，不会互相覆盖
+        """
+        namer = OutputNamer(output_dir, naming, OutputNamer.common_source_root(image_paths))
+        return namer.assign_all(image_paths)
+    
+    def _batch_with_style(self, label, process_func, image_paths, output_dir, style,
+                          progress_callback=None, encode_profile=None, naming=None,
+                          incremental=False, manifest_verify="stat", transform=None):
+        """
+        按同一样式批量处理图片
+        
+        每个任务只携带源路径、输出路径和共享的WatermarkStyle对象（多图层时为样式元组），
+        process_func的签名为 (image_path, output_path, style, encode_profile)；
+        transform为其中的混合步骤，签名为 (image, image_path, style)，提供时使用读取、处理、写出流水线。
+        """
+        # 按命名模板分配输出路径，同名文件不会互相覆盖
+        output_paths = self._build_output_paths(image_paths, output_dir, naming)
+        tasks = [(image_path, output_path, (image_path, output_path, style, encode_profile))
+                 for image_path, output_path in zip(image_paths, output_paths)]
+        
+        if not incremental:
+            return self._run_batch(label, process_func, tasks, progress_callback, transform=transform)
+        
+        # 增量处理：指纹包含样式、编码配置，以及Logo文件本身的大小和修改时间
+        styles = style if isinstance(style, tuple) else (style,)
+        fingerprint_params = {"style": [item.fingerprint for item in styles], "encode_profile": encode_profile,
+                              "logo_files": []}
+        for item in styles:
+            if item.watermark_type == "logo" and item.logo.path:
+                logo_stat = os.stat(item.logo.path)
+                fingerprint_params["logo_files"].append([logo_stat.st_size, logo_stat.st_mtime_ns])
+        fingerprint = style_fingerprint(fingerprint_params)
+        
+        with BatchManifest(output_dir, manifest_verify) as manifest:
+            return self._run_batch(label, process_func, tasks, progress_callback, manifest, fingerprint, transform)
+    
+    def _run_batch(self, label, process_func, tasks, progress_callback=None,
+                   manifest=None, fingerprint=None, transform=None):
+        """
+        使用多线程并行执行批量任务并收集结果
+        
+        参数:
+            label: 日志中的水印类型名称
+            process_func: 处理单张图片的方法，返回 (image_path, output_path, success)
+            tasks: (image_path, output_path, params) 列表，params为传给process_func的参数元组
+            progress_callback: 进度回调函数，接收已完成数量和总数
+            manifest: BatchManifest对象，提供时跳过已是最新的输出并记录新完成的图片
+            fingerprint: 本批次的样式指纹
+            transform: 对已解码图片原地混合水印的函数，签名为 (image, image_path, style)；
+                       提供时普通通道的图片由读取、处理、写出三段流水线完成，大图通道仍整张处理
+        
+        返回:
+            BatchResult列表，可按 (image_path, output_path, success) 解包，失败时带有失败原因
+        """
+        results = []
+        total = len(tasks)
+        batch_logger.info("开始批量添加%s水印，共处理 %d 张图片", label, total,
+                          extra={"event": "batch_start", "label": label, "total": total})
+        
+        normal_workers = os.cpu_count() or 1
+        
+        def prepare(params):
+            """检查清单并探测文件头；已是最新时返回None，否则返回 (ImageProbe, 异常)"""
+            if manifest is not None and manifest.is_up_to_date(params[0], params[1], fingerprint):
+                return None
+            return self._probe_safely(params[0])
+        
+        # 探测阶段：并行检查清单（内容哈希校验需要读取整个源文件）并读取文件头，
+        # 跳过源文件和样式均未变化的图片；无法识别的文件稍后直接判为失败，不占用处理线程
+        with concurrent.futures.ThreadPoolExecutor(max_workers=normal_workers) as executor:
+            prepared = list(executor.map(prepare, [params for _, _, params in tasks]))
+        pending = []
+        for (image_path, output_path, params), probe in zip(tasks, prepared):
+            if probe is None:
+                results.append(BatchResult(image_path, output_path, True))
+            else:
+                pending.append((params, probe))
+        completed_count = len(results)
+        if completed_count:
+            batch_logger.info("跳过 %d 张已是最新的图片", completed_count,
+                              extra={"event": "batch_skip", "label": label, "skipped": completed_count})
+            if progress_callback:
+                progress_callback(completed_count, total)
+        
+        # 每张图片一条记录，安静模式下跳过格式化
+        log_progress = batch_logger.isEnabledFor(logging.INFO)
+        
+        def finish(result):
+            """记录单张图片的结果、写入清单并更新进度"""
+            nonlocal completed_count
+            results.append(result)
+            completed_count += 1
+            if log_progress or not result.success:
+                self._log_result(label, result, completed_count, total)
+            
+            # 记录到清单，中断后重新运行时从此处继续
+            if result.success and manifest is not None:
+                manifest.record(result.image_path, result.output_path, fingerprint)
+            
+            # 调用进度回调
+            if progress_callback:
+                progress_callback(completed_count, total)
+        
+        # 按尺寸估算工作集，超大图片进入低并发的大图通道；各通道内按估算从大到小排序，
+        # 大图先开始处理，批次末尾只剩小图，各线程的结束时间更接近
+        budget = self.memory_budget
+        large_threshold = budget * LARGE_IMAGE_BUDGET_FRACTION
+        lanes = {"normal": [], "large": []}
+        for params, (probe, error) in pending:
+            if error is not None:
+                finish(BatchResult(params[0], params[1], False, classify_error(error),
+                                   f"读取图片头信息时出错: {type(error).__name__}: {error}"))
+                continue
+            estimate = probe.size[0] * probe.size[1] * WORKING_SET_BYTES_PER_PIXEL
+            large = estimate > large_threshold or self._requires_whole_task(probe)
+            lanes["large" if large else "normal"].append((params, estimate))
+        for lane in lanes:
+            lanes[lane] = collections.deque(sorted(lanes[lane], key=lambda item: item[1], reverse=True))
+        if lanes["large"]:
+            batch_logger.info("%d 张大图进入低并发通道", len(lanes["large"]),
+                              extra={"event": "batch_large_lane", "label": label, "total": len(lanes["large"])})
+        
+        # 普通通道：读取、处理、写出分别由独立的线程组完成，处理线程不等待I/O
+        pipeline = None
+        if transform is not None and self.read_workers > 0 and self.write_workers > 0 and lanes["normal"]:
+            pipeline = BatchPipeline(self._pipeline_read, functools.partial(self._pipeline_process, transform),
+                                     self._pipeline_write, self.read_workers, normal_workers, self.write_workers)
+        
+        # 两个通道共用内存预算：已提交任务的估算之和超出预算时暂停提交，等待任务完成后再继续
+        with concurrent.futures.ThreadPoolExecutor(max_workers=normal_workers) as normal_executor, \
+                concurrent.futures.ThreadPoolExecutor(max_workers=LARGE_IMAGE_WORKERS) as large_executor:
+            # 各通道的提交函数和同时处理的上限；流水线的上限为各阶段线程数与队列容量之和
+            submitters = {"normal": (functools.partial(normal_executor.submit, self._run_task, process_func),
+                                     normal_workers),
+                          "large": (functools.partial(large_executor.submit, self._run_task, process_func),
+                                    LARGE_IMAGE_WORKERS)}
+            if pipeline is not None:
+                pipeline.start()
+                submitters["normal"] = (pipeline.submit, pipeline.capacity)
+            in_flight = {}
+            lane_counts = {"normal": 0, "large": 0}
+            used = 0
+            
+            try:
+                while lanes["normal"] or lanes["large"] or in_flight:
+                    # 提交能放入预算的任务；没有任务在运行时总是放行，保证单张超出预算的图片也能处理
+                    for lane, queue in lanes.items():
+                        submit, workers = submitters[lane]
+                        while queue and lane_counts[lane] < workers:
+                            params, estimate = queue[0]
+                            if in_flight and used + estimate > budget:
+                                break
+                            queue.popleft()
+                            future = submit(params)
+                            in_flight[future] = (lane, estimate)
+                            lane_counts[lane] += 1
+                            used += estimate
+                    
+                    # 收集已完成的结果并释放预算
+                    done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        lane, estimate = in_flight.pop(future)
+                        lane_counts[lane] -= 1
+                        used -= estimate
+                        finish(future.result())
+            finally:
+                # 等待流水线中剩余的图片写出后停止各阶段线程
+                if pipeline is not None:
+                    pipeline.close()
+        
+        failed = sum(1 for result in results if not result.success)
+        batch_logger.info("批量添加%s水印完成，成功 %d 张，失败 %d 张", label, total - failed, failed,
+                          extra={"event": "batch_done", "label": label, "total": total, "failed": failed})
+        if self.stats is not None:
+            images = [result.image_path for result in results]
+            batch_logger.info("%s", self.stats.format_summary(images),
+                              extra={"event": "stage_summary", "label": label,
+                                     "summary": self.stats.summary(images)})
+        if pipeline is not None:
+            self.pipeline_utilization = pipeline.utilization()
+            batch_logger.info("%s", pipeline.format_utilization(),
+                              extra={"event": "pipeline_utilization", "label": label,
+                                     "summary": self.pipeline_utilization})
+        return results
+    
+    def probe_image(self, image_path):
+        """
+        只读取文件头，不解码像素数据
+        
+        返回:
+            ImageProbe(size, mode, format, orientation)，size为文件中存储的宽高（未应用EXIF方向）
+        
+        文件不存在、无法识别或超过像素上限时抛出异常。已在image_cache中的图片不再读取文件，
+        返回的size为应用EXIF方向后的宽高，orientation为1。
+        """
+        cached = self.image_cache.peek(image_path) if self.image_cache is not None else None
+        if cached is not None:
+            image, metadata = cached
+            return ImageProbe(image.size, image.mode, metadata["format"], 1)
+        with Image.open(image_path) as image:
+            return ImageProbe(image.size, image.mode, image.format,
+                              image.getexif().get(EXIF_ORIENTATION, 1))
+    
+    def _probe_safely(self, image_path):
+        """探测文件头，返回 (ImageProbe, None) 或 (None, 异常)"""
         try:
-            ext = os.path.splitext(output_path)[1].lower()
-            if ext in ['.jpg', '.jpeg']:
-                # JPEG不支持透明通道，需要转换为RGB模式
-                if image.mode in ["RGBA", "LA"]:
-                    image = image.convert('RGB')
-                image.save(output_path, 'JPEG', quality=95, optimize=False, progressive=False)
-            elif ext == '.png':
-                image.save(output_path, 'PNG', optimize=True, compress_level=9)
+            return (self.probe_image(image_path), None)
+        except Exception as e:
+            return (None, e)
+    
+    def _run_task(self, process_func, params):
+        """
+        在工作线程中处理单张图片并返回BatchResult
+        
+        params的前两项为图片路径和输出路径；处理失败时从本线程最近一次记录的错误中读取失败原因，
+        启用计时时按图片记录各阶段耗时。
+        """
+        image_path, output_path = params[0], params[1]
+        clear_last_error()
+        stats = self.stats
+        self._batch_reads.active = True
+        try:
+            if stats is None:
+                _, _, success = process_func(*params)
             else:
-                image.save(output_path)
+                stats.begin_image(image_path)
+                try:
+                    with stats.stage("total"):
+                        _, _, success = process_func(*params)
+                finally:
+                    stats.end_image()
+        except Exception as e:
+            report_error(logger, "处理图片时出错", e)
+            success = False
+        finally:
+            self._batch_reads.active = False
+        
+        return self._task_result(image_path, output_path, success)
+    
+    def _requires_whole_task(self, probe):
+        """图片是否必须整张处理（进入大图通道，不使用流水线），子类可按需覆盖"""
+        return False
+    
+    def _run_stage(self, params, message, func, *args):
+        """
+        在流水线线程中执行一个阶段
+        
+        返回:
+            (失败时的BatchResult或None, func的返回值)
+        """
+        image_path, output_path = params[0], params[1]
+        clear_last_error()
+        stats = self.stats
+        if stats is not None:
+            stats.begin_image(image_path)
+        try:
+            return None, func(*args)
+        except Exception as e:
+            report_error(logger, message, e)
+            return self._task_result(image_path, output_path, False), None
+        finally:
+            if stats is not None:
+                stats.end_image()
+    
+    def _pipeline_read(self, params, payload):
+        """流水线读取阶段：解码源图片"""
+        start = time.perf_counter()
+        self._batch_reads.active = True
+        try:
+            result, decoded = self._run_stage(params, "读取图片时出错", self.open_image,
+                                              params[0], True, params[1])
+        finally:
+            self._batch_reads.active = False
+        if result is not None:
+            return result, None
+        image, metadata = decoded
+        return None, (image, metadata, start)
+    
+    def _pipeline_process(self, transform, params, payload):
+        """流水线处理阶段：按样式原地混合水印"""
+        source, metadata, start = payload
+        result, image = self._run_stage(params, "处理图片时出错", transform, source, params[0], params[2])
+        if image is not source:
+            # 水印混合在转换后的新图片上完成，或处理失败：源图片不再使用
+            close_mapping(source)
+        return result, (image, metadata, start)
+    
+    def _pipeline_write(self, params, payload):
+        """流水线写出阶段：编码并保存，返回本张图片的BatchResult"""
+        image, metadata, start = payload
+        image_path, output_path = params[0], params[1]
+        result, success = self._run_stage(params, "保存图片时出错", self._save_image,
+                                          image, output_path, params[3], metadata)
+        close_mapping(image)
+        if result is None:
+            result = self._task_result(image_path, output_path, success)
+        if self.stats is not None:
+            # 从开始读取到写出完成，包括在队列中等待的时间
+            self.stats.begin_image(image_path)
+            self.stats.record("total", time.perf_counter() - start)
+            self.stats.end_image()
+        return result, None
+    
+    def _task_result(self, image_path, output_path, success):
+        """构造BatchResult，失败时从本线程最近一次记录的错误中读取失败原因"""
+        if success:
+            return BatchResult(image_path, output_path, True)
+        error_class, error = get_last_error() or (ERROR_UNKNOWN, "处理失败")
+        return BatchResult(image_path, output_path, False, error_class, error)
+    
+    def _log_result(self, label, result, index, total):
+        """输出单张图片的结构化处理记录"""
+        extra = {"event": "image_done", "label": label, "image": result.image_path, "output": result.output_path,
+                 "success": result.success, "error_class": result.error_class, "error": result.error,
+                 "index": index, "total": total}
+        if result.success:
+            batch_logger.info("处理第 %d/%d 张图片: %s 成功", index, total, result.image_path, extra=extra)
+        else:
+            batch_logger.warning("处理第 %d/%d 张图片: %s 失败 [%s] %s", index, total, result.image_path,
+                                 result.error_class, result.error, extra=extra)
+    
+    def _get_alpha_lut(self, factor):
+        """获取按系数缩放alpha值的256项查找表（取整方式与point(lambda)一致）"""
+        lut = _ALPHA_LUTS.get(factor)
+        if lut is None:
+            lut = [round(p * factor) for p in range(256)]
+            _ALPHA_LUTS[factor] = lut
+        return lut
+    
+    def _apply_opacity(self, layer, opacity, scale=100):
+        """
+        按透明度缩放RGBA图层的alpha通道（原地修改并返回图层）
+        
+        参数:
+            layer: RGBA模式的PIL Image对象
+            opacity: 透明度 (0-100)
+            scale: 透明度的分母，alpha乘以 opacity / scale
+        """
+        factor = opacity / scale
+        if factor == 1:
+            return layer
+        layer.putalpha(layer.getchannel('A').point(self._get_alpha_lut(factor)))
+        return layer
+    
+    def _paste_overlay(self, image, entry):
+        """
+        将裁剪后的覆盖层混合到图片上（原地修改），只转换覆盖层所在的区域
+        
+        参数:
+            image: RGB或RGBA模式的PIL Image对象
+            entry: crop_overlay返回的 (裁剪后的覆盖层, 左上角坐标)，为None时不做处理
+        """
+        if entry is None or entry[0] is None:
+            return image
+        crop, (x, y) = entry
+        if image.mode == 'RGB':
+            # 目标不透明时，以覆盖层自身为蒙版粘贴与alpha_composite结果相同，且无需转换区域
+            image.paste(crop, (x, y), crop)
+            return image
+        box = (x, y, x + crop.width, y + crop.height)
+        region = image.crop(box).convert('RGBA')
+        region.alpha_composite(crop)
+        image.paste(region.convert(image.mode), box)
+        return image
+    
+    def _get_working_image(self, image, mode, in_place=False):
+        """
+        返回可原地修改的工作图片
+        
+        模式不同时转换一次（转换本身产生新图片）；模式相同时，in_place为True直接使用原图，否则复制一份。
+        """
+        if image.mode != mode:
+            return image.convert(mode)
+        return image if in_place else image.copy()
+    
+    def _paste_placements(self, canvas, placements, origin=(0, 0)):
+        """
+        将图层按位置粘贴到透明画布上
+        
+        参数:
+            canvas: RGBA画布，可以只是整图中的一部分
+            placements: [(图层, [(x, y), ...], 方式)]，坐标相对于整图；方式为"paste"（以自身为蒙版粘贴）
+                        或"alpha"（alpha_composite）
+            origin: 画布左上角在整图中的坐标，与画布不相交的位置直接跳过
+        """
+        origin_x, origin_y = origin
+        for layer, offsets, blend in placements:
+            for x, y in offsets:
+                x -= origin_x
+                y -= origin_y
+                if x >= canvas.width or y >= canvas.height or x + layer.width <= 0 or y + layer.height <= 0:
+                    continue
+                if blend == "alpha":
+                    # alpha_composite不接受负坐标，超出左上边界的部分先裁剪掉
+                    canvas.alpha_composite(layer, (max(0, x), max(0, y)), (max(0, -x), max(0, -y)))
+                else:
+                    canvas.paste(layer, (x, y), layer)
+        return canvas
+    
+    def _derive_seed(self, seed, image_path):
+        """
+        由样式种子和图片文件名派生每张图片的随机种子
+        
+        只使用文件名而不是完整路径，移动源目录后结果不变；样式种子为None时返回None（每次随机）。
+        """
+        if seed is None:
+            return None
+        name = os.path.basename(image_path)
+        digest = hashlib.sha256(f"{seed}:{name}".encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big")
+    
+    def _get_file_signature(self, path):
+        """文件的路径、大小和修改时间，用于缓存键；文件不可读时返回None"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (path, stat.st_size, stat.st_mtime_ns)
+    
+    def _get_rotated_size(self, size, rotation):
+        """计算图层旋转（expand=True）后的大小"""
+        width, height = size
+        if rotation % 360 == 0:
+            return width, height
+        angle = math.radians(rotation)
+        cos_a, sin_a = abs(math.cos(angle)), abs(math.sin(angle))
+        return (int(math.ceil(width * cos_a + height * sin_a)),
+                int(math.ceil(width * sin_a + height * cos_a)))
+    
+    def _get_encode_settings(self, encode_profile=None):
+        """
+        获取编码参数
+        
+        参数:
+            encode_profile: 配置名称（fast、balanced、smallest），
+                            或在默认配置基础上覆盖部分参数的字典
+        """
+        settings = dict(ENCODE_PROFILES[DEFAULT_ENCODE_PROFILE])
+        if isinstance(encode_profile, dict):
+            settings.update(encode_profile)
+        elif encode_profile:
+            if encode_profile not in ENCODE_PROFILES:
+                raise ValueError(f"未知的编码配置: {encode_profile}")
+            settings.update(ENCODE_PROFILES[encode_profile])
+        return settings
+    
+    def open_image(self, image_path, use_cache=True, output_path=None):
+        """
+        打开图片并读取需要保留的元数据
+        
+        EXIF方向在解码时应用一次，输出中的方向标签随之清除，
+        避免查看器再次旋转。像素布局与Pillow内部格式一致的未压缩图片以写时复制方式映射，
+        不解码也不进入缓存；其他图片的解码结果保存在image_cache中，
+        文件未修改时再次打开直接返回缓存的副本。批量处理中的读取只查询缓存，
+        未命中时直接返回解码结果，不放入缓存，也不多复制一次整帧。调用方可以原地修改返回的图片。
+        
+        参数:
+            use_cache: 是否使用内存映射和解码缓存，超大图片的分块处理不使用
+            output_path: 处理结果的输出路径；与源文件相同时不映射源文件
+        
+        返回:
+            (image, metadata): metadata包含format、exif、icc_profile和dpi
+        """
+        from_file = use_cache and isinstance(image_path, str)
+        cache = self.image_cache if from_file else None
+        with self._stage("decode") as stage:
+            if cache is not None:
+                cached = cache.get(image_path)
+                if cached is not None:
+                    return cached
+                signature = cache.get_signature(image_path)
+            
+            image = Image.open(image_path)
+            exif = image.getexif()
+            metadata = {
+                "format": image.format,
+                "icc_profile": image.info.get("icc_profile"),
+                "dpi": image.info.get("dpi"),
+                "exif": None,
+            }
+            
+            mapped = None
+            if exif.get(EXIF_ORIENTATION, 1) != 1:
+                image = ImageOps.exif_transpose(image)
+            else:
+                if from_file and self.mapped_io:
+                    mapped = map_image(image, output_path)
+                if mapped is not None:
+                    # 映射的图片不读取文件内容，也不进入缓存；
+                    # EXIF子IFD从源文件中读取，需要在关闭源文件之前序列化
+                    metadata["exif"] = self._get_exif_bytes(exif, metadata["format"])
+                    image.close()
+                    image = mapped
+                    cache = None
+                else:
+                    image.load()
+            if isinstance(image_path, str) and mapped is None:
+                stage.add_bytes(os.path.getsize(image_path))
+        
+        if mapped is None:
+            metadata["exif"] = self._get_exif_bytes(exif, metadata["format"])
+        
+        # 缓存中保留解码结果本身，调用方拿到副本；批量读取不放入缓存
+        store = cache is not None and not getattr(self._batch_reads, "active", False)
+        if store and cache.put(image_path, image, metadata, signature):
+            image = image.copy()
+        return image, metadata
+    
+    def _get_exif_bytes(self, exif, image_format):
+        """
+        序列化需要写入输出的EXIF，去掉方向标签和TIFF图像结构标签；没有剩余标签时返回None
+        
+        会修改exif，需在应用EXIF方向之后调用。
+        """
+        if image_format == "TIFF":
+            for tag in TIFF_STRUCTURE_TAGS:
+                exif.pop(tag, None)
+        exif.pop(EXIF_ORIENTATION, None)
+        return exif.tobytes() if exif else None
+    
+    def save_image(self, image, output_path, encode_profile=None, metadata=None):
+        """
+        保存图片，并写入由open_image读取的源图片元数据
+        
+        参数:
+            encode_profile: 输出编码配置（fast、balanced、smallest或参数字典）
+            metadata: open_image返回的元数据；输出路径没有可识别的扩展名时沿用源格式
+            
+        返回:
+            bool: 是否保存成功
+        """
+        return self._save_image(image, output_path, encode_profile, metadata)
+    
+    def _get_metadata_save_kwargs(self, image_format, metadata, mode=None):
+        """
+        根据输出格式筛选可写入的元数据参数
+        
+        mode为保存时的颜色模式，ICC配置文件的色彩空间与之不符时不写入配置文件。
+        """
+        kwargs = {}
+        if not metadata:
+            return kwargs
+        for key, formats in METADATA_FORMATS.items():
+            if metadata.get(key) and image_format in formats:
+                kwargs[key] = metadata[key]
+        if "icc_profile" in kwargs and not self._icc_profile_matches(kwargs["icc_profile"], mode):
+            # 显式传入None，避免Pillow沿用转换后图片info中的源配置文件
+            kwargs["icc_profile"] = None
+        return kwargs
+    
+    def _icc_profile_matches(self, icc_profile, mode):
+        """判断ICC配置文件的色彩空间是否与颜色模式一致，模式未知时视为一致"""
+        color_space = ICC_COLOR_SPACES.get(mode)
+        return color_space is None or icc_profile[16:20] == color_space
+    
+    def _get_temp_output_path(self, output_path):
+        """输出文件在同一目录下的临时文件路径，写完后由_replace_output重命名为目标文件"""
+        output_dir, filename = os.path.split(output_path)
+        return os.path.join(output_dir, f".{filename}.{uuid.uuid4().hex}.part")
+    
+    def _replace_output(self, temp_path, output_path):
+        """编码完成后原子替换目标文件，缓存中该路径的旧内容随之失效"""
+        os.replace(temp_path, output_path)
+        if self.image_cache is not None:
+            self.image_cache.invalidate(output_path)
+    
+    def _save_image(self, image, output_path, encode_profile=None, metadata=None):
+        """
+        保存图片，根据文件格式和编码配置设置不同的保存参数
+        
+        先编码到同目录下的临时文件，完成后再原子重命名为目标文件，
+        读取输出目录的程序不会看到写了一半的图片。
+        """
+        temp_path = None
+        try:
+            settings = self._get_encode_settings(encode_profile)
+            ext = os.path.splitext(output_path)[1].lower()
+            
+            # 根据扩展名确定格式，无法识别时沿用源格式，默认JPEG
+            image_format = Image.registered_extensions().get(ext)
+            if not image_format:
+                image_format = (metadata or {}).get("format") or "JPEG"
+            # JPEG不支持透明通道，RGBA和LA图片在编码前转换为RGB
+            saved_mode = 'RGB' if image_format == 'JPEG' and image.mode in ["RGBA", "LA"] else image.mode
+            save_kwargs = self._get_metadata_save_kwargs(image_format, metadata, saved_mode)
+            
+            temp_path = self._get_temp_output_path(output_path)
+            
+            with self._stage("encode") as stage:
+                if metadata is not None and write_mapped(image, temp_path, image_format):
+                    # 映射的源图片与输出格式相同：文件内容（含源元数据）直接写出，无需重新编码
+                    pass
+                elif image_format == 'JPEG':
+                    # JPEG不支持透明通道，需要转换为RGB模式
+                    if image.mode in ["RGBA", "LA"]:
+                        image = image.convert('RGB')
+                    image.save(temp_path, 'JPEG',
+                               quality=settings["jpeg_quality"],
+                               subsampling=settings["jpeg_subsampling"],
+                               optimize=settings["jpeg_optimize"],
+                               progressive=settings["jpeg_progressive"],
+                               **save_kwargs)
+                elif image_format == 'PNG':
+                    image.save(temp_path, 'PNG',
+                               optimize=settings["png_optimize"],
+                               compress_level=settings["png_compress_level"],
+                               **save_kwargs)
+                else:
+                    image.save(temp_path, image_format, **save_kwargs)
+                stage.add_bytes(os.path.getsize(temp_path))
+            
+            self._replace_output(temp_path, output_path)
             return True
         except Exception as e:
-            print(f"保存图片时出错: {str(e)}")
-            traceback.print_exc()
-            return False
\ No newline at end of file
+            report_error(logger, "保存图片时出错", e)
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
@@ -0,0 +1,152 @@
+"""
+批量处理清单模块
+在输出目录中记录每张图片的源文件签名、样式指纹和输出路径，
+用于跳过已是最新的输出并从中断处继续批量处理
+"""
+
+import os
+import json
+import hashlib
+import threading
+
+
+# 清单文件名（JSON Lines格式，每处理完一张图片追加一行）
+MANIFEST_FILENAME = ".vismark_manifest.jsonl"
+
+# 计算内容哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def style_fingerprint(style_params):
+    """根据水印样式参数生成稳定的指纹"""
+    payload = json.dumps(style_params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class BatchManifest:
+    """
+    批量处理清单
+
+    清单以追加方式写入，每条记录在对应输出完成后立即落盘，
+    中断的任务重新运行时只处理尚未完成或已过期的图片。
+    """
+
+    def __init__(self, output_dir, verify="stat"):
+        """
+        参数:
+            output_dir: 输出目录，清单文件保存在该目录中
+            verify: 源文件校验方式，"stat" 比较大小和修改时间，"hash" 比较内容哈希
+        """
+        if verify not in ("stat", "hash"):
+            raise ValueError(f"未知的校验方式: {verify}")
+        self.output_dir = output_dir
+        self.verify = verify
+        self.path = os.path.join(output_dir, MANIFEST_FILENAME)
+        self.entries = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._file = None
+        self._load()
+
+    def is_up_to_date(self, image_path, output_path, fingerprint):
+        """
+        判断图片的输出是否已是最新
+
+        源文件签名会暂存起来，处理完成后由record写入清单，无需再次读取源文件。
+        可在多个线程中并行调用；源文件不存在或无法读取时返回False，由后续处理报告错误。
+        """
+        key = self._key(image_path)
+        signature = self._source_signature(image_path)
+        if signature is None:
+            return False
+        with self._lock:
+            self._pending[key] = signature
+
+        entry = self.entries.get(key)
+        if not entry:
+            return False
+        return (entry.get("style") == fingerprint
+                and entry.get("source") == signature
+                and entry.get("output") == self._relative_output(output_path)
+                and os.path.exists(output_path))
+
+    def record(self, image_path, output_path, fingerprint):
+        """记录一张处理成功的图片并立即写入清单；源文件已无法读取时不记录"""
+        key = self._key(image_path)
+        with self._lock:
+            signature = self._pending.pop(key, None)
+        signature = signature or self._source_signature(image_path)
+        if signature is None:
+            return
+        entry = {
+            "path": key,
+            "source": signature,
+            "style": fingerprint,
+            "output": self._relative_output(output_path),
+        }
+        self.entries[key] = entry
+
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        """关闭清单文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def _load(self):
+        """读取已有清单，同一源文件以最后一条记录为准；记录冗余过多时压缩清单"""
+        if not os.path.exists(self.path):
+            return
+        line_count = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line_count += 1
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 中断时可能留下不完整的最后一行
+                    continue
+                self.entries[entry["path"]] = entry
+
+        if line_count > 2 * len(self.entries):
+            self._compact()
+
+    def _compact(self):
+        """重写清单，只保留每个源文件的最新记录"""
+        temp_path = self.path + ".part"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(temp_path, self.path)
+
+    def _key(self, image_path):
+        """源文件在清单中的键"""
+        return os.path.normcase(os.path.abspath(image_path))
+
+    def _relative_output(self, output_path):
+        """输出路径相对于输出目录的表示"""
+        return os.path.relpath(output_path, self.output_dir)
+
+    def _source_signature(self, image_path):
+        """计算源文件签名：大小和修改时间，或内容哈希；文件不存在或无法读取时返回None"""
+        try:
+            if self.verify == "hash":
+                digest = hashlib.sha256()
+                with open(image_path, "rb") as f:
+                    for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                        digest.update(chunk)
+                return "sha256:" + digest.hexdigest()
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        return f"stat:{stat.st_size}:{stat.st_mtime_ns}"
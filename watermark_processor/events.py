@@ -0,0 +1,158 @@
+"""
+日志与错误报告模块
+处理器通过logging输出事件，批量处理为每张图片输出一条带结构化字段的记录，
+失败原因按错误类别归类并随批量结果返回
+"""
+
+import sys
+import json
+import logging
+import threading
+
+from PIL import Image, UnidentifiedImageError
+
+
+# 包的根日志记录器，各模块使用其子记录器
+LOGGER_NAME = "watermark_processor"
+
+# 批量处理事件使用的日志记录器
+batch_logger = logging.getLogger(LOGGER_NAME + ".batch")
+
+# 错误类别
+ERROR_DECODE = "decode"            # 图片无法识别或已损坏
+ERROR_IO = "io"                    # 文件不存在、无权限或磁盘错误
+ERROR_MEMORY = "memory"            # 内存不足或图片超过像素上限
+ERROR_INVALID = "invalid_argument" # 参数不合法
+ERROR_INTERNAL = "internal"        # 其他异常
+ERROR_UNKNOWN = "unknown"          # 处理失败但没有记录到异常
+
+# 结构化记录中附加的字段
+EVENT_FIELDS = ("event", "label", "image", "output", "success", "error_class", "error",
+                "index", "total", "skipped", "failed", "summary")
+
+_last_error = threading.local()
+
+
+def classify_error(exc):
+    """将异常归类为错误类别字符串"""
+    if isinstance(exc, (MemoryError, Image.DecompressionBombError)):
+        return ERROR_MEMORY
+    if isinstance(exc, (UnidentifiedImageError, SyntaxError)):
+        return ERROR_DECODE
+    if isinstance(exc, OSError):
+        # Pillow解码截断或损坏的文件时抛出不带errno的OSError
+        return ERROR_IO if exc.errno is not None else ERROR_DECODE
+    if isinstance(exc, (ValueError, TypeError, KeyError)):
+        return ERROR_INVALID
+    return ERROR_INTERNAL
+
+
+def report_error(logger, message, exc, exc_info=True):
+    """
+    记录处理错误，并保存为当前线程最近一次的错误，供批量结果读取失败原因
+
+    参数:
+        logger: 调用方模块的日志记录器
+        message: 错误说明，例如"添加文字水印时出错"
+        exc: 捕获的异常
+        exc_info: 是否在日志中附带堆栈
+    """
+    error_class = classify_error(exc)
+    error = f"{message}: {type(exc).__name__}: {exc}"
+    _last_error.value = (error_class, error)
+    logger.error("%s: %s", message, exc, exc_info=exc_info,
+                 extra={"event": "error", "error_class": error_class, "error": error})
+
+
+def clear_last_error():
+    """清除当前线程最近一次的错误"""
+    _last_error.value = None
+
+
+def get_last_error():
+    """返回当前线程最近一次的错误 (error_class, error)，没有记录时返回None"""
+    return getattr(_last_error, "value", None)
+
+
+class BatchResult(tuple):
+    """
+    单张图片的批量处理结果
+
+    可按 (image_path, output_path, success) 解包，与之前返回的三元组兼容；
+    失败时error_class和error给出失败原因。
+    """
+
+    def __new__(cls, image_path, output_path, success, error_class=None, error=None):
+        result = tuple.__new__(cls, (image_path, output_path, success))
+        result.error_class = error_class
+        result.error = error
+        return result
+
+    def __getnewargs__(self):
+        return (self[0], self[1], self[2], self.error_class, self.error)
+
+    @property
+    def image_path(self):
+        return self[0]
+
+    @property
+    def output_path(self):
+        return self[1]
+
+    @property
+    def success(self):
+        return self[2]
+
+    def to_dict(self):
+        """转换为可写入JSON的字典"""
+        return {"image": self[0], "output": self[1], "success": self[2],
+                "error_class": self.error_class, "error": self.error}
+
+    def __repr__(self):
+        return (f"BatchResult(image_path={self[0]!r}, output_path={self[1]!r}, success={self[2]!r}, "
+                f"error_class={self.error_class!r}, error={self.error!r})")
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行JSON，包含结构化字段，便于日志采集和解析"""
+
+    def format(self, record):
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in EVENT_FIELDS:
+            if hasattr(record, field):
+                payload[field] = getattr(record, field)
+        if record.exc_info:
+            payload["traceback"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def configure_logging(level=logging.INFO, quiet=False, json_format=False, stream=None):
+    """
+    为水印处理器配置日志输出，重复调用时替换之前的配置
+
+    参数:
+        level: 日志级别
+        quiet: 安静模式，只输出警告和错误，不输出每张图片的进度
+        json_format: 是否每行输出一条JSON记录
+        stream: 输出流，默认为标准输出
+
+    返回:
+        添加的日志处理器
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    for handler in list(logger.handlers):
+        if getattr(handler, "_vismark_handler", False):
+            logger.removeHandler(handler)
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler._vismark_handler = True
+    handler.setFormatter(JsonFormatter() if json_format else logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.WARNING if quiet else level)
+    logger.propagate = False
+    return handler
@@ -0,0 +1,150 @@
+"""
+解码图片缓存模块
+GUI预览、切换批量图片和重新批量处理时会反复打开同一批源文件，
+缓存解码（并已应用EXIF方向）后的图片，按文件路径、大小和修改时间判断是否仍然有效，
+整个进程共用一个缓存实例
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+
+# 缓存占用的最大字节数
+DECODED_IMAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def get_image_nbytes(image):
+    """估算图片像素数据占用的字节数"""
+    bands = len(image.getbands())
+    bits = 1 if image.mode == "1" else 32 if image.mode in ("I", "F") else 8
+    return max(1, image.width * image.height * bands * bits // 8)
+
+
+class DecodedImageCache:
+    """
+    线程安全的解码图片LRU缓存
+
+    每个路径最多保留一项，文件大小或修改时间变化后旧项失效。缓存中的图片不会交给调用方，
+    get返回副本，调用方可以原地修改；单张超过预算的图片不缓存。
+    """
+
+    def __init__(self, max_bytes=DECODED_IMAGE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get_signature(self, path):
+        """文件的大小和修改时间；文件不可读时返回None"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def _lookup(self, path):
+        """返回仍然有效的缓存项 (签名, 图片, 元数据, 字节数)，并更新命中统计"""
+        signature = self.get_signature(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and signature is not None and entry[0] == signature:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                # 文件已被修改或删除
+                self._remove(path)
+            self.misses += 1
+            return None
+
+    def get(self, path):
+        """
+        获取缓存的图片
+
+        返回:
+            (图片副本, 元数据副本)；未缓存或文件已变化时返回None
+        """
+        entry = self._lookup(path)
+        if entry is None:
+            return None
+        return entry[1].copy(), dict(entry[2])
+
+    def peek(self, path):
+        """
+        返回缓存的 (图片, 元数据) 本身，不复制，调用方不得修改；
+        未缓存时返回None，不计入命中统计，也不改变淘汰顺序
+        """
+        signature = self.get_signature(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != signature:
+                return None
+            return entry[1], entry[2]
+
+    def put(self, path, image, metadata, signature=None):
+        """
+        缓存解码后的图片，缓存后调用方不得再修改image
+
+        参数:
+            signature: 解码前读取的文件签名，避免解码期间文件被替换后以新签名缓存旧内容；
+                       默认在此时读取
+
+        返回:
+            bool: 是否已缓存
+        """
+        if signature is None:
+            signature = self.get_signature(path)
+        if signature is None:
+            return False
+        nbytes = get_image_nbytes(image)
+        if nbytes > self.max_bytes:
+            return False
+
+        with self._lock:
+            if path in self._entries:
+                self._remove(path)
+            self._entries[path] = (signature, image, dict(metadata), nbytes)
+            self._total_bytes += nbytes
+            # 超出预算时淘汰最久未使用的图片
+            while self._total_bytes > self.max_bytes:
+                old_path = next(iter(self._entries))
+                self._remove(old_path)
+        return True
+
+    def invalidate(self, path):
+        """移除某个路径的缓存项，例如该文件即将被覆盖"""
+        with self._lock:
+            if path in self._entries:
+                self._remove(path)
+
+    def _remove(self, path):
+        """移除缓存项，调用方需持有锁"""
+        self._total_bytes -= self._entries.pop(path)[3]
+
+    def set_max_bytes(self, max_bytes):
+        """调整缓存预算，立即淘汰超出部分"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            while self._total_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    @property
+    def total_bytes(self):
+        """当前缓存占用的字节数"""
+        return self._total_bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+
+# 进程内共用的缓存实例，GUI预览和处理器接口都通过它读取源图片
+decoded_image_cache = DecodedImageCache()
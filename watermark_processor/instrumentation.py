@@ -0,0 +1,168 @@
+"""
+处理阶段计时模块
+记录每张图片在解码、字体加载、渲染、斜切、合成、DCT嵌入和编码等阶段的耗时与字节数，
+并按批次汇总百分位数；未启用时各阶段只有一次属性判断的开销
+"""
+
+import threading
+import time
+
+
+# 汇总报告中的百分位数
+PERCENTILES = (50, 90, 99)
+
+
+class _NullStage:
+    """未启用计时时使用的空阶段，所有操作均为空操作"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+    def add_bytes(self, nbytes):
+        pass
+
+
+NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """计时阶段，退出时将耗时和字节数记录到ProcessingStats"""
+
+    __slots__ = ("stats", "name", "nbytes", "start")
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+        self.nbytes = 0
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stats.record(self.name, time.perf_counter() - self.start, self.nbytes)
+        return False
+
+    def add_bytes(self, nbytes):
+        """记录本阶段读取或写入的字节数"""
+        self.nbytes += nbytes or 0
+
+
+def percentile(sorted_values, percent):
+    """计算已排序数据的百分位数（最近秩法）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(percent / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class ProcessingStats:
+    """
+    处理阶段统计
+
+    线程安全，批量处理的各个工作线程共用同一个对象。当前图片通过线程局部变量记录，
+    嵌套调用的各个处理方法无需传递图片路径。阶段可以嵌套，例如render包含skew。
+    """
+
+    def __init__(self, callback=None):
+        """
+        参数:
+            callback: 可选回调函数，每记录一个阶段调用一次，
+                      参数为字典 {"image", "stage", "seconds", "bytes"}（在工作线程中调用）
+        """
+        self.callback = callback
+        self._records = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def stage(self, name):
+        """返回计时上下文管理器，退出时记录到当前图片"""
+        return _Stage(self, name)
+
+    def begin_image(self, image_path):
+        """设置当前线程正在处理的图片"""
+        self._local.image = image_path
+
+    def end_image(self):
+        """清除当前线程正在处理的图片"""
+        self._local.image = None
+
+    def record(self, stage, seconds, nbytes=0):
+        """记录当前图片某个阶段的耗时（秒）和字节数"""
+        image = getattr(self._local, "image", None)
+        with self._lock:
+            stages = self._records.setdefault(image, {})
+            entry = stages.get(stage)
+            if entry is None:
+                stages[stage] = [seconds, nbytes]
+            else:
+                entry[0] += seconds
+                entry[1] += nbytes
+        if self.callback:
+            self.callback({"image": image, "stage": stage, "seconds": seconds, "bytes": nbytes})
+
+    def get_image_stats(self, image_path):
+        """返回某张图片各阶段的 {阶段: {"seconds", "bytes"}}"""
+        with self._lock:
+            stages = self._records.get(image_path, {})
+            return {stage: {"seconds": seconds, "bytes": nbytes} for stage, (seconds, nbytes) in stages.items()}
+
+    def summary(self, images=None):
+        """
+        按阶段汇总各图片的耗时
+
+        参数:
+            images: 只汇总这些图片，默认汇总全部
+
+        返回:
+            {阶段: {"count", "total", "mean", "p50", "p90", "p99", "max", "bytes"}}，时间单位为秒
+        """
+        with self._lock:
+            if images is None:
+                records = list(self._records.values())
+            else:
+                records = [self._records[image] for image in images if image in self._records]
+
+        per_stage = {}
+        for stages in records:
+            for stage, (seconds, nbytes) in stages.items():
+                values = per_stage.setdefault(stage, ([], [0]))
+                values[0].append(seconds)
+                values[1][0] += nbytes
+
+        result = {}
+        for stage, (durations, nbytes) in per_stage.items():
+            durations.sort()
+            total = sum(durations)
+            item = {
+                "count": len(durations),
+                "total": total,
+                "mean": total / len(durations),
+                "max": durations[-1],
+                "bytes": nbytes[0],
+            }
+            for percent in PERCENTILES:
+                item[f"p{percent}"] = percentile(durations, percent)
+            result[stage] = item
+        return result
+
+    def format_summary(self, images=None):
+        """将汇总结果格式化为文本表格（毫秒）"""
+        summary = self.summary(images)
+        lines = [f"{'阶段':<10}{'次数':>6}{'合计':>10}{'平均':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'最大':>9}{'字节数':>14}"]
+        for stage, item in sorted(summary.items(), key=lambda pair: -pair[1]["total"]):
+            lines.append(
+                f"{stage:<10}{item['count']:>6}{item['total'] * 1000:>10.1f}{item['mean'] * 1000:>9.1f}"
+                f"{item['p50'] * 1000:>9.1f}{item['p90'] * 1000:>9.1f}{item['p99'] * 1000:>9.1f}"
+                f"{item['max'] * 1000:>9.1f}{item['bytes']:>14}"
+            )
+        return "\n".join(lines)
+
+    def reset(self):
+        """清空所有记录"""
+        with self._lock:
+            self._records.clear()
@@ -3,19 +3,25 @@ Logo水印处理器类
 提供Logo水印的添加功能
 """
 
-import os
-import traceback
-import concurrent.futures
+import logging
 from PIL import Image
-from .base_processor import BaseWatermarkProcessor
+from .smart_placement import SmartPlacementProcessor
+from .overlay_cache import crop_overlay
+from .mapped_io import close_mapping
+from .watermark_style import WatermarkStyle, LogoStyle
+from .events import report_error
 
 
-class LogoWatermarkProcessor(BaseWatermarkProcessor):
+logger = logging.getLogger(__name__)
+
+
+class LogoWatermarkProcessor(SmartPlacementProcessor):
     """Logo水印处理器"""
     
     def add_logo_watermark(self, image_path, logo_path, output_path,
                          logo_size=100, position="center", opacity=50, rotation=0,
-                         flip_horizontal=False, flip_vertical=False, recolor_color=None):
+                         flip_horizontal=False, flip_vertical=False, recolor_color=None,
+                         encode_profile=None):
         """
         添加Logo水印到图片
         
@@ -24,40 +30,108 @@ class LogoWatermarkProcessor(BaseWatermarkProcessor):
             logo_path: Logo图片路径
             output_path: 输出图片路径
             logo_size: Logo大小
-            position: 水印位置
+            position: 水印位置，"smart" 表示按图片内容逐张计算最佳位置
             opacity: 透明度 (0-100)
             rotation: 旋转角度 (-180到180)
             flip_horizontal: 是否水平翻转
             flip_vertical: 是否垂直翻转
+            recolor_color: 重着色颜色，格式为 "#RRGGBB" 或 "#RRGGBBAA"
+            encode_profile: 输出编码配置（fast、balanced、smallest或参数字典）
             
         返回:
             bool: 是否成功添加水印
         """
         try:
-            # 打开原始图片
-            image = Image.open(image_path).convert("RGBA")
+            # 打开原始图片（应用EXIF方向并读取元数据）
+            image, metadata = self.open_image(image_path, output_path=output_path)
             
-            # 添加水印
+            # 添加水印（解码结果只在此处使用，直接在其上混合）
             watermarked_image = self.add_logo_watermark_to_image(
-                image, logo_path, logo_size, position, opacity, rotation, flip_horizontal, flip_vertical
+                image, logo_path, logo_size, position, opacity, rotation, flip_horizontal, flip_vertical,
+                recolor_color, in_place=True
             )
             
             # 保存图片
-            return self._save_image(watermarked_image, output_path)
+            try:
+                return self._save_image(watermarked_image, output_path, encode_profile, metadata)
+            finally:
+                # 保存完成后立即关闭源文件的内存映射
+                close_mapping(image)
         except Exception as e:
-            print(f"添加Logo水印时出错: {str(e)}")
-            traceback.print_exc()
+            report_error(logger, "添加Logo水印时出错", e)
             return False
     
     def add_logo_watermark_to_image(self, image, logo_path, logo_size=100,
                                     position="center", opacity=50, rotation=0,
                                     flip_horizontal=False, flip_vertical=False,
-                                    recolor_color=None):
+                                    recolor_color=None, in_place=False):
         """
         向Image对象添加Logo水印
         
         参数:
             recolor_color: 重着色颜色，格式为 "#RRGGBB" 或 "#RRGGBBAA"
+            in_place: 图片已是RGB或RGBA模式时直接在原图上混合，调用方不再需要原图时使用
+        """
+        # RGB和RGBA图片保持原模式，其他模式转换为RGBA（保留透明度）
+        with self._stage("convert"):
+            mode = image.mode if image.mode in ('RGB', 'RGBA') else 'RGBA'
+            watermarked_image = self._get_working_image(image, mode, in_place)
+        
+        render = lambda: self._render_logo_overlay(image, logo_path, logo_size, position, opacity, rotation,
+                                                   flip_horizontal, flip_vertical, recolor_color)
+        with self._stage("render"):
+            if position == "smart":
+                # 智能放置的位置取决于图片内容，不使用缓存
+                overlay = render()
+                entry = crop_overlay(overlay) if overlay is not None else None
+            else:
+                # 固定位置和全图覆盖时，相同Logo、样式和尺寸的覆盖层完全相同
+                key = ("logo", self._get_file_signature(logo_path), logo_size, position, opacity, rotation,
+                       flip_horizontal, flip_vertical, recolor_color, image.size)
+                entry = self.overlay_cache.get_or_render(key, render)
+        
+        if entry is None:
+            return image
+        with self._stage("composite"):
+            return self._paste_overlay(watermarked_image, entry)
+    
+    def _render_logo_overlay(self, image, logo_path, logo_size=100,
+                             position="center", opacity=50, rotation=0,
+                             flip_horizontal=False, flip_vertical=False,
+                             recolor_color=None):
+        """
+        渲染Logo水印的覆盖层（与原图相同大小的RGBA图层），Logo无法读取时返回None
+        """
+        placements = self._get_logo_placements(image, logo_path, logo_size, position, opacity, rotation,
+                                               flip_horizontal, flip_vertical, recolor_color)
+        if placements is None:
+            return None
+        
+        watermark_layer = Image.new('RGBA', image.size, (0, 0, 0, 0))
+        self._paste_placements(watermark_layer, placements)
+        return watermark_layer
+    
+    def _get_logo_placements(self, image, logo_path, logo_size=100,
+                             position="center", opacity=50, rotation=0,
+                             flip_horizontal=False, flip_vertical=False,
+                             recolor_color=None):
+        """
+        准备Logo并计算其在图片上的粘贴位置，Logo无法读取时返回None
+        
+        返回:
+            [(Logo图层, [(x, y), ...], "alpha")]，供_paste_placements使用
+        """
+        with self._stage("logo"):
+            logo = self._prepare_logo(logo_path, logo_size, opacity, rotation,
+                                      flip_horizontal, flip_vertical, recolor_color)
+        if logo is None:
+            return None
+        return [(logo, self._get_logo_offsets(image, logo, position, recolor_color), "alpha")]
+    
+    def _prepare_logo(self, logo_path, logo_size=100, opacity=50, rotation=0,
+                      flip_horizontal=False, flip_vertical=False, recolor_color=None):
+        """
+        读取Logo并应用重着色、缩放、旋转、翻转和透明度，Logo无法读取时返回None
         """
         # 打开Logo图片并确保转换为RGBA模式
         try:
@@ -70,9 +144,8 @@ class LogoWatermarkProcessor(BaseWatermarkProcessor):
                 logo = self._recolor_logo(logo, recolor_color)
                 
         except Exception as e:
-            print(f"处理Logo时出错: {str(e)}")
-            traceback.print_exc()
-            return image
+            report_error(logger, "处理Logo时出错", e)
+            return None
         
         # 调整Logo大小 - 始终锁定宽高比
         original_width, original_height = logo.size
@@ -97,13 +170,12 @@ class LogoWatermarkProcessor(BaseWatermarkProcessor):
             logo = logo.transpose(Image.FLIP_TOP_BOTTOM)
         
         # 调整透明度
-        alpha = logo.split()[3]
-        alpha = alpha.point(lambda p: p * (opacity / 100))
-        logo.putalpha(alpha)
-        
-        # 创建一个新图像用于合并
-        watermarked_image = image.copy()
+        self._apply_opacity(logo, opacity)
         
+        return logo
+    
+    def _get_logo_offsets(self, image, logo, position, recolor_color=None):
+        """计算Logo在图片上的粘贴位置（左上角坐标）列表"""
         # 处理全图覆盖模式
         if position == "full_cover":
             # 计算水印间距（水印大小的1.5倍）
@@ -111,22 +183,51 @@ class LogoWatermarkProcessor(BaseWatermarkProcessor):
             spacing_y = int(logo.height * 1.5)
             
             # 在整个图片上以网格形式重复添加水印
-            for x in range(-logo.width, watermarked_image.width + logo.width, spacing_x):
-                for y in range(-logo.height, watermarked_image.height + logo.height, spacing_y):
-                    watermarked_image.paste(logo, (x, y), logo)
+            return [(x, y)
+                    for x in range(-logo.width, image.width + logo.width, spacing_x)
+                    for y in range(-logo.height, image.height + logo.height, spacing_y)]
+        
+        # 常规位置模式
+        # 智能放置：按变换后的Logo大小在当前图片上计算最佳位置
+        if position == "smart":
+            position = self.find_smart_position(image, logo.size, self._get_recolor_rgb(recolor_color))
+        
+        # 获取水印位置
+        x, y = self._get_watermark_position(image.size, logo.size, position)
+        
+        # 确保水印在图像范围内
+        x_offset = max(0, min(x - logo.width // 2, image.width - logo.width))
+        y_offset = max(0, min(y - logo.height // 2, image.height - logo.height))
+        return [(x_offset, y_offset)]
+    
+    def get_logo_watermark_size(self, logo_path, logo_size=100, rotation=0):
+        """
+        获取Logo水印在图片上的实际大小（锁定宽高比缩放并包含旋转后的扩展）
+        """
+        with Image.open(logo_path) as logo:
+            original_width, original_height = logo.size
+        
+        if original_width > original_height:
+            new_width = logo_size
+            new_height = int(original_height * (logo_size / original_width))
         else:
-            # 常规位置模式
-            # 获取水印位置
-            x, y = self._get_watermark_position(image.size, logo.size, position)
-            
-            # 确保水印在图像范围内
-            x_offset = max(0, min(x - logo.width // 2, watermarked_image.width - logo.width))
-            y_offset = max(0, min(y - logo.height // 2, watermarked_image.height - logo.height))
-            
-            # 合并图像
-            watermarked_image.paste(logo, (x_offset, y_offset), logo)
+            new_height = logo_size
+            new_width = int(original_width * (logo_size / original_height))
         
-        return watermarked_image
+        return self._get_rotated_size((new_width, new_height), rotation)
+    
+    def _get_recolor_rgb(self, color):
+        """从重着色颜色中取出 "#RRGGBB" 部分，无效时返回None"""
+        if not color:
+            return None
+        color = color.lstrip('#')
+        if len(color) not in (6, 8):
+            return None
+        try:
+            int(color, 16)
+        except ValueError:
+            return None
+        return '#' + color[:6]
     
     def _recolor_logo(self, logo_image, color):
         """
@@ -167,24 +268,27 @@ class LogoWatermarkProcessor(BaseWatermarkProcessor):
         
         return recolored
     
-    def _process_single_logo_watermark(self, image_path, logo_path, output_path,
-                                      logo_size=100, position="center", opacity=50, rotation=0,
-                                      flip_horizontal=False, flip_vertical=False, recolor_color=None):
+    def _process_single_logo_watermark(self, image_path, output_path, style, encode_profile=None):
         """
         处理单张图片的Logo水印
         """
         # 添加水印
         success = self.add_logo_watermark(
-            image_path, logo_path, output_path,
-            logo_size, position, opacity, rotation,
-            flip_horizontal, flip_vertical, recolor_color
+            image_path, output_path=output_path, encode_profile=encode_profile, **style.logo_kwargs()
         )
         return (image_path, output_path, success)
     
+    def _transform_logo_watermark(self, image, image_path, style):
+        """
+        批量流水线的处理步骤：向已解码的图片原地添加Logo水印
+        """
+        return self.add_logo_watermark_to_image(image, in_place=True, **style.logo_kwargs())
+    
     def batch_add_logo_watermark(self, image_paths, logo_path, output_dir,
                                 logo_size=100, position="center", opacity=50, rotation=0,
                                 flip_horizontal=False, flip_vertical=False, 
-                                recolor_color=None, progress_callback=None):
+                                recolor_color=None, progress_callback=None, encode_profile=None,
+                                naming=None, incremental=False, manifest_verify="stat"):
         """
         批量添加Logo水印（多线程优化版）
         
@@ -199,35 +303,17 @@ class LogoWatermarkProcessor(BaseWatermarkProcessor):
             flip_horizontal: 是否水平翻转
             flip_vertical: 是否垂直翻转
             progress_callback: 进度回调函数，接收已完成数量和总数
+            encode_profile: 输出编码配置（fast、balanced、smallest或参数字典），整批共用
+            naming: 输出命名模板（stem、mirror、hash或自定义模板字符串），默认沿用源文件名
+            incremental: 是否增量处理，根据输出目录中的清单跳过源文件和样式均未变化的图片
+            manifest_verify: 增量处理的源文件校验方式，"stat"（大小和修改时间）或 "hash"（内容哈希）
         """
-        results = []
-        print(f"开始批量添加Logo水印，共处理 {len(image_paths)} 张图片")
-        
-        # 准备参数列表
-        params = []
-        for image_path in image_paths:
-            # 获取输出文件名
-            filename = os.path.basename(image_path)
-            output_path = os.path.join(output_dir, filename)
-            params.append((image_path, logo_path, output_path, logo_size, 
-                          position, opacity, rotation, flip_horizontal, flip_vertical, recolor_color))
-        
-        # 使用多线程并行处理
-        with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-            # 提交所有任务
-            futures = [executor.submit(self._process_single_logo_watermark, *param) for param in params]
-            
-            # 收集结果
-            completed_count = 0
-            for future in concurrent.futures.as_completed(futures):
-                image_path, output_path, success = future.result()
-                results.append((image_path, output_path, success))
-                completed_count += 1
-                print(f"处理第 {completed_count}/{len(image_paths)} 张图片: {image_path} {'成功' if success else '失败'}")
-                
-                # 调用进度回调
-                if progress_callback:
-                    progress_callback(completed_count, len(image_paths))
-        
-        print(f"批量添加Logo水印完成，成功 {sum(1 for _, _, s in results if s)} 张，失败 {sum(1 for _, _, s in results if not s)} 张")
-        return results
\ No newline at end of file
+        style = WatermarkStyle(
+            watermark_type="logo",
+            logo=LogoStyle(path=logo_path, size=logo_size, recolor_color=recolor_color),
+            position=position, opacity=opacity, rotation=rotation,
+            flip_horizontal=flip_horizontal, flip_vertical=flip_vertical
+        )
+        return self._batch_with_style("Logo", self._process_single_logo_watermark, image_paths, output_dir, style,
+                                      progress_callback, encode_profile, naming, incremental, manifest_verify,
+                                      self._transform_logo_watermark)
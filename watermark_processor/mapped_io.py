@@ -0,0 +1,166 @@
+"""
+内存映射读写模块
+未压缩且像素布局与Pillow内部格式一致的源图片（8位L、RGBA、RGBX、CMYK的TIFF、BMP、PGM）
+以写时复制方式映射到内存，直接作为Pillow图片使用，不解码也不复制；水印只改动被覆盖的内存页，
+源文件不受影响。输出格式与源格式相同时，映射的文件内容（包括文件头和元数据）直接写入输出文件
+
+只映射本地磁盘上的文件：网络共享上的文件在映射期间被截断时，访问映射会触发SIGBUS；
+输出路径就是源文件时也不映射，Windows上打开的映射会阻止用新文件替换源文件。
+映射依赖Pillow的Image.core.map_buffer和Image._new，这两个内部接口不可用时回退为正常解码。
+保存完成后调用close_mapping立即关闭映射，不等待垃圾回收。
+"""
+
+import os
+import re
+import sys
+import mmap
+import collections
+from PIL import Image
+
+
+# 可以映射的格式
+MAPPED_FORMATS = ("TIFF", "BMP", "PPM")
+
+# Pillow内部存储布局与文件中原始数据相同的颜色模式；RGB在Pillow内部为每像素4字节，无法直接映射
+MAPPED_MODES = ("L", "RGBA", "RGBX", "CMYK")
+
+# 映射图片的来源：路径、格式、映射对象和映射时的图像核心对象
+MappedSource = collections.namedtuple("MappedSource", ["path", "format", "mapping", "core"])
+
+# Linux上可以映射的本地文件系统类型，其他类型（NFS、CIFS、FUSE等）不映射
+LOCAL_FILESYSTEMS = ("ext2", "ext3", "ext4", "xfs", "btrfs", "f2fs", "zfs", "jfs", "reiserfs",
+                     "bcachefs", "tmpfs", "ramfs", "overlay")
+
+# Windows上可以映射的驱动器类型：DRIVE_FIXED、DRIVE_RAMDISK
+LOCAL_DRIVE_TYPES = (3, 6)
+
+
+def _read_mount_types():
+    """读取Linux挂载表，返回{挂载点: 文件系统类型}"""
+    mounts = {}
+    with open("/proc/self/mounts", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) >= 3:
+                # 挂载点中的空格等字符以八进制转义
+                mount_point = re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), fields[1])
+                mounts[mount_point] = fields[2]
+    return mounts
+
+
+def is_local_file(path):
+    """
+    判断文件是否位于本地磁盘
+
+    Windows按驱动器类型判断，UNC路径视为网络文件；Linux按挂载表中的文件系统类型判断；
+    其他平台或无法判断时返回False
+    """
+    path = os.path.realpath(path)
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            drive = os.path.splitdrive(path)[0]
+            if not drive or drive.startswith(("\\\\", "//")):
+                return False
+            return ctypes.windll.kernel32.GetDriveTypeW(drive + "\\") in LOCAL_DRIVE_TYPES
+        if sys.platform.startswith("linux"):
+            mounts = _read_mount_types()
+            # 路径所在的挂载点是最长的匹配前缀
+            mount_point = max((point for point in mounts
+                               if path == point or path.startswith(point.rstrip("/") + "/")),
+                              key=len, default=None)
+            return mount_point is not None and mounts[mount_point] in LOCAL_FILESYSTEMS
+    except (OSError, AttributeError):
+        pass
+    return False
+
+
+def _same_file(path, other_path):
+    """两个路径是否指向同一个文件"""
+    try:
+        return os.path.samefile(path, other_path)
+    except OSError:
+        return os.path.normcase(os.path.realpath(path)) == os.path.normcase(os.path.realpath(other_path))
+
+
+def map_image(source, output_path=None):
+    """
+    以写时复制方式映射已打开（尚未解码）的未压缩图片
+
+    参数:
+        source: Image.open返回的图片，需由文件路径打开；调用方负责检查EXIF方向并关闭source
+        output_path: 输出路径；与源文件相同时不映射
+
+    返回:
+        映射的图片；格式、压缩方式或像素布局不支持映射、文件不在本地磁盘上时返回None
+    """
+    if (source.format not in MAPPED_FORMATS or source.mode not in MAPPED_MODES
+            or not isinstance(source.filename, str) or len(source.tile) != 1
+            or getattr(source, "n_frames", 1) != 1):
+        return None
+    if output_path is not None and _same_file(source.filename, output_path):
+        return None
+    if not is_local_file(source.filename):
+        return None
+    tile = source.tile[0]
+    args = (tile.args, 0, 1) if isinstance(tile.args, str) else tuple(tile.args)
+    if (tile.codec_name != "raw" or tile.extents != (0, 0) + source.size
+            or len(args) < 3 or args[0] != source.mode):
+        return None
+
+    with open(source.filename, "rb") as f:
+        # ACCESS_COPY：写入只修改进程私有的内存页，不会写回源文件
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    try:
+        core = Image.core.map_buffer(mapping, source.size, "raw", tile.offset, args[:3])
+        # Image.frombuffer会把映射图片标记为只读，第一次写入时复制整张图片；这里保持可写
+        image = Image.new(source.mode, (0, 0))._new(core)
+    except (ValueError, AttributeError, TypeError):
+        # 文件被截断、数据不足，或当前Pillow版本没有这两个内部接口
+        mapping.close()
+        return None
+
+    image._mapped_source = MappedSource(source.filename, source.format, mapping, core)
+    return image
+
+
+def close_mapping(image):
+    """
+    关闭映射图片的内存映射，图片随之关闭，不能再使用；不是映射图片时不做任何操作
+    """
+    source = getattr(image, "_mapped_source", None)
+    if source is None:
+        return
+    del image._mapped_source
+    mapping = source.mapping
+    # 映射只有在没有图像核心对象引用时才能关闭
+    del source
+    image.close()
+    try:
+        mapping.close()
+    except BufferError:
+        # 仍有由映射派生的对象在使用，交给垃圾回收
+        pass
+
+
+def get_mapped_source(image):
+    """图片仍是映射本身（没有被转换或替换）时返回MappedSource，否则返回None"""
+    source = getattr(image, "_mapped_source", None)
+    if source is None or image.im is not source.core:
+        return None
+    return source
+
+
+def write_mapped(image, output_path, image_format):
+    """
+    输出格式与源格式相同时，把映射的文件内容直接写入output_path
+
+    返回:
+        bool: 是否已写出；返回False时调用方需正常编码
+    """
+    source = get_mapped_source(image)
+    if source is None or source.format != image_format:
+        return False
+    with open(output_path, "wb") as f:
+        f.write(source.mapping)
+    return True
@@ -0,0 +1,94 @@
+"""
+批量输出命名模块
+根据命名模板为批量处理的每张图片生成不冲突的输出路径
+"""
+
+import os
+import hashlib
+
+
+# 预置命名模板
+# 可用占位符: {stem} 文件名主体, {ext} 扩展名, {reldir} 相对源根目录的子目录, {hash} 源路径哈希
+NAMING_TEMPLATES = {
+    "stem": "{stem}{ext}",
+    "mirror": "{reldir}/{stem}{ext}",
+    "hash": "{stem}_{hash}{ext}",
+}
+
+DEFAULT_NAMING = "stem"
+
+
+class OutputNamer:
+    """
+    批量输出命名器
+
+    在内存中记录本批次已分配的文件名，重名时按 {stem}_{n} 追加序号，
+    不需要对每个候选名称调用os.path.exists。
+    """
+
+    def __init__(self, output_dir, naming=None, source_root=None):
+        """
+        参数:
+            output_dir: 输出目录
+            naming: 预置模板名称（stem、mirror、hash）或自定义模板字符串
+            source_root: 源图片的根目录，mirror模板据此计算相对目录
+        """
+        self.output_dir = output_dir
+        self.template = NAMING_TEMPLATES.get(naming or DEFAULT_NAMING, naming)
+        self.source_root = source_root
+        self._reserved = set()
+        self._next_index = {}
+
+    def assign(self, image_path):
+        """为源图片分配一个本批次内唯一的输出路径"""
+        relative_path = self._render(image_path)
+        key = os.path.normcase(relative_path)
+
+        if key in self._reserved:
+            # 重名时从上次使用的序号继续，避免逐个探测
+            base, ext = os.path.splitext(relative_path)
+            index = self._next_index.get(key, 1)
+            while True:
+                candidate = f"{base}_{index}{ext}"
+                index += 1
+                if os.path.normcase(candidate) not in self._reserved:
+                    break
+            self._next_index[key] = index
+            relative_path = candidate
+            key = os.path.normcase(candidate)
+
+        self._reserved.add(key)
+        return os.path.join(self.output_dir, relative_path)
+
+    def assign_all(self, image_paths):
+        """按顺序为一组源图片分配输出路径，并创建所需的子目录"""
+        output_paths = [self.assign(image_path) for image_path in image_paths]
+        for directory in {os.path.dirname(path) for path in output_paths}:
+            os.makedirs(directory, exist_ok=True)
+        return output_paths
+
+    def _render(self, image_path):
+        """按模板生成相对输出路径"""
+        filename = os.path.basename(image_path)
+        stem, ext = os.path.splitext(filename)
+        reldir = ""
+        if self.source_root:
+            reldir = os.path.relpath(os.path.dirname(os.path.abspath(image_path)), self.source_root)
+            if reldir == os.curdir or reldir.startswith(os.pardir):
+                reldir = ""
+        path_hash = hashlib.sha1(os.path.normcase(os.path.abspath(image_path)).encode("utf-8")).hexdigest()[:8]
+
+        relative_path = self.template.format(stem=stem, ext=ext, reldir=reldir, hash=path_hash)
+        return os.path.normpath(relative_path.lstrip("/\\"))
+
+    @staticmethod
+    def common_source_root(image_paths):
+        """计算一组源图片所在目录的公共根目录"""
+        directories = [os.path.dirname(os.path.abspath(path)) for path in image_paths]
+        if not directories:
+            return None
+        try:
+            return os.path.commonpath(directories)
+        except ValueError:
+            # 不同驱动器上的路径没有公共根目录
+            return None
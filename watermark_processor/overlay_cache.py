@@ -0,0 +1,87 @@
+"""
+覆盖层缓存模块
+同一样式在相同尺寸图片上（固定位置或全图覆盖）渲染出的覆盖层完全相同，
+缓存其非透明区域的裁剪结果，批量处理时每张图片只需一次混合
+"""
+
+import threading
+from collections import OrderedDict
+
+
+# 缓存占用的最大字节数（按RGBA每像素4字节估算）
+OVERLAY_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def crop_overlay(overlay):
+    """
+    将整图大小的RGBA覆盖层裁剪到非透明区域
+
+    返回:
+        (裁剪后的覆盖层, 左上角坐标)；覆盖层完全透明时裁剪结果为None
+    """
+    bbox = overlay.getbbox()
+    if bbox is None:
+        return (None, (0, 0))
+    return (overlay.crop(bbox), bbox[:2])
+
+
+class OverlayCache:
+    """
+    线程安全的覆盖层LRU缓存
+
+    键由调用方构造，需包含样式指纹和图片尺寸；值为crop_overlay的返回结果。
+    """
+
+    def __init__(self, max_bytes=OVERLAY_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render):
+        """
+        获取缓存的覆盖层，未命中时调用render()渲染并缓存
+
+        参数:
+            key: 缓存键
+            render: 无参数函数，返回整图大小的RGBA覆盖层，失败时返回None（不缓存）
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # 渲染在锁外进行，多个线程同时未命中时各自渲染，结果相同
+        overlay = render()
+        if overlay is None:
+            return None
+        entry = crop_overlay(overlay)
+
+        crop = entry[0]
+        size = crop.width * crop.height * 4 if crop is not None else 0
+        if size > self.max_bytes:
+            return entry
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = entry
+                self._sizes[key] = size
+                self._total_bytes += size
+                # 超出预算时淘汰最久未使用的覆盖层
+                while self._total_bytes > self.max_bytes:
+                    old_key, _ = self._entries.popitem(last=False)
+                    self._total_bytes -= self._sizes.pop(old_key)
+        return entry
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._total_bytes = 0
@@ -0,0 +1,179 @@
+"""
+批量处理流水线模块
+读取、处理和写出分别由独立的线程组完成，之间用有界队列连接：网络共享等慢速存储上，
+读取线程提前解码后续图片，写出线程在后台编码保存，处理线程不再等待I/O；
+队列满时上游阶段暂停，已解码但未写出的图片数量有上限。
+结束后报告各阶段的利用率，用于调整各阶段的线程数
+"""
+
+import time
+import queue
+import threading
+import concurrent.futures
+
+
+# 默认读取线程数：读取以等待I/O为主，多于处理线程时可以掩盖网络延迟
+PIPELINE_READ_WORKERS = 4
+
+# 默认写出线程数
+PIPELINE_WRITE_WORKERS = 2
+
+# 线程退出信号
+_STOP = object()
+
+
+class BatchPipeline:
+    """
+    读取 → 处理 → 写出三段流水线
+
+    每个阶段函数的签名为 stage(item, payload)，返回 (result, payload)：
+    result不为None时该项到此结束，result作为submit返回的Future的结果；
+    否则payload传给下一阶段。写出阶段必须返回result。阶段函数应自行处理异常，
+    未处理的异常会设置到Future上。
+    """
+
+    def __init__(self, read, process, write, read_workers=PIPELINE_READ_WORKERS,
+                 process_workers=1, write_workers=PIPELINE_WRITE_WORKERS, queue_size=None):
+        """
+        参数:
+            read, process, write: 各阶段函数
+            read_workers, process_workers, write_workers: 各阶段线程数
+            queue_size: 读取→处理、处理→写出两个队列的容量，默认等于处理线程数
+        """
+        self.stages = (("read", read, read_workers),
+                       ("process", process, process_workers),
+                       ("write", write, write_workers))
+        self.queue_size = queue_size or process_workers
+        # 输入队列不设上限，同时提交的数量由调用方按内存预算控制
+        self._queues = [queue.Queue(), queue.Queue(self.queue_size), queue.Queue(self.queue_size)]
+        self._metrics = {name: {"items": 0, "busy": 0.0, "starved": 0.0, "blocked": 0.0, "peak_queue": 0}
+                         for name, _, _ in self.stages}
+        self._remaining = [workers for _, _, workers in self.stages]
+        self._lock = threading.Lock()
+        self._threads = []
+        self._started = None
+        self._elapsed = None
+
+    @property
+    def capacity(self):
+        """流水线中（各阶段线程和阶段间队列）最多同时容纳的项数"""
+        return sum(workers for _, _, workers in self.stages) + 2 * self.queue_size
+
+    def start(self):
+        """启动各阶段线程"""
+        self._started = time.perf_counter()
+        for index, (name, _, workers) in enumerate(self.stages):
+            for number in range(workers):
+                thread = threading.Thread(target=self._worker, args=(index,),
+                                          name=f"vismark-{name}-{number}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, item):
+        """提交一项，返回在写出完成（或中途失败）时完成的Future"""
+        future = concurrent.futures.Future()
+        self._queues[0].put((item, None, future))
+        with self._lock:
+            metrics = self._metrics["read"]
+            metrics["peak_queue"] = max(metrics["peak_queue"], self._queues[0].qsize())
+        return future
+
+    def close(self):
+        """等待已提交的项全部完成后停止各阶段线程"""
+        if self._started is None:
+            return
+        for _ in range(self.stages[0][2]):
+            self._queues[0].put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._elapsed is None:
+            self._elapsed = time.perf_counter() - self._started
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
+
+    def _worker(self, index):
+        """阶段线程：从输入队列取项，处理后交给下一阶段"""
+        name, func, _ = self.stages[index]
+        source = self._queues[index]
+        target = self._queues[index + 1] if index + 1 < len(self._queues) else None
+        metrics = self._metrics[name]
+        next_metrics = self._metrics[self.stages[index + 1][0]] if target is not None else None
+
+        while True:
+            wait_start = time.perf_counter()
+            entry = source.get()
+            busy_start = time.perf_counter()
+            if entry is _STOP:
+                break
+            item, payload, future = entry
+            try:
+                result, payload = func(item, payload)
+            except Exception as e:
+                result, payload = None, None
+                future.set_exception(e)
+            else:
+                if result is not None or target is None:
+                    future.set_result(result)
+            busy_end = time.perf_counter()
+
+            # 队列已满时在此等待，下游阶段是瓶颈
+            if target is not None and not future.done():
+                target.put((item, payload, future))
+            handoff_end = time.perf_counter()
+
+            with self._lock:
+                metrics["items"] += 1
+                metrics["starved"] += busy_start - wait_start
+                metrics["busy"] += busy_end - busy_start
+                metrics["blocked"] += handoff_end - busy_end
+                if next_metrics is not None:
+                    next_metrics["peak_queue"] = max(next_metrics["peak_queue"], target.qsize())
+
+        # 本阶段最后一个线程退出时通知下一阶段的全部线程
+        with self._lock:
+            self._remaining[index] -= 1
+            last = self._remaining[index] == 0
+        if last and target is not None:
+            for _ in range(self.stages[index + 1][2]):
+                target.put(_STOP)
+
+    def utilization(self):
+        """
+        各阶段的利用率
+
+        返回:
+            {阶段: {"workers", "items", "busy", "starved", "blocked", "utilization", "peak_queue"}}，
+            时间单位为秒；utilization = busy / (workers × 流水线运行时间)。
+            处理阶段利用率低而读取或写出阶段利用率高时，应增加对应阶段的线程数；
+            blocked表示等待下游队列的时间，starved表示等待上游输入的时间
+        """
+        if self._started is None:
+            elapsed = 0.0
+        else:
+            elapsed = self._elapsed if self._elapsed is not None else time.perf_counter() - self._started
+        report = {}
+        with self._lock:
+            for name, _, workers in self.stages:
+                item = dict(self._metrics[name])
+                item["workers"] = workers
+                item["utilization"] = item["busy"] / (workers * elapsed) if elapsed > 0 else 0.0
+                report[name] = item
+        return report
+
+    def format_utilization(self):
+        """将利用率格式化为文本表格（时间单位为毫秒）"""
+        lines = [f"{'阶段':<10}{'线程':>6}{'项数':>8}{'利用率':>9}{'忙碌':>10}{'等待输入':>10}{'等待下游':>10}{'队列峰值':>9}"]
+        for name, item in self.utilization().items():
+            lines.append(
+                f"{name:<10}{item['workers']:>6}{item['items']:>8}{item['utilization']:>9.0%}"
+                f"{item['busy'] * 1000:>10.1f}{item['starved'] * 1000:>10.1f}{item['blocked'] * 1000:>10.1f}"
+                f"{item['peak_queue']:>9}"
+            )
+        return "\n".join(lines)
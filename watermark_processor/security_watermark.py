@@ -4,7 +4,7 @@
 """
 
 import os
-import traceback
+import logging
 import numpy as np
 import hashlib
 import hmac
@@ -14,6 +14,10 @@ from cryptography.hazmat.backends import default_backend
 from reedsolo import RSCodec
 from scipy.fftpack import dct, idct
 from PIL import Image
+from .events import report_error
+
+
+logger = logging.getLogger(__name__)
 
 
 class SecurityWatermarkProcessor:
@@ -71,8 +75,7 @@ class SecurityWatermarkProcessor:
             # 返回IV + 密文
             return iv + ciphertext
         except Exception as e:
-            print(f"加密水印数据时出错: {str(e)}")
-            traceback.print_exc()
+            report_error(logger, "加密水印数据时出错", e)
             return None
     
     def _generate_hmac(self, data, key):
@@ -110,7 +113,7 @@ class SecurityWatermarkProcessor:
             
             return decrypted_data.decode()
         except Exception as e:
-            print(f"解密水印数据时出错: {str(e)}")
+            report_error(logger, "解密水印数据时出错", e, exc_info=False)
             return None
     
     def extract_security_watermark(self, image, key):
@@ -241,7 +244,7 @@ class SecurityWatermarkProcessor:
                 decoded_bytes = rs_balanced.decode(extracted_bytes)
                 decoded_watermark = decoded_bytes[0] if isinstance(decoded_bytes, tuple) else decoded_bytes
             except Exception as e:
-                print(f"Reed-Solomon解码失败: {str(e)}")
+                logger.warning("Reed-Solomon解码失败: %s", e)
                 return None
             
             # 验证解码后的数据长度
@@ -261,14 +264,13 @@ class SecurityWatermarkProcessor:
             calculated_hmac = self._generate_hmac(decrypted_text, key)
             
             if extracted_hmac != calculated_hmac:
-                print("HMAC签名验证失败，水印可能被篡改")
+                logger.warning("HMAC签名验证失败，水印可能被篡改")
                 return None
             
             return decrypted_text
             
         except Exception as e:
-            print(f"提取安全水印时出错: {str(e)}")
-            traceback.print_exc()
+            report_error(logger, "提取安全水印时出错", e)
             return None
     
     def embed_security_watermark(self, image, watermark_text, key, alpha=0.02):
@@ -342,7 +344,7 @@ class SecurityWatermarkProcessor:
             )
             
             if watermark_length > available_space:
-                print("水印数据过长，无法嵌入到图像中")
+                logger.warning("水印数据过长，无法嵌入到图像中")
                 return image
             
             # 嵌入水印到DCT系数
@@ -428,6 +430,5 @@ class SecurityWatermarkProcessor:
             return result
             
         except Exception as e:
-            print(f"嵌入安全水印时出错: {str(e)}")
-            traceback.print_exc()
+            report_error(logger, "嵌入安全水印时出错", e)
             return image
\ No newline at end of file
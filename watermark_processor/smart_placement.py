@@ -0,0 +1,152 @@
+"""
+智能放置处理器类
+基于积分图对候选位置进行评分，选择最适合放置水印的区域
+"""
+
+import math
+import numpy as np
+from .base_processor import BaseWatermarkProcessor
+
+
+class SmartPlacementProcessor(BaseWatermarkProcessor):
+    """智能放置处理器"""
+
+    # 九个锚点位置，评分相同时优先选择锚点
+    ANCHOR_POSITIONS = ["top-left", "top", "top-right", "left", "center", "right",
+                        "bottom-left", "bottom", "bottom-right"]
+
+    # 滑动网格在每个方向上的最大候选数量
+    MAX_GRID_STEPS = 64
+
+    # 判定为边缘像素的梯度阈值
+    EDGE_THRESHOLD = 32
+
+    # 亮度代理图的最长边，评分在缩小后的代理图上进行
+    PROXY_MAX_SIDE = 512
+
+    def find_smart_position(self, image, watermark_size, watermark_color=None,
+                            variance_weight=1.0, edge_weight=1.0, contrast_weight=1.0,
+                            proxy_max_side=None):
+        """
+        为指定大小的水印选择最佳位置
+
+        对九个锚点和滑动网格上的每个候选位置，根据局部方差、边缘密度和
+        与水印颜色的对比度进行评分。所有统计量均通过积分图计算，
+        每个候选位置的评分开销为O(1)。
+
+        参数:
+            image: PIL Image对象
+            watermark_size: 水印实际大小 (宽, 高)
+            watermark_color: 水印颜色，格式为 "#RRGGBB"；为None时不计算对比度
+            variance_weight: 局部方差的权重（越平坦越好）
+            edge_weight: 边缘密度的权重（边缘越少越好）
+            contrast_weight: 对比度的权重（与水印颜色差异越大越好）
+            proxy_max_side: 亮度代理图的最长边，默认使用PROXY_MAX_SIDE；为0时在原图上计算
+
+        返回:
+            锚点名称（如 "bottom-right"）或水印中心坐标元组 (x, y)，
+            可直接作为position参数使用
+        """
+        if proxy_max_side is None:
+            proxy_max_side = self.PROXY_MAX_SIDE
+
+        # 在缩小后的亮度代理图上评分，水印大小按相同比例缩放
+        image_width, image_height = image.size
+        proxy = self._get_luminance_proxy(image, proxy_max_side)
+        proxy_height, proxy_width = proxy.shape
+        scale_x = image_width / proxy_width
+        scale_y = image_height / proxy_height
+        watermark_width = min(int(math.ceil(watermark_size[0] / scale_x)), proxy_width)
+        watermark_height = min(int(math.ceil(watermark_size[1] / scale_y)), proxy_height)
+        if watermark_width <= 0 or watermark_height <= 0:
+            return "center"
+
+        # 候选位置（水印左上角坐标），锚点在前
+        xs, ys = self._get_candidate_offsets((proxy_width, proxy_height),
+                                             (watermark_width, watermark_height))
+
+        scores = self._score_candidates(proxy, xs, ys, watermark_width, watermark_height,
+                                        watermark_color, variance_weight, edge_weight, contrast_weight)
+        best = int(np.argmax(scores))
+
+        if best < len(self.ANCHOR_POSITIONS):
+            return self.ANCHOR_POSITIONS[best]
+
+        # 将代理图上的中心坐标映射回原图
+        center_x = int((xs[best] + watermark_width / 2) * scale_x)
+        center_y = int((ys[best] + watermark_height / 2) * scale_y)
+        return (min(center_x, image_width), min(center_y, image_height))
+
+    def _get_luminance_proxy(self, image, max_side):
+        """生成缩小后的亮度代理图（numpy整数数组）"""
+        factor = int(math.ceil(max(image.size) / max_side)) if max_side else 1
+        if image.mode in ("1", "P"):
+            image = image.convert("L")
+        if factor > 1:
+            image = image.reduce(factor)
+        return np.asarray(image.convert("L"), dtype=np.int64)
+
+    def _get_candidate_offsets(self, image_size, watermark_size):
+        """生成候选位置的左上角坐标：九个锚点加滑动网格"""
+        image_width, image_height = image_size
+        watermark_width, watermark_height = watermark_size
+        max_x = image_width - watermark_width
+        max_y = image_height - watermark_height
+
+        # 锚点位置，与粘贴时的边界限制保持一致
+        anchor_xs, anchor_ys = [], []
+        for name in self.ANCHOR_POSITIONS:
+            x, y = self._get_watermark_position(image_size, watermark_size, name)
+            anchor_xs.append(max(0, min(x - watermark_width // 2, max_x)))
+            anchor_ys.append(max(0, min(y - watermark_height // 2, max_y)))
+
+        # 滑动网格，步长不小于水印大小的1/4
+        step_x = max(1, watermark_width // 4, max_x // self.MAX_GRID_STEPS)
+        step_y = max(1, watermark_height // 4, max_y // self.MAX_GRID_STEPS)
+        grid_x, grid_y = np.meshgrid(np.arange(0, max_x + 1, step_x), np.arange(0, max_y + 1, step_y))
+
+        xs = np.concatenate([np.array(anchor_xs, dtype=np.int64), grid_x.ravel()])
+        ys = np.concatenate([np.array(anchor_ys, dtype=np.int64), grid_y.ravel()])
+        return xs, ys
+
+    def _score_candidates(self, luminance, xs, ys, watermark_width, watermark_height,
+                          watermark_color, variance_weight, edge_weight, contrast_weight):
+        """使用积分图计算所有候选位置的评分"""
+        area = float(watermark_width * watermark_height)
+
+        # 边缘图：水平和垂直梯度之和超过阈值的像素
+        gradient = np.zeros_like(luminance)
+        gradient[:, 1:] += np.abs(np.diff(luminance, axis=1))
+        gradient[1:, :] += np.abs(np.diff(luminance, axis=0))
+        edges = (gradient > self.EDGE_THRESHOLD).astype(np.int64)
+
+        x2 = xs + watermark_width
+        y2 = ys + watermark_height
+
+        mean = self._window_sums(self._integral_image(luminance), xs, ys, x2, y2) / area
+        mean_sq = self._window_sums(self._integral_image(luminance * luminance), xs, ys, x2, y2) / area
+        std = np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+        edge_density = self._window_sums(self._integral_image(edges), xs, ys, x2, y2) / area
+
+        # 各项归一化到[0, 1]，平坦、边缘少、对比度高的区域得分高
+        scores = -variance_weight * (std / 127.5) - edge_weight * edge_density
+        if watermark_color:
+            watermark_luminance = self._color_luminance(watermark_color)
+            scores += contrast_weight * (np.abs(mean - watermark_luminance) / 255.0)
+        return scores
+
+    def _integral_image(self, array):
+        """计算积分图（首行首列补零）"""
+        integral = np.zeros((array.shape[0] + 1, array.shape[1] + 1), dtype=np.int64)
+        np.cumsum(np.cumsum(array, axis=0), axis=1, out=integral[1:, 1:])
+        return integral
+
+    def _window_sums(self, integral, x1, y1, x2, y2):
+        """根据积分图批量计算矩形区域的和"""
+        return (integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]).astype(np.float64)
+
+    def _color_luminance(self, color):
+        """将 "#RRGGBB" 颜色转换为亮度值（与PIL的L模式一致）"""
+        color = color.lstrip('#')
+        r, g, b = (int(color[i:i+2], 16) for i in (0, 2, 4))
+        return (r * 299 + g * 587 + b * 114) / 1000
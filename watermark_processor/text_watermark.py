@@ -3,17 +3,42 @@
 提供文字水印的添加功能
 """
 
-import os
-import traceback
-import concurrent.futures
+import logging
 import random
-from PIL import Image, ImageDraw, ImageFilter, ImageEnhance
-from .base_processor import BaseWatermarkProcessor
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageChops
+from .base_processor import DEFAULT_SEED
+from .smart_placement import SmartPlacementProcessor
+from .overlay_cache import crop_overlay
+from .mapped_io import close_mapping
+from .watermark_style import WatermarkStyle, TextStyle, ShadowStyle, SecurityStyle
+from .events import report_error
 
 
-class TextWatermarkProcessor(BaseWatermarkProcessor):
+logger = logging.getLogger(__name__)
+
+
+class TextWatermarkProcessor(SmartPlacementProcessor):
     """文字水印处理器"""
     
+    # 分散水印的随机旋转范围（±度）和量化步长
+    SCATTER_ANGLE_RANGE = 15
+    SCATTER_ANGLE_STEP = 5
+    
+    # 分散水印旋转变体和纹理块缓存的最大样式数
+    SCATTER_CACHE_SIZE = 16
+    
+    # 纹理水印：抖动纹理块数量、水印模糊半径、对比度系数和混合时每块的行数
+    TEXTURE_BANK_SIZE = 8
+    TEXTURE_BLUR_RADIUS = 0.5
+    TEXTURE_CONTRAST = 1.02
+    TEXTURE_STRIP_ROWS = 256
+    
+    def __init__(self):
+        super().__init__()
+        self._scatter_tile_cache = {}
+        self._texture_tile_cache = {}
+    
     def add_text_watermark(self, image_path, watermark_text, output_path, 
                           font_size=24, font_color="#000000", font_family="宋体",
                           bold=False, italic=False, underline=False,
@@ -21,7 +46,8 @@ class TextWatermarkProcessor(BaseWatermarkProcessor):
                           flip_horizontal=False, flip_vertical=False,
                           scattered_watermark=False, invisible_watermark=False, texture_watermark=False,
                           enable_shadow=False, shadow_color="#000000", shadow_offset_x=2, shadow_offset_y=2, shadow_opacity=30,
-                          security_watermark=False, security_key="", security_strength=0.02):
+                          security_watermark=False, security_key="", security_strength=0.02,
+                          encode_profile=None, seed=DEFAULT_SEED):
         """
         添加文字水印到图片
         
@@ -32,7 +58,7 @@ class TextWatermarkProcessor(BaseWatermarkProcessor):
             font_size: 字体大小
             font_color: 字体颜色
             font_style: 字体样式 (normal, bold, italic, bold italic)
-            position: 水印位置
+            position: 水印位置，"smart" 表示按图片内容逐张计算最佳位置
             opacity: 透明度 (0-100)
             rotation: 旋转角度 (-180到180)
             flip_horizontal: 是否水平翻转
@@ -45,28 +71,34 @@ class TextWatermarkProcessor(BaseWatermarkProcessor):
             shadow_offset_x: 阴影水平偏移量
             shadow_offset_y: 阴影垂直偏移量
             shadow_opacity: 阴影透明度 (0-100)
+            encode_profile: 输出编码配置（fast、balanced、smallest或参数字典）
+            seed: 分散和纹理水印的样式种子，与图片文件名一起派生每张图片的随机种子
             
         返回:
             bool: 是否成功添加水印
         """
         try:
-            # 打开原始图片
-            image = Image.open(image_path).convert("RGBA")
+            # 打开原始图片（应用EXIF方向并读取元数据）
+            image, metadata = self.open_image(image_path, output_path=output_path)
             
-            # 添加水印
+            # 添加水印（解码结果只在此处使用，直接转换为RGB后原地混合）
             watermarked_image = self.add_text_watermark_to_image(
                 image, watermark_text, font_size, font_color, font_family,
                 bold, italic, underline,
                 position, opacity, rotation, flip_horizontal, flip_vertical,
                 scattered_watermark, invisible_watermark, texture_watermark,
-                enable_shadow, shadow_color, shadow_offset_x, shadow_offset_y, shadow_opacity
+                enable_shadow, shadow_color, shadow_offset_x, shadow_offset_y, shadow_opacity,
+                seed=self._derive_seed(seed, image_path), in_place=True
             )
             
             # 保存图片
-            return self._save_image(watermarked_image, output_path)
+            try:
+                return self._save_image(watermarked_image, output_path, encode_profile, metadata)
+            finally:
+                # 保存完成后立即关闭源文件的内存映射
+                close_mapping(image)
         except Exception as e:
-            print(f"添加文字水印时出错: {str(e)}")
-            traceback.print_exc()
+            report_error(logger, "添加文字水印时出错", e)
             return False
     
     def add_text_watermark_to_image(self, image, watermark_text, font_size=24, 
@@ -75,279 +107,380 @@ class TextWatermarkProcessor(BaseWatermarkProcessor):
                                    position="center", opacity=50, rotation=0,
                                    flip_horizontal=False, flip_vertical=False,
                                    scattered_watermark=False, invisible_watermark=False, texture_watermark=False,
-                                   enable_shadow=False, shadow_color="#000000", shadow_offset_x=2, shadow_offset_y=2, shadow_opacity=30):
+                                   enable_shadow=False, shadow_color="#000000", shadow_offset_x=2, shadow_offset_y=2, shadow_opacity=30,
+                                   seed=DEFAULT_SEED, in_place=False):
         """
         向Image对象添加文字水印
+        
+        参数:
+            seed: 分散和纹理水印的随机种子，相同种子得到相同的结果
+            in_place: 图片已是RGB模式时直接在原图上混合，调用方不再需要原图时使用
         """
         try:
-            # 确保图片是RGB模式
-            if image.mode != 'RGB':
-                result = image.copy().convert('RGB')
-            else:
-                result = image.copy()
+            # 转换为RGB工作图片（非RGB图片的转换本身就产生新图片，不再额外复制）
+            with self._stage("convert"):
+                result = self._get_working_image(image, 'RGB', in_place)
             
-            # 应用特殊水印功能
+            # 应用特殊水印功能（渲染与合成在同一步中完成，整体计入render阶段）
             if scattered_watermark:
-                result = self.add_scattered_watermark(
-                    result, watermark_text, font_size, font_color, font_family,
-                    bold, italic, underline, opacity, rotation
-                )
+                with self._stage("render"):
+                    result = self.add_scattered_watermark(
+                        result, watermark_text, font_size, font_color, font_family,
+                        bold, italic, underline, opacity, rotation, seed, in_place=True
+                    )
             elif invisible_watermark:
-                result = self.add_invisible_watermark(
-                    result, watermark_text, font_size, font_color, font_family,
-                    position
-                )
+                with self._stage("render"):
+                    result = self.add_invisible_watermark(
+                        result, watermark_text, font_size, font_color, font_family,
+                        position, in_place=True
+                    )
             elif texture_watermark:
-                result = self.add_texture_watermark(
-                    result, watermark_text, font_size, font_color, font_family,
-                    opacity, rotation
-                )
+                with self._stage("render"):
+                    result = self.add_texture_watermark(
+                        result, watermark_text, font_size, font_color, font_family,
+                        opacity, rotation, seed, in_place=True
+                    )
             else:
                 # 继续普通水印的处理
-                # 创建文字图层
-                font = self._get_font(font_size, font_family, bold, italic, underline)
-                draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
-                bbox = draw.textbbox((0, 0), watermark_text, font=font)
-                text_width = bbox[2] - bbox[0]
-                text_height = bbox[3] - bbox[1]
-                
-                # 为加粗效果增加额外空间
-                bold_padding = 2 if bold else 0
-                text_width += bold_padding  # 为左右偏移各增加1像素
-                text_height += bold_padding  # 为上下偏移各增加1像素
-                
-                # 为斜体效果增加额外宽度，特别是针对中文
-                italic_padding = int((text_height + bold_padding) * 0.8) if italic else 0  # 增加80%的宽度用于斜体
-                text_width += italic_padding
-                
-                # 为下划线增加额外高度
-                underline_padding = int(font_size * 0.3) if underline else 0  # 增加更多空间用于下划线
-                text_height += underline_padding  # 增加30%的高度用于下划线
-                
-                # 额外增加更多安全空间，确保中文文本完整显示
-                text_width += 20  # 额外增加20像素宽度
-                text_height += 15  # 额外增加15像素高度
-                
-                # 对微软雅黑字体进行特殊处理，增加更多空间
-                if font_family == "微软雅黑":
-                    text_width += 10  # 微软雅黑字体额外增加10像素宽度
-                    text_height += 10  # 微软雅黑字体额外增加10像素高度
-                
-                # 计算文本在text_layer中的绘制位置
-                # 为斜体文本预留左侧空间
-                base_x = (bold_padding) + italic_padding // 2
-                base_y = (bold_padding + underline_padding // 2)  # 为加粗和下划线效果预留空间
-                
-                # 创建与原图相同大小的透明图层
-                watermark_layer = Image.new('RGBA', result.size, (0, 0, 0, 0))
+                render = lambda: self._render_text_overlay(
+                    result, watermark_text, font_size, font_color, font_family,
+                    bold, italic, underline, position, opacity, rotation,
+                    flip_horizontal, flip_vertical,
+                    enable_shadow, shadow_color, shadow_offset_x, shadow_offset_y, shadow_opacity
+                )
                 
-                # 处理阴影效果（如果需要）
-                if enable_shadow:
-                    # 创建阴影图层
-                    shadow_layer = Image.new('RGBA', (text_width, text_height), (0, 0, 0, 0))
-                    shadow_draw = ImageDraw.Draw(shadow_layer)
-                    
-                    # 绘制阴影文本
-                    shadow_draw.text((base_x, base_y), watermark_text, font=font, fill=shadow_color)
-                    
-                    # 应用阴影的加粗效果（如果需要）
-                    if bold:
-                        for dx in [-1, 1]:
-                            for dy in [-1, 1]:
-                                shadow_draw.text((base_x + dx, base_y + dy), watermark_text, font=font, fill=shadow_color)
-                    
-                    # 绘制阴影的下划线（如果需要）
-                    if underline:
-                        underline_thickness = max(2, int(font_size * 0.07))
-                        underline_spacing = int(font_size * 0.08)
-                        if font_family == "微软雅黑":
-                            underline_spacing += int(font_size * 0.12)
-                        baseline_y = base_y + bbox[3] + underline_spacing
-                        baseline_y = max(base_y + bbox[3], baseline_y)
-                        start_x = base_x + bbox[0]
-                        end_x = base_x + bbox[2]
-                        layer_width = shadow_layer.width
-                        layer_height = shadow_layer.height
-                        start_x = max(0, start_x)
-                        end_x = min(layer_width, end_x)
-                        baseline_y = max(underline_thickness, baseline_y)
-                        baseline_y = min(layer_height - 1, baseline_y)
-                        if end_x - start_x > 0:
-                            shadow_draw.rectangle([(start_x, baseline_y), (end_x, baseline_y + underline_thickness - 1)], 
-                                                 fill=shadow_color)
-                    
-                    # 处理阴影的斜体效果（如果需要）
-                    if italic:
-                        # 应用斜切变换 - 使用负的斜切因子实现正确的意大利斜体方向
-                        skew_factor = -0.3
-                        width, height = shadow_layer.size
-                        new_width = width + int(height * abs(skew_factor))
-                        
-                        # 创建一个更大的图像来容纳斜切后的阴影
-                        skew_shadow_layer = Image.new('RGBA', (new_width, height), (0, 0, 0, 0))
-                        
-                        # 逐像素应用斜切变换
-                        for y in range(height):
-                            for x in range(width):
-                                pixel = shadow_layer.getpixel((x, y))
-                                if pixel[3] > 0:  # 如果像素不透明
-                                    new_x = x + int(y * skew_factor) + italic_padding // 2
-                                    skew_shadow_layer.putpixel((new_x, y), pixel)
-                        
-                        # 更新shadow_layer为斜切后的图层
-                        shadow_layer = skew_shadow_layer
-                    
-                    # 应用阴影的旋转
-                    if rotation != 0:
-                        shadow_layer = shadow_layer.rotate(rotation, expand=True)
-                    
-                    # 应用阴影的翻转
-                    if flip_horizontal:
-                        shadow_layer = shadow_layer.transpose(Image.FLIP_LEFT_RIGHT)
-                    if flip_vertical:
-                        shadow_layer = shadow_layer.transpose(Image.FLIP_TOP_BOTTOM)
-                    
-                    # 调整阴影透明度
-                    shadow_alpha = shadow_layer.split()[3]
-                    shadow_alpha = shadow_alpha.point(lambda p: p * (shadow_opacity / 100))
-                    shadow_layer.putalpha(shadow_alpha)
-                    
-                    # 处理阴影的全图覆盖模式
-                    if position == "full_cover":
-                        # 计算水印间距（水印大小的1.5倍）
-                        spacing_x = int(shadow_layer.width * 1.5)
-                        spacing_y = int(shadow_layer.height * 1.5)
-                        
-                        # 在整个图片上以网格形式重复添加阴影
-                        for x in range(-shadow_layer.width, watermark_layer.width + shadow_layer.width, spacing_x):
-                            for y in range(-shadow_layer.height, watermark_layer.height + shadow_layer.height, spacing_y):
-                                watermark_layer.paste(shadow_layer, (x + shadow_offset_x, y + shadow_offset_y), shadow_layer)
+                with self._stage("render"):
+                    if position == "smart":
+                        # 智能放置的位置取决于图片内容，不使用缓存
+                        entry = crop_overlay(render())
                     else:
-                        # 常规位置模式
-                        # 计算阴影位置
-                        x, y = self._get_watermark_position(result.size, shadow_layer.size, position)
-                        
-                        # 确保阴影在图像范围内
-                        x_offset = max(0, min(x - shadow_layer.width // 2, watermark_layer.width - shadow_layer.width))
-                        y_offset = max(0, min(y - shadow_layer.height // 2, watermark_layer.height - shadow_layer.height))
-                        
-                        # 将阴影图层粘贴到透明图层
-                        watermark_layer.paste(shadow_layer, (x_offset + shadow_offset_x, y_offset + shadow_offset_y), shadow_layer)
-                
-                # 创建主文字图层
-                text_layer = Image.new('RGBA', (text_width, text_height), (0, 0, 0, 0))
-                draw = ImageDraw.Draw(text_layer)
-                
-                # 绘制主文字
-                draw.text((base_x, base_y), watermark_text, font=font, fill=font_color)
+                        # 固定位置和全图覆盖时，相同样式和尺寸的覆盖层完全相同
+                        key = ("text", watermark_text, font_size, font_color, font_family,
+                               bold, italic, underline, position, opacity, rotation,
+                               flip_horizontal, flip_vertical,
+                               enable_shadow, shadow_color, shadow_offset_x, shadow_offset_y, shadow_opacity,
+                               result.size)
+                        entry = self.overlay_cache.get_or_render(key, render)
                 
-                # 应用主文字的加粗效果（如果需要）
-                if bold:
-                    for dx in [-1, 1]:
-                        for dy in [-1, 1]:
-                            draw.text((base_x + dx, base_y + dy), watermark_text, font=font, fill=font_color)
+                # 合并图片
+                with self._stage("composite"):
+                    result = self._paste_overlay(result, entry)
+            
+            return result
+        except Exception as e:
+            report_error(logger, "添加文字水印时出错", e)
+            return image
+    
+    def _render_text_overlay(self, image, watermark_text, font_size=24,
+                             font_color="#000000", font_family="宋体",
+                             bold=False, italic=False, underline=False,
+                             position="center", opacity=50, rotation=0,
+                             flip_horizontal=False, flip_vertical=False,
+                             enable_shadow=False, shadow_color="#000000", shadow_offset_x=2, shadow_offset_y=2, shadow_opacity=30):
+        """
+        渲染普通文字水印的覆盖层（与原图相同大小的RGBA图层，包含阴影和文字）
+        """
+        placements = self._get_text_placements(
+            image, watermark_text, font_size, font_color, font_family,
+            bold, italic, underline, position, opacity, rotation,
+            flip_horizontal, flip_vertical,
+            enable_shadow, shadow_color, shadow_offset_x, shadow_offset_y, shadow_opacity
+        )
+        watermark_layer = Image.new('RGBA', image.size, (0, 0, 0, 0))
+        self._paste_placements(watermark_layer, placements)
+        return watermark_layer
+    
+    def _get_text_placements(self, image, watermark_text, font_size=24,
+                             font_color="#000000", font_family="宋体",
+                             bold=False, italic=False, underline=False,
+                             position="center", opacity=50, rotation=0,
+                             flip_horizontal=False, flip_vertical=False,
+                             enable_shadow=False, shadow_color="#000000", shadow_offset_x=2, shadow_offset_y=2, shadow_opacity=30):
+        """
+        渲染阴影和文字图层，并计算它们在图片上的粘贴位置
+        
+        只使用image的尺寸（智能放置时还会分析内容），不修改图片。
+        
+        返回:
+            [(图层, [(x, y), ...], "paste")]，按绘制顺序排列，供_paste_placements使用
+        """
+        placements = []
+        
+        # 创建文字图层
+        font = self._get_font(font_size, font_family, bold, italic, underline)
+        (text_width, text_height, bbox,
+         bold_padding, italic_padding, underline_padding) = self._measure_text_layer(
+            watermark_text, font, font_size, font_family, bold, italic, underline
+        )
+        
+        # 智能放置：按最终图层大小在当前图片上计算最佳位置
+        if position == "smart":
+            position = self.find_smart_position(
+                image,
+                self._get_text_layer_size(text_width, text_height, italic, rotation),
+                font_color
+            )
+        
+        # 计算文本在text_layer中的绘制位置
+        # 为斜体文本预留左侧空间
+        base_x = (bold_padding) + italic_padding // 2
+        base_y = (bold_padding + underline_padding // 2)  # 为加粗和下划线效果预留空间
+        
+        # 处理阴影效果（如果需要）
+        if enable_shadow:
+            # 创建阴影图层
+            shadow_layer = Image.new('RGBA', (text_width, text_height), (0, 0, 0, 0))
+            shadow_draw = ImageDraw.Draw(shadow_layer)
+            
+            # 绘制阴影文本
+            shadow_draw.text((base_x, base_y), watermark_text, font=font, fill=shadow_color)
+            
+            # 应用阴影的加粗效果（如果需要）
+            if bold:
+                for dx in [-1, 1]:
+                    for dy in [-1, 1]:
+                        shadow_draw.text((base_x + dx, base_y + dy), watermark_text, font=font, fill=shadow_color)
+            
+            # 绘制阴影的下划线（如果需要）
+            if underline:
+                underline_thickness = max(2, int(font_size * 0.07))
+                underline_spacing = int(font_size * 0.08)
+                if font_family == "微软雅黑":
+                    underline_spacing += int(font_size * 0.12)
+                baseline_y = base_y + bbox[3] + underline_spacing
+                baseline_y = max(base_y + bbox[3], baseline_y)
+                start_x = base_x + bbox[0]
+                end_x = base_x + bbox[2]
+                layer_width = shadow_layer.width
+                layer_height = shadow_layer.height
+                start_x = max(0, start_x)
+                end_x = min(layer_width, end_x)
+                baseline_y = max(underline_thickness, baseline_y)
+                baseline_y = min(layer_height - 1, baseline_y)
+                if end_x - start_x > 0:
+                    shadow_draw.rectangle([(start_x, baseline_y), (end_x, baseline_y + underline_thickness - 1)], 
+                                         fill=shadow_color)
+            
+            # 处理阴影的斜体效果（如果需要）
+            if italic:
+                # 应用斜切变换 - 使用负的斜切因子实现正确的意大利斜体方向
+                skew_factor = -0.3
+                width, height = shadow_layer.size
+                new_width = width + int(height * abs(skew_factor))
                 
-                # 绘制主文字的下划线（如果需要）
-                if underline:
-                    underline_thickness = max(2, int(font_size * 0.07))
-                    underline_spacing = int(font_size * 0.08)
-                    if font_family == "微软雅黑":
-                        underline_spacing += int(font_size * 0.12)
-                    baseline_y = base_y + bbox[3] + underline_spacing
-                    baseline_y = max(base_y + bbox[3], baseline_y)
-                    start_x = base_x + bbox[0]
-                    end_x = base_x + bbox[2]
-                    layer_width = text_layer.width
-                    layer_height = text_layer.height
-                    start_x = max(0, start_x)
-                    end_x = min(layer_width, end_x)
-                    baseline_y = max(underline_thickness, baseline_y)
-                    baseline_y = min(layer_height - 1, baseline_y)
-                    if end_x - start_x > 0:
-                        draw.rectangle([(start_x, baseline_y), (end_x, baseline_y + underline_thickness - 1)], 
-                                     fill=font_color)
+                # 创建一个更大的图像来容纳斜切后的阴影
+                skew_shadow_layer = Image.new('RGBA', (new_width, height), (0, 0, 0, 0))
                 
-                # 处理主文字的斜体效果（如果需要）
-                if italic:
-                    skew_factor = -0.3
-                    width, height = text_layer.size
-                    new_width = width + int(height * abs(skew_factor))
-                    
-                    skew_text_layer = Image.new('RGBA', (new_width, height), (0, 0, 0, 0))
-                    
+                # 逐像素应用斜切变换
+                with self._stage("skew"):
                     for y in range(height):
                         for x in range(width):
-                            pixel = text_layer.getpixel((x, y))
-                            if pixel[3] > 0:
+                            pixel = shadow_layer.getpixel((x, y))
+                            if pixel[3] > 0:  # 如果像素不透明
                                 new_x = x + int(y * skew_factor) + italic_padding // 2
-                                skew_text_layer.putpixel((new_x, y), pixel)
-                        
-                    text_layer = skew_text_layer
-                    draw = ImageDraw.Draw(text_layer)
-                
-                # 应用主文字的旋转
-                if rotation != 0:
-                    text_layer = text_layer.rotate(rotation, expand=True)
+                                skew_shadow_layer.putpixel((new_x, y), pixel)
                 
-                # 应用主文字的翻转
-                if flip_horizontal:
-                    text_layer = text_layer.transpose(Image.FLIP_LEFT_RIGHT)
-                if flip_vertical:
-                    text_layer = text_layer.transpose(Image.FLIP_TOP_BOTTOM)
+                # 更新shadow_layer为斜切后的图层
+                shadow_layer = skew_shadow_layer
+            
+            # 应用阴影的旋转
+            if rotation != 0:
+                shadow_layer = shadow_layer.rotate(rotation, expand=True)
+            
+            # 应用阴影的翻转
+            if flip_horizontal:
+                shadow_layer = shadow_layer.transpose(Image.FLIP_LEFT_RIGHT)
+            if flip_vertical:
+                shadow_layer = shadow_layer.transpose(Image.FLIP_TOP_BOTTOM)
+            
+            # 调整阴影透明度
+            self._apply_opacity(shadow_layer, shadow_opacity)
+            
+            # 处理阴影的全图覆盖模式
+            if position == "full_cover":
+                # 计算水印间距（水印大小的1.5倍）
+                spacing_x = int(shadow_layer.width * 1.5)
+                spacing_y = int(shadow_layer.height * 1.5)
                 
-                # 调整主文字透明度
-                alpha = text_layer.split()[3]
-                alpha = alpha.point(lambda p: p * (opacity / 100))
-                text_layer.putalpha(alpha)
+                # 在整个图片上以网格形式重复添加阴影
+                offsets = [(x + shadow_offset_x, y + shadow_offset_y)
+                           for x in range(-shadow_layer.width, image.width + shadow_layer.width, spacing_x)
+                           for y in range(-shadow_layer.height, image.height + shadow_layer.height, spacing_y)]
+            else:
+                # 常规位置模式
+                # 计算阴影位置
+                x, y = self._get_watermark_position(image.size, shadow_layer.size, position)
                 
-                # 处理主文字的全图覆盖模式
-                if position == "full_cover":
-                    spacing_x = int(text_layer.width * 1.5)
-                    spacing_y = int(text_layer.height * 1.5)
-                    
-                    for x in range(-text_layer.width, watermark_layer.width + text_layer.width, spacing_x):
-                        for y in range(-text_layer.height, watermark_layer.height + text_layer.height, spacing_y):
-                            watermark_layer.paste(text_layer, (x, y), text_layer)
-                else:
-                    # 常规位置模式
-                    x, y = self._get_watermark_position(result.size, text_layer.size, position)
-                    
-                    x_offset = max(0, min(x - text_layer.width // 2, watermark_layer.width - text_layer.width))
-                    y_offset = max(0, min(y - text_layer.height // 2, watermark_layer.height - text_layer.height))
-                    
-                    # 将主文字图层粘贴到透明图层
-                    watermark_layer.paste(text_layer, (x_offset, y_offset), text_layer)
+                # 确保阴影在图像范围内
+                x_offset = max(0, min(x - shadow_layer.width // 2, image.width - shadow_layer.width))
+                y_offset = max(0, min(y - shadow_layer.height // 2, image.height - shadow_layer.height))
+                offsets = [(x_offset + shadow_offset_x, y_offset + shadow_offset_y)]
+            
+            placements.append((shadow_layer, offsets, "paste"))
+        
+        # 创建主文字图层
+        text_layer = Image.new('RGBA', (text_width, text_height), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(text_layer)
+        
+        # 绘制主文字
+        draw.text((base_x, base_y), watermark_text, font=font, fill=font_color)
+        
+        # 应用主文字的加粗效果（如果需要）
+        if bold:
+            for dx in [-1, 1]:
+                for dy in [-1, 1]:
+                    draw.text((base_x + dx, base_y + dy), watermark_text, font=font, fill=font_color)
+        
+        # 绘制主文字的下划线（如果需要）
+        if underline:
+            underline_thickness = max(2, int(font_size * 0.07))
+            underline_spacing = int(font_size * 0.08)
+            if font_family == "微软雅黑":
+                underline_spacing += int(font_size * 0.12)
+            baseline_y = base_y + bbox[3] + underline_spacing
+            baseline_y = max(base_y + bbox[3], baseline_y)
+            start_x = base_x + bbox[0]
+            end_x = base_x + bbox[2]
+            layer_width = text_layer.width
+            layer_height = text_layer.height
+            start_x = max(0, start_x)
+            end_x = min(layer_width, end_x)
+            baseline_y = max(underline_thickness, baseline_y)
+            baseline_y = min(layer_height - 1, baseline_y)
+            if end_x - start_x > 0:
+                draw.rectangle([(start_x, baseline_y), (end_x, baseline_y + underline_thickness - 1)], 
+                             fill=font_color)
+        
+        # 处理主文字的斜体效果（如果需要）
+        if italic:
+            skew_factor = -0.3
+            width, height = text_layer.size
+            new_width = width + int(height * abs(skew_factor))
+            
+            skew_text_layer = Image.new('RGBA', (new_width, height), (0, 0, 0, 0))
+            
+            with self._stage("skew"):
+                for y in range(height):
+                    for x in range(width):
+                        pixel = text_layer.getpixel((x, y))
+                        if pixel[3] > 0:
+                            new_x = x + int(y * skew_factor) + italic_padding // 2
+                            skew_text_layer.putpixel((new_x, y), pixel)
                 
-                # 合并图片
-                result = Image.alpha_composite(result.convert('RGBA'), watermark_layer)
-                result = result.convert('RGB')
+            text_layer = skew_text_layer
+            draw = ImageDraw.Draw(text_layer)
+        
+        # 应用主文字的旋转
+        if rotation != 0:
+            text_layer = text_layer.rotate(rotation, expand=True)
+        
+        # 应用主文字的翻转
+        if flip_horizontal:
+            text_layer = text_layer.transpose(Image.FLIP_LEFT_RIGHT)
+        if flip_vertical:
+            text_layer = text_layer.transpose(Image.FLIP_TOP_BOTTOM)
+        
+        # 调整主文字透明度
+        self._apply_opacity(text_layer, opacity)
+        
+        # 处理主文字的全图覆盖模式
+        if position == "full_cover":
+            spacing_x = int(text_layer.width * 1.5)
+            spacing_y = int(text_layer.height * 1.5)
             
-            return result
-        except Exception as e:
-            print(f"添加文字水印时出错: {str(e)}")
-            traceback.print_exc()
-            return image
+            offsets = [(x, y)
+                       for x in range(-text_layer.width, image.width + text_layer.width, spacing_x)
+                       for y in range(-text_layer.height, image.height + text_layer.height, spacing_y)]
+        else:
+            # 常规位置模式
+            x, y = self._get_watermark_position(image.size, text_layer.size, position)
+            
+            x_offset = max(0, min(x - text_layer.width // 2, image.width - text_layer.width))
+            y_offset = max(0, min(y - text_layer.height // 2, image.height - text_layer.height))
+            offsets = [(x_offset, y_offset)]
+        
+        placements.append((text_layer, offsets, "paste"))
+        return placements
+    
+    def _measure_text_layer(self, watermark_text, font, font_size, font_family,
+                            bold=False, italic=False, underline=False):
+        """
+        计算普通文字水印图层的大小及各项样式预留空间
+        
+        返回:
+            (text_width, text_height, bbox, bold_padding, italic_padding, underline_padding)
+        """
+        draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+        bbox = draw.textbbox((0, 0), watermark_text, font=font)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        
+        # 为加粗效果增加额外空间
+        bold_padding = 2 if bold else 0
+        text_width += bold_padding  # 为左右偏移各增加1像素
+        text_height += bold_padding  # 为上下偏移各增加1像素
+        
+        # 为斜体效果增加额外宽度，特别是针对中文
+        italic_padding = int((text_height + bold_padding) * 0.8) if italic else 0  # 增加80%的宽度用于斜体
+        text_width += italic_padding
+        
+        # 为下划线增加额外高度
+        underline_padding = int(font_size * 0.3) if underline else 0  # 增加更多空间用于下划线
+        text_height += underline_padding  # 增加30%的高度用于下划线
+        
+        # 额外增加更多安全空间，确保中文文本完整显示
+        text_width += 20  # 额外增加20像素宽度
+        text_height += 15  # 额外增加15像素高度
+        
+        # 对微软雅黑字体进行特殊处理，增加更多空间
+        if font_family == "微软雅黑":
+            text_width += 10  # 微软雅黑字体额外增加10像素宽度
+            text_height += 10  # 微软雅黑字体额外增加10像素高度
+        
+        return text_width, text_height, bbox, bold_padding, italic_padding, underline_padding
+    
+    def get_text_watermark_size(self, watermark_text, font_size=24, font_family="宋体",
+                                bold=False, italic=False, underline=False, rotation=0):
+        """
+        获取普通文字水印在图片上的实际大小（包含斜体斜切和旋转后的扩展）
+        """
+        font = self._get_font(font_size, font_family, bold, italic, underline)
+        text_width, text_height = self._measure_text_layer(
+            watermark_text, font, font_size, font_family, bold, italic, underline
+        )[:2]
+        return self._get_text_layer_size(text_width, text_height, italic, rotation)
+    
+    def _get_text_layer_size(self, text_width, text_height, italic=False, rotation=0):
+        """根据文字图层大小计算斜切和旋转后的最终大小"""
+        if italic:
+            text_width += int(text_height * 0.3)
+        return self._get_rotated_size((text_width, text_height), rotation)
     
     def add_scattered_watermark(self, image, watermark_text, font_size=12, 
                                font_color="#000000", font_family="宋体",
                                bold=False, italic=False, underline=False,
-                               opacity=20, rotation=0):
+                               opacity=20, rotation=0, seed=DEFAULT_SEED, in_place=False):
         """
         向Image对象添加分散水印
         将水印文字分散到图像的多个位置
+        
+        参数:
+            seed: 随机种子，相同种子得到相同的分布；为None时每次随机
+            in_place: 图片已是RGB模式时直接在原图上混合
         """
         try:
-            if image.mode != 'RGB':
-                image = image.copy().convert('RGB')
-            else:
-                image = image.copy()
+            image = self._get_working_image(image, 'RGB', in_place)
             
-            # 创建文字图层
+            # 预先渲染的旋转变体：未指定旋转角度时在±15°内按步长量化
             font = self._get_font(font_size, font_family, bold, italic, underline)
-            draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
-            bbox = draw.textbbox((0, 0), watermark_text, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
+            if rotation == 0:
+                angles = tuple(range(-self.SCATTER_ANGLE_RANGE, self.SCATTER_ANGLE_RANGE + 1,
+                                     self.SCATTER_ANGLE_STEP))
+            else:
+                angles = (rotation,)
+            tile_bank = self._get_scatter_tile_bank(watermark_text, font, font_size, font_family,
+                                                    bold, italic, underline, font_color, opacity, angles)
+            rng = random.Random(seed)
             
             # 计算水印间距
             spacing_x = int(image.width * 0.2)
@@ -355,27 +488,11 @@ class TextWatermarkProcessor(BaseWatermarkProcessor):
             
             # 创建透明图层
             watermark_layer = Image.new('RGBA', image.size, (0, 0, 0, 0))
-            draw = ImageDraw.Draw(watermark_layer)
             
-            # 在多个位置添加水印
+            # 在多个位置添加水印，每个位置从变体中随机选择一个
             for x in range(0, image.width, spacing_x):
                 for y in range(0, image.height, spacing_y):
-                    # 随机旋转角度
-                    random_rotation = rotation + (random.randint(-15, 15) if rotation == 0 else 0)
-                    
-                    # 创建旋转后的文字图层
-                    text_layer = Image.new('RGBA', (text_width + 20, text_height + 20), (0, 0, 0, 0))
-                    text_draw = ImageDraw.Draw(text_layer)
-                    text_draw.text((10, 10), watermark_text, font=font, fill=font_color)
-                    
-                    # 旋转文字图层
-                    if random_rotation != 0:
-                        text_layer = text_layer.rotate(random_rotation, expand=True)
-                    
-                    # 调整透明度
-                    alpha = text_layer.split()[3]
-                    alpha = alpha.point(lambda p: p * (opacity / 100))
-                    text_layer.putalpha(alpha)
+                    text_layer = tile_bank[rng.randrange(len(tile_bank))]
                     
                     # 计算位置
                     pos_x = x - text_layer.width // 2
@@ -389,25 +506,53 @@ class TextWatermarkProcessor(BaseWatermarkProcessor):
                     watermark_layer.paste(text_layer, (pos_x, pos_y), text_layer)
             
             # 合并图片
-            result = Image.alpha_composite(image.convert('RGBA'), watermark_layer)
-            return result.convert('RGB')
+            return self._paste_overlay(image, crop_overlay(watermark_layer))
         except Exception as e:
-            print(f"添加分散水印时出错: {str(e)}")
-            traceback.print_exc()
+            report_error(logger, "添加分散水印时出错", e)
             return image
     
+    def _get_scatter_tile_bank(self, watermark_text, font, font_size, font_family,
+                               bold, italic, underline, font_color, opacity, angles):
+        """
+        获取分散水印的旋转变体列表（按样式缓存，同一样式的所有图片共用）
+        
+        文字图层只绘制一次并调整透明度，再按各个角度旋转
+        （旋转使用最近邻采样，先调整透明度再旋转结果不变）。
+        """
+        key = (watermark_text, font_size, font_family, bold, italic, underline, font_color, opacity, angles)
+        tile_bank = self._scatter_tile_cache.get(key)
+        if tile_bank is not None:
+            return tile_bank
+        
+        draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+        bbox = draw.textbbox((0, 0), watermark_text, font=font)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        
+        base_layer = Image.new('RGBA', (text_width + 20, text_height + 20), (0, 0, 0, 0))
+        text_draw = ImageDraw.Draw(base_layer)
+        text_draw.text((10, 10), watermark_text, font=font, fill=font_color)
+        self._apply_opacity(base_layer, opacity)
+        
+        tile_bank = [base_layer.rotate(angle, expand=True) if angle != 0 else base_layer for angle in angles]
+        
+        if len(self._scatter_tile_cache) >= self.SCATTER_CACHE_SIZE:
+            self._scatter_tile_cache.clear()
+        self._scatter_tile_cache[key] = tile_bank
+        return tile_bank
+    
     def add_invisible_watermark(self, image, watermark_text, font_size=16, 
                                font_color="#000000", font_family="宋体",
-                               position="center"):
+                               position="center", in_place=False):
         """
         向Image对象添加隐形水印
         使用极低的透明度或颜色差异
+        
+        参数:
+            in_place: 图片已是RGB模式时直接在原图上混合
         """
         try:
-            if image.mode != 'RGB':
-                image = image.copy().convert('RGB')
-            else:
-                image = image.copy()
+            image = self._get_working_image(image, 'RGB', in_place)
             
             # 创建文字图层
             font = self._get_font(font_size, font_family, False, False, False)
@@ -421,6 +566,8 @@ class TextWatermarkProcessor(BaseWatermarkProcessor):
             draw = ImageDraw.Draw(watermark_layer)
             
             # 计算位置
+            if position == "smart":
+                position = self.find_smart_position(image, (text_width, text_height), font_color)
             x, y = self._get_watermark_position(image.size, (text_width, text_height), position)
             
             # 使用极低的透明度
@@ -430,58 +577,40 @@ class TextWatermarkProcessor(BaseWatermarkProcessor):
             draw.text((x - text_width // 2, y - text_height // 2), watermark_text, font=font, fill=rgba_color)
             
             # 合并图片
-            result = Image.alpha_composite(image.convert('RGBA'), watermark_layer)
-            return result.convert('RGB')
+            return self._paste_overlay(image, crop_overlay(watermark_layer))
         except Exception as e:
-            print(f"添加隐形水印时出错: {str(e)}")
-            traceback.print_exc()
+            report_error(logger, "添加隐形水印时出错", e)
             return image
     
     def add_texture_watermark(self, image, watermark_text, font_size=24, 
                              font_color="#000000", font_family="宋体",
-                             opacity=30, rotation=0):
+                             opacity=30, rotation=0, seed=DEFAULT_SEED, in_place=False):
         """
         向Image对象添加纹理水印
         将水印嵌入到图像纹理中，实现更自然的融合效果
+        
+        所有纹理块颜色相同，只需在单通道的alpha图上叠加，
+        模糊和对比度调整也只作用于水印覆盖的区域，不改变照片其余部分。
+        
+        参数:
+            seed: 随机种子，相同种子得到相同的纹理排列；为None时每次随机
+            in_place: 图片已是RGB模式时直接在原图上混合
         """
         try:
-            if image.mode != 'RGB':
-                image = image.copy().convert('RGB')
-            else:
-                image = image.copy()
-            
-            # 创建文字图层
-            font = self._get_font(font_size, font_family, True, False, False)
-            draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
-            bbox = draw.textbbox((0, 0), watermark_text, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            
-            # 创建文字图像（使用更高的分辨率）
-            text_layer = Image.new('RGBA', (text_width + 100, text_height + 100), (0, 0, 0, 0))
-            text_draw = ImageDraw.Draw(text_layer)
-            text_draw.text((50, 50), watermark_text, font=font, fill=font_color)
-            
-            # 旋转文字图层
-            if rotation != 0:
-                text_layer = text_layer.rotate(rotation, expand=True)
-            
-            # 调整透明度（使用更低的透明度实现纹理效果）
-            alpha = text_layer.split()[3]
-            alpha = alpha.point(lambda p: p * (opacity / 200))  # 降低透明度，实现更自然的纹理
-            text_layer.putalpha(alpha)
-            
-            # 计算位置（使用平铺模式而不是单一位置）
-            result = image.copy()
+            image = self._get_working_image(image, 'RGB', in_place)
             
-            # 平铺水印，创建纹理效果
-            tile_width, tile_height = text_layer.size
+            # 预先生成的随机旋转和缩放的纹理块（只保留alpha通道）
+            tile_bank = self._get_texture_tile_bank(watermark_text, font_size, font_color, font_family,
+                                                    opacity, rotation)
+            rng = random.Random(seed)
             
-            # 计算平铺的行数和列数
+            # 计算平铺的行数和列数（以未抖动的纹理块大小为准）
+            tile_width, tile_height = tile_bank[0].size
             cols = max(2, image.width // (tile_width // 2))
             rows = max(2, image.height // (tile_height // 2))
             
-            # 在图像上平铺水印
+            # 在alpha图上平铺水印，screen混合等价于逐块alpha叠加
+            alpha_map = Image.new('L', image.size, 0)
             for i in range(rows):
                 for j in range(cols):
                     # 计算位置（交错排列，避免过于规律）
@@ -490,59 +619,118 @@ class TextWatermarkProcessor(BaseWatermarkProcessor):
                     
                     # 确保在图像范围内
                     if x_offset < image.width and y_offset < image.height:
-                        # 创建水印副本，避免修改原始水印
-                        watermark_tile = text_layer.copy()
-                        
-                        # 随机轻微旋转每个水印（±5度），增加自然感
-                        random_rotation = random.uniform(-5, 5)
-                        watermark_tile = watermark_tile.rotate(random_rotation, expand=True)
-                        
-                        # 随机轻微缩放（±10%），增加变化
-                        scale_factor = random.uniform(0.9, 1.1)
-                        new_width = int(watermark_tile.width * scale_factor)
-                        new_height = int(watermark_tile.height * scale_factor)
-                        watermark_tile = watermark_tile.resize((new_width, new_height), Image.LANCZOS)
-                        
-                        # 粘贴水印
-                        try:
-                            result.paste(watermark_tile, (x_offset, y_offset), watermark_tile)
-                        except:
-                            # 如果粘贴失败（例如超出边界），跳过
-                            pass
-            
-            # 应用轻微的模糊效果，使水印更自然地融入纹理
-            result = result.filter(ImageFilter.GaussianBlur(radius=0.5))
-            
-            # 调整整体对比度，使水印与图像更融合
-            enhancer = ImageEnhance.Contrast(result)
-            result = enhancer.enhance(1.02)
-            
-            return result.convert('RGB')
+                        tile = tile_bank[1 + rng.randrange(len(tile_bank) - 1)]
+                        self._screen_alpha(alpha_map, tile, (x_offset, y_offset))
+            
+            # 应用轻微的模糊效果，使水印更自然地融入纹理（只模糊水印）
+            alpha_map = alpha_map.filter(ImageFilter.GaussianBlur(radius=self.TEXTURE_BLUR_RADIUS))
+            
+            # 一次混合水印颜色，并在水印覆盖处轻微提高对比度
+            mean = float(self._get_luminance_proxy(image, self.PROXY_MAX_SIDE).mean())
+            return self._blend_texture(image, alpha_map, font_color, mean)
         except Exception as e:
-            print(f"添加纹理水印时出错: {str(e)}")
-            traceback.print_exc()
+            report_error(logger, "添加纹理水印时出错", e)
             return image
     
-    def _process_single_text_watermark(self, image_path, watermark_text, output_path,
-                                      font_size=24, font_color="#000000", font_family="宋体",
-                                      bold=False, italic=False, underline=False,
-                                      position="center", opacity=50, rotation=0,
-                                      flip_horizontal=False, flip_vertical=False,
-                                      scattered_watermark=False, invisible_watermark=False, texture_watermark=False,
-                                      enable_shadow=False, shadow_color="#000000", shadow_offset_x=2, shadow_offset_y=2, shadow_opacity=30):
+    def _get_texture_tile_bank(self, watermark_text, font_size, font_color, font_family, opacity, rotation):
+        """
+        获取纹理水印的纹理块列表（按样式缓存）
+        
+        第一项为未抖动的纹理块（用于计算网格间距），其余为随机轻微旋转（±5度）
+        和缩放（±10%）的变体。抖动由样式决定，同一样式的结果始终相同。
+        """
+        key = (watermark_text, font_size, font_color, font_family, opacity, rotation)
+        tile_bank = self._texture_tile_cache.get(key)
+        if tile_bank is not None:
+            return tile_bank
+        
+        # 创建文字图层
+        font = self._get_font(font_size, font_family, True, False, False)
+        draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+        bbox = draw.textbbox((0, 0), watermark_text, font=font)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        
+        # 创建文字图像（使用更高的分辨率）
+        text_layer = Image.new('RGBA', (text_width + 100, text_height + 100), (0, 0, 0, 0))
+        text_draw = ImageDraw.Draw(text_layer)
+        text_draw.text((50, 50), watermark_text, font=font, fill=font_color)
+        
+        # 旋转文字图层
+        if rotation != 0:
+            text_layer = text_layer.rotate(rotation, expand=True)
+        
+        # 调整透明度（使用更低的透明度实现纹理效果）
+        self._apply_opacity(text_layer, opacity, 200)  # 降低透明度，实现更自然的纹理
+        
+        rng = random.Random(repr(key))
+        tile_bank = [text_layer.getchannel('A')]
+        for _ in range(self.TEXTURE_BANK_SIZE):
+            # 随机轻微旋转每个水印（±5度），增加自然感
+            watermark_tile = text_layer.rotate(rng.uniform(-5, 5), expand=True)
+            
+            # 随机轻微缩放（±10%），增加变化
+            scale_factor = rng.uniform(0.9, 1.1)
+            new_width = int(watermark_tile.width * scale_factor)
+            new_height = int(watermark_tile.height * scale_factor)
+            watermark_tile = watermark_tile.resize((new_width, new_height), Image.LANCZOS)
+            tile_bank.append(watermark_tile.getchannel('A'))
+        
+        if len(self._texture_tile_cache) >= self.SCATTER_CACHE_SIZE:
+            self._texture_tile_cache.clear()
+        self._texture_tile_cache[key] = tile_bank
+        return tile_bank
+    
+    def _screen_alpha(self, alpha_map, tile_alpha, offset):
+        """将纹理块的alpha以screen方式叠加到alpha图上（超出边界的部分裁剪掉）"""
+        x, y = offset
+        left, top = max(0, x), max(0, y)
+        right = min(alpha_map.width, x + tile_alpha.width)
+        bottom = min(alpha_map.height, y + tile_alpha.height)
+        if right <= left or bottom <= top:
+            return
+        box = (left, top, right, bottom)
+        tile_crop = tile_alpha.crop((left - x, top - y, right - x, bottom - y))
+        alpha_map.paste(ImageChops.screen(alpha_map.crop(box), tile_crop), box)
+    
+    def _blend_texture(self, image, alpha_map, font_color, mean):
+        """
+        按alpha图将水印颜色混合到图片上，并在水印覆盖处按alpha加权提高对比度
+        
+        按行分块计算并写回原图（原地修改），不创建整图大小的数组。
+        """
+        color = np.array([int(font_color.lstrip('#')[i:i+2], 16) for i in (0, 2, 4)], dtype=np.float32)
+        contrast = self.TEXTURE_CONTRAST - 1.0
+        
+        for top in range(0, image.height, self.TEXTURE_STRIP_ROWS):
+            box = (0, top, image.width, min(top + self.TEXTURE_STRIP_ROWS, image.height))
+            a = np.asarray(alpha_map.crop(box), dtype=np.float32)[:, :, None] / 255.0
+            pixels = np.asarray(image.crop(box), dtype=np.float32)
+            pixels += a * (color - pixels)
+            pixels += a * contrast * (pixels - mean)
+            np.clip(pixels + 0.5, 0, 255, out=pixels)
+            image.paste(Image.fromarray(pixels.astype(np.uint8), 'RGB'), box[:2])
+        
+        return image
+    
+    def _process_single_text_watermark(self, image_path, output_path, style, encode_profile=None):
         """
         处理单张图片的文字水印
         """
         # 添加水印
         success = self.add_text_watermark(
-            image_path, watermark_text, output_path,
-            font_size, font_color, font_family, bold, italic, underline,
-            position, opacity, rotation,
-            flip_horizontal, flip_vertical, scattered_watermark, invisible_watermark, texture_watermark,
-            enable_shadow, shadow_color, shadow_offset_x, shadow_offset_y, shadow_opacity
+            image_path, output_path=output_path, encode_profile=encode_profile, **style.text_kwargs()
         )
         return (image_path, output_path, success)
     
+    def _transform_text_watermark(self, image, image_path, style):
+        """
+        批量流水线的处理步骤：向已解码的图片原地添加文字水印
+        """
+        kwargs = style.text_kwargs()
+        kwargs["seed"] = self._derive_seed(kwargs["seed"], image_path)
+        return self.add_text_watermark_to_image(image, in_place=True, **kwargs)
+    
     def batch_add_text_watermark(self, image_paths, watermark_text, output_dir,
                                 font_size=24, font_color="#000000", font_family="宋体",
                                 bold=False, italic=False, underline=False,
@@ -550,7 +738,9 @@ class TextWatermarkProcessor(BaseWatermarkProcessor):
                                 flip_horizontal=False, flip_vertical=False, progress_callback=None,
                                 scattered_watermark=False, invisible_watermark=False, texture_watermark=False,
                                 enable_shadow=False, shadow_color="#000000", shadow_offset_x=2, shadow_offset_y=2, shadow_opacity=30,
-                                security_watermark=False, security_key="", security_strength=0.02):
+                                security_watermark=False, security_key="", security_strength=0.02,
+                                encode_profile=None, naming=None, incremental=False, manifest_verify="stat",
+                                seed=DEFAULT_SEED):
         """
         批量添加文字水印（多线程优化版）
         
@@ -570,37 +760,24 @@ class TextWatermarkProcessor(BaseWatermarkProcessor):
             flip_horizontal: 是否水平翻转
             flip_vertical: 是否垂直翻转
             progress_callback: 进度回调函数，接收已完成数量和总数
+            encode_profile: 输出编码配置（fast、balanced、smallest或参数字典），整批共用
+            naming: 输出命名模板（stem、mirror、hash或自定义模板字符串），默认沿用源文件名
+            incremental: 是否增量处理，根据输出目录中的清单跳过源文件和样式均未变化的图片
+            manifest_verify: 增量处理的源文件校验方式，"stat"（大小和修改时间）或 "hash"（内容哈希）
+            seed: 分散和纹理水印的样式种子，每张图片的随机种子由它和文件名派生，重复运行结果相同
         """
-        results = []
-        print(f"开始批量添加文字水印，共处理 {len(image_paths)} 张图片")
-        
-        # 准备参数列表
-        params = []
-        for image_path in image_paths:
-            # 获取输出文件名
-            filename = os.path.basename(image_path)
-            output_path = os.path.join(output_dir, filename)
-            params.append((image_path, watermark_text, output_path, font_size, font_color, font_family, 
-                          bold, italic, underline, position, opacity, rotation, 
-                          flip_horizontal, flip_vertical, scattered_watermark, invisible_watermark, texture_watermark, 
-                          enable_shadow, shadow_color, shadow_offset_x, shadow_offset_y, shadow_opacity))
-        
-        # 使用多线程并行处理
-        with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-            # 提交所有任务
-            futures = [executor.submit(self._process_single_text_watermark, *param) for param in params]
-            
-            # 收集结果
-            completed_count = 0
-            for future in concurrent.futures.as_completed(futures):
-                image_path, output_path, success = future.result()
-                results.append((image_path, output_path, success))
-                completed_count += 1
-                print(f"处理第 {completed_count}/{len(image_paths)} 张图片: {image_path} {'成功' if success else '失败'}")
-                
-                # 调用进度回调
-                if progress_callback:
-                    progress_callback(completed_count, len(image_paths))
-        
-        print(f"批量添加文字水印完成，成功 {sum(1 for _, _, s in results if s)} 张，失败 {sum(1 for _, _, s in results if not s)} 张")
-        return results
\ No newline at end of file
+        style = WatermarkStyle(
+            watermark_type="text",
+            text=TextStyle(text=watermark_text, font_size=font_size, font_color=font_color,
+                           font_family=font_family, bold=bold, italic=italic, underline=underline,
+                           scattered=scattered_watermark, invisible=invisible_watermark, texture=texture_watermark,
+                           seed=seed),
+            shadow=ShadowStyle(enabled=enable_shadow, color=shadow_color, offset_x=shadow_offset_x,
+                               offset_y=shadow_offset_y, opacity=shadow_opacity),
+            security=SecurityStyle(enabled=security_watermark, key=security_key, strength=security_strength),
+            position=position, opacity=opacity, rotation=rotation,
+            flip_horizontal=flip_horizontal, flip_vertical=flip_vertical
+        )
+        return self._batch_with_style("文字", self._process_single_text_watermark, image_paths, output_dir, style,
+                                      progress_callback, encode_profile, naming, incremental, manifest_verify,
+                                      self._transform_text_watermark)
@@ -0,0 +1,459 @@
+"""
+分块处理模块
+超大图片（扫描地图、全景图等）按水平条带读取、混合水印并写出，
+未压缩的源图片逐条带解码，输出为TIFF时逐条带写入，内存占用与图片高度无关
+"""
+
+import os
+import struct
+import logging
+from fractions import Fraction
+from PIL import Image
+from PIL.TiffImagePlugin import IFDRational
+from .base_processor import BaseWatermarkProcessor, EXIF_ORIENTATION
+from .overlay_cache import crop_overlay
+from .events import report_error
+
+
+logger = logging.getLogger(__name__)
+
+# 可以按行直接定位的原始数据格式及每像素字节数
+RAW_BYTES_PER_PIXEL = {"RGB": 3, "BGR": 3, "RGBA": 4, "BGRA": 4, "RGBX": 4, "BGRX": 4, "L": 1}
+
+# 支持逐条带写出的输出扩展名
+STREAMING_EXTENSIONS = (".tif", ".tiff")
+
+# 经典TIFF的文件大小上限，超过时写入BigTIFF
+CLASSIC_TIFF_LIMIT = 2 ** 32 - 1
+
+# 随EXIF写出的子IFD：Exif和GPS
+EXIF_SUB_IFDS = (0x8769, 0x8825)
+
+# EXIF中不写出的指针标签：子IFD（另行写出）、互操作性IFD和SubIFDs，其偏移量只对源文件有效
+EXIF_POINTER_TAGS = (0x8769, 0x8825, 0xA005, 0x014A)
+
+
+class StripTiffWriter:
+    """
+    逐条带写入未压缩RGB或RGBA TIFF
+
+    条带数据按顺序写入文件，关闭时在末尾写入EXIF子IFD和图像IFD，并回写文件头中的IFD偏移；
+    估算大小超过4GB时使用BigTIFF格式。
+    """
+
+    # TIFF字段类型
+    ASCII, SHORT, LONG, RATIONAL, UNDEFINED, SLONG, SRATIONAL, LONG8 = 2, 3, 4, 5, 7, 9, 10, 16
+    TYPE_FORMATS = {SHORT: "H", LONG: "I", SLONG: "i", LONG8: "Q"}
+
+    # 支持的颜色模式及每像素通道数
+    SAMPLES_PER_PIXEL = {"RGB": 3, "RGBA": 4}
+
+    def __init__(self, path, size, rows_per_strip, dpi=None, icc_profile=None, mode="RGB", exif=None):
+        """
+        参数:
+            exif: open_image读取的EXIF字节，其中的IFD0标签和Exif、GPS子IFD写入输出
+        """
+        if mode not in self.SAMPLES_PER_PIXEL:
+            raise ValueError(f"不支持的颜色模式: {mode}")
+        self.path = path
+        self.width, self.height = size
+        self.rows_per_strip = rows_per_strip
+        self.mode = mode
+        self.samples = self.SAMPLES_PER_PIXEL[mode]
+        self.dpi = dpi
+        self.icc_profile = icc_profile
+        self.exif = exif
+        self.strip_offsets = []
+        self.strip_byte_counts = []
+        self.rows_written = 0
+
+        estimated = (self.width * self.height * self.samples + len(icc_profile or b"")
+                     + 2 * len(exif or b"") + 4096)
+        self.bigtiff = estimated > CLASSIC_TIFF_LIMIT
+        self.file = open(path, "wb")
+        if self.bigtiff:
+            self.file.write(b"II+\x00" + struct.pack("<HHQ", 8, 0, 0))
+        else:
+            self.file.write(b"II*\x00" + struct.pack("<I", 0))
+
+    def write(self, strip):
+        """写入一个条带（宽度与输出相同，颜色模式与输出不同时先转换）"""
+        if strip.mode != self.mode:
+            strip = strip.convert(self.mode)
+        data = strip.tobytes()
+        self.strip_offsets.append(self.file.tell())
+        self.strip_byte_counts.append(len(data))
+        self.file.write(data)
+        self.rows_written += strip.height
+
+    def close(self):
+        """写入IFD并关闭文件"""
+        if self.file is None:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"写入了 {self.rows_written} 行，图片高度为 {self.height}")
+            offset_type = self.LONG8 if self.bigtiff else self.LONG
+            entries = [
+                (256, self.LONG, [self.width]),
+                (257, self.LONG, [self.height]),
+                (258, self.SHORT, [8] * self.samples),
+                (259, self.SHORT, [1]),
+                (262, self.SHORT, [2]),
+                (273, offset_type, self.strip_offsets),
+                (277, self.SHORT, [self.samples]),
+                (278, self.LONG, [self.rows_per_strip]),
+                (279, offset_type, self.strip_byte_counts),
+                (284, self.SHORT, [1]),
+            ]
+            if self.mode == "RGBA":
+                # 第四个通道为非预乘的alpha
+                entries.append((338, self.SHORT, [2]))
+            if self.dpi:
+                entries += [
+                    (282, self.RATIONAL, [self._rational(self.dpi[0])]),
+                    (283, self.RATIONAL, [self._rational(self.dpi[1])]),
+                    (296, self.SHORT, [2]),
+                ]
+            if self.icc_profile:
+                entries.append((34675, self.UNDEFINED, self.icc_profile))
+            if self.exif:
+                entries += self._write_exif({tag for tag, _, _ in entries}, offset_type)
+            ifd_offset = self._write_ifd(entries)
+            if self.bigtiff:
+                self.file.seek(8)
+                self.file.write(struct.pack("<Q", ifd_offset))
+            else:
+                self.file.seek(4)
+                self.file.write(struct.pack("<I", ifd_offset))
+        finally:
+            self.file.close()
+            self.file = None
+
+    def abort(self):
+        """关闭并删除未完成的文件"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _rational(self, value):
+        """将DPI转换为分子和分母"""
+        return (int(round(value * 1000)), 1000)
+
+    def _write_exif(self, written_tags, offset_type):
+        """
+        写入EXIF中的Exif和GPS子IFD
+
+        返回:
+            需要加入图像IFD的条目：EXIF中的IFD0标签（written_tags中已有的除外）和子IFD指针
+        """
+        exif = Image.Exif()
+        exif.load(self.exif)
+        entries = []
+        for tag in EXIF_SUB_IFDS:
+            sub_entries = [entry for entry in (self._exif_entry(sub_tag, value)
+                                               for sub_tag, value in exif.get_ifd(tag).items()
+                                               if sub_tag not in EXIF_POINTER_TAGS) if entry]
+            if sub_entries:
+                entries.append((tag, offset_type, [self._write_ifd(sub_entries)]))
+        for tag, value in exif.items():
+            if tag not in written_tags and tag not in EXIF_POINTER_TAGS:
+                entry = self._exif_entry(tag, value)
+                if entry:
+                    entries.append(entry)
+        return entries
+
+    def _exif_entry(self, tag, value):
+        """按值的类型生成IFD条目 (标签, 类型, 值列表)，无法表示的值返回None"""
+        if isinstance(value, str):
+            return (tag, self.ASCII, value.encode("utf-8") + b"\x00")
+        if isinstance(value, bytes):
+            return (tag, self.UNDEFINED, value)
+        values = value if isinstance(value, tuple) else (value,)
+        if not values:
+            return None
+        if all(isinstance(item, int) for item in values):
+            if all(0 <= item <= 0xFFFF for item in values):
+                return (tag, self.SHORT, list(values))
+            if all(0 <= item <= 0xFFFFFFFF for item in values):
+                return (tag, self.LONG, list(values))
+            if all(-2 ** 31 <= item < 2 ** 31 for item in values):
+                return (tag, self.SLONG, list(values))
+            return None
+        if all(isinstance(item, (int, float, IFDRational)) for item in values):
+            rationals = [self._exif_rational(item) for item in values]
+            field_type = self.SRATIONAL if any(numerator < 0 for numerator, _ in rationals) else self.RATIONAL
+            return (tag, field_type, rationals)
+        return None
+
+    def _exif_rational(self, value):
+        """将EXIF中的有理数转换为分子和分母"""
+        if isinstance(value, IFDRational):
+            return (value.numerator, value.denominator)
+        fraction = Fraction(value).limit_denominator(2 ** 31 - 1)
+        return (fraction.numerator, fraction.denominator)
+
+    def _pack_values(self, field_type, values):
+        """将字段值打包为字节"""
+        if field_type in (self.ASCII, self.UNDEFINED):
+            return bytes(values)
+        if field_type in (self.RATIONAL, self.SRATIONAL):
+            fmt = "<II" if field_type == self.RATIONAL else "<ii"
+            return b"".join(struct.pack(fmt, numerator, denominator) for numerator, denominator in values)
+        return struct.pack("<" + self.TYPE_FORMATS[field_type] * len(values), *values)
+
+    def _write_ifd(self, entries):
+        """写入超出条目内联空间的字段值和IFD（条目按标签排序），返回IFD的偏移"""
+        entries = sorted(entries, key=lambda entry: entry[0])
+        inline_size = 8 if self.bigtiff else 4
+        packed_entries = []
+        for tag, field_type, values in entries:
+            data = self._pack_values(field_type, values)
+            if len(data) <= inline_size:
+                value = data.ljust(inline_size, b"\x00")
+            else:
+                # 字段值按字边界对齐后写在IFD之前
+                if self.file.tell() % 2:
+                    self.file.write(b"\x00")
+                value_offset = self.file.tell()
+                self.file.write(data)
+                value = struct.pack("<Q" if self.bigtiff else "<I", value_offset)
+            packed_entries.append((tag, field_type, len(values), value))
+
+        if self.file.tell() % 2:
+            self.file.write(b"\x00")
+        ifd_offset = self.file.tell()
+        if self.bigtiff:
+            self.file.write(struct.pack("<Q", len(packed_entries)))
+            for tag, field_type, count, value in packed_entries:
+                self.file.write(struct.pack("<HHQ", tag, field_type, count) + value)
+            self.file.write(struct.pack("<Q", 0))
+        else:
+            self.file.write(struct.pack("<H", len(packed_entries)))
+            for tag, field_type, count, value in packed_entries:
+                self.file.write(struct.pack("<HHI", tag, field_type, count) + value)
+            self.file.write(struct.pack("<I", 0))
+        return ifd_offset
+
+
+class _RawStripReader:
+    """按行范围直接读取未压缩图片数据，每次只解码一个条带"""
+
+    def __init__(self, image_path, image):
+        self.image_path = image_path
+        self.reference = image
+        self.size = image.size
+        self.mode = image.mode
+        self.tiles = []
+        for tile in image.tile:
+            args = (tile.args, 0, 1) if isinstance(tile.args, str) else tuple(tile.args)
+            rawmode, stride, ystep = args[:3]
+            x0, y0, x1, y1 = tile.extents
+            row_bytes = stride or (x1 - x0) * RAW_BYTES_PER_PIXEL[rawmode]
+            self.tiles.append((tile, rawmode, row_bytes, ystep))
+
+    @classmethod
+    def supports(cls, image):
+        """判断图片能否按行直接读取：所有数据块均为未压缩的原始数据"""
+        if image.mode not in ("RGB", "RGBA", "L") or not image.tile:
+            return False
+        for tile in image.tile:
+            if tile.codec_name != "raw":
+                return False
+            args = (tile.args, 0, 1) if isinstance(tile.args, str) else tuple(tile.args)
+            if len(args) < 3 or args[0] not in RAW_BYTES_PER_PIXEL or args[2] not in (1, -1):
+                return False
+        return True
+
+    def read(self, top, bottom, mode="RGB"):
+        """读取 [top, bottom) 行，返回mode模式的图片"""
+        tiles = []
+        for tile, rawmode, row_bytes, ystep in self.tiles:
+            x0, y0, x1, y1 = tile.extents
+            start, end = max(top, y0), min(bottom, y1)
+            if start >= end:
+                continue
+            # 自下而上存储的数据（BMP、TGA）从数据块末尾开始计算偏移
+            skipped_rows = start - y0 if ystep == 1 else y1 - end
+            tiles.append(tile._replace(extents=(x0, start - top, x1, end - top),
+                                       offset=tile.offset + skipped_rows * row_bytes,
+                                       args=(rawmode, row_bytes, ystep)))
+
+        with Image.open(self.image_path) as strip:
+            # 只解码条带范围内的数据块：缩小图片尺寸并替换数据块列表
+            strip_size = (self.size[0], bottom - top)
+            strip._size = strip_size
+            if hasattr(strip, "_tile_size"):
+                strip._tile_size = strip_size
+            strip.tile = tiles
+            strip.load()
+            return strip.convert(mode)
+
+
+class _DecodedStripReader:
+    """压缩格式无法按行解码，先完整解码（应用EXIF方向）后按条带裁剪"""
+
+    def __init__(self, image):
+        self.reference = image
+        self.size = image.size
+        self.mode = image.mode
+
+    def read(self, top, bottom, mode="RGB"):
+        """读取 [top, bottom) 行，返回mode模式的图片"""
+        return self.reference.crop((0, top, self.size[0], bottom)).convert(mode)
+
+
+class TiledWatermarkProcessor(BaseWatermarkProcessor):
+    """超大图片的分块水印处理器"""
+
+    # 每个条带的行数
+    TILED_STRIP_HEIGHT = 512
+
+    # 批量处理中像素数达到该值的图片改用分块处理
+    TILED_PIXEL_THRESHOLD = 100_000_000
+
+    def supports_tiled(self, style):
+        """
+        判断样式能否分块处理
+
+        分块处理时每个条带独立混合，依赖整图内容的水印（智能放置、分散、隐形、纹理和DCT安全水印）不支持。
+        """
+        if style.position == "smart" or style.security.enabled:
+            return False
+        if style.watermark_type == "logo":
+            return bool(style.logo.path)
+        text = style.text
+        return bool(text.text) and not (text.scattered or text.invisible or text.texture)
+
+    def add_tiled_watermark(self, image_path, style, output_path, encode_profile=None,
+                            strip_height=None):
+        """
+        按条带向超大图片添加水印
+
+        未压缩的TIFF、BMP、PPM等源图片逐条带解码；输出为TIFF时逐条带写入未压缩TIFF（超过4GB时为BigTIFF），
+        此时内存占用只与图片宽度和条带行数有关。压缩格式的源图片需要先完整解码，
+        其他输出格式需要先拼接整图再编码，但都不再创建整图大小的RGBA副本和覆盖层。
+        工作模式与常规流程相同：文字水印为RGB，Logo水印保留源图片的透明通道；
+        输出同样先写入临时文件再原子重命名，并保留源图片的EXIF、DPI和ICC配置文件。
+
+        参数:
+            image_path: 原始图片路径
+            style: WatermarkStyle对象，需满足supports_tiled
+            output_path: 输出图片路径
+            encode_profile: 输出格式不是TIFF时使用的编码配置
+            strip_height: 每个条带的行数，默认为TILED_STRIP_HEIGHT
+
+        返回:
+            bool: 是否成功添加水印
+        """
+        strip_height = strip_height or self.TILED_STRIP_HEIGHT
+        reader = writer = None
+        try:
+            if not self.supports_tiled(style):
+                raise ValueError("分块处理不支持智能放置、分散、隐形、纹理和安全水印")
+
+            reader, metadata = self._open_strip_reader(image_path)
+            width, height = reader.size
+            mode = self._get_tiled_mode(style, reader.mode)
+            placements = self._get_style_placements(reader.reference, style)
+
+            streaming = os.path.splitext(output_path)[1].lower() in STREAMING_EXTENSIONS
+            if streaming:
+                # 与_save_image相同，先写入临时文件，完成后原子重命名；色彩空间已改变时不写入源ICC配置文件
+                icc_profile = metadata.get("icc_profile")
+                if icc_profile and not self._icc_profile_matches(icc_profile, mode):
+                    icc_profile = None
+                writer = StripTiffWriter(self._get_temp_output_path(output_path), reader.size, strip_height,
+                                         metadata.get("dpi"), icc_profile, mode, metadata.get("exif"))
+            else:
+                result = Image.new(mode, reader.size)
+
+            for top in range(0, height, strip_height):
+                bottom = min(top + strip_height, height)
+                with self._stage("decode"):
+                    strip = reader.read(top, bottom, mode)
+
+                if placements:
+                    with self._stage("render"):
+                        canvas = Image.new("RGBA", strip.size, (0, 0, 0, 0))
+                        self._paste_placements(canvas, placements, (0, top))
+                        entry = crop_overlay(canvas)
+                    with self._stage("composite"):
+                        self._paste_overlay(strip, entry)
+
+                if streaming:
+                    with self._stage("encode") as stage:
+                        writer.write(strip)
+                        stage.add_bytes(strip.width * strip.height * writer.samples)
+                else:
+                    result.paste(strip, (0, top))
+
+            if streaming:
+                writer.close()
+                self._replace_output(writer.path, output_path)
+                return True
+            return self._save_image(result, output_path, encode_profile, metadata)
+        except Exception as e:
+            if writer is not None:
+                writer.abort()
+            report_error(logger, "分块添加水印时出错", e)
+            return False
+        finally:
+            if reader is not None:
+                reader.reference.close()
+    
+    def should_tile(self, image_path, style):
+        """判断批量处理中的图片是否应改用分块处理：样式支持且像素数达到TILED_PIXEL_THRESHOLD"""
+        if not self.supports_tiled(style):
+            return False
+        try:
+            width, height = self.probe_image(image_path).size
+        except Exception:
+            # 无法读取文件头时交给常规流程报告错误
+            return False
+        return width * height >= self.TILED_PIXEL_THRESHOLD
+
+    def _get_tiled_mode(self, style, source_mode):
+        """分块处理的工作模式，与常规流程一致：Logo水印时RGB和RGBA保持原模式，其他模式转换为RGBA；文字水印为RGB"""
+        if style.watermark_type == "logo" and source_mode != "RGB":
+            return "RGBA"
+        return "RGB"
+
+    def _requires_whole_task(self, probe):
+        """达到分块阈值的图片整张交给处理函数，由其改用分块处理"""
+        return probe.size[0] * probe.size[1] >= self.TILED_PIXEL_THRESHOLD
+
+    def _open_strip_reader(self, image_path):
+        """
+        打开条带读取器
+
+        返回:
+            (读取器, 元数据)，元数据格式与open_image相同
+        """
+        image = Image.open(image_path)
+        exif = image.getexif()
+        if exif.get(EXIF_ORIENTATION, 1) == 1 and _RawStripReader.supports(image):
+            metadata = {
+                "format": image.format,
+                "icc_profile": image.info.get("icc_profile"),
+                "dpi": image.info.get("dpi"),
+                "exif": self._get_exif_bytes(exif, image.format),
+            }
+            return _RawStripReader(image_path, image), metadata
+
+        image.close()
+        logger.info("%s 无法按行解码，先完整解码后分块处理", image_path)
+        image, metadata = self.open_image(image_path, use_cache=False)
+        return _DecodedStripReader(image), metadata
+
+    def _get_style_placements(self, image, style):
+        """计算样式中各图层在整图上的粘贴位置，image只用于提供尺寸"""
+        if style.watermark_type == "logo":
+            return self._get_logo_placements(image, **style.logo_kwargs()) or []
+        kwargs = style.text_kwargs()
+        for name in ("scattered_watermark", "invisible_watermark", "texture_watermark", "seed"):
+            kwargs.pop(name)
+        with self._stage("render"):
+            return self._get_text_placements(image, **kwargs)
@@ -3,12 +3,21 @@
 整合文字水印、Logo水印和安全水印功能，保持向后兼容性
 """
 
+import logging
 from .text_watermark import TextWatermarkProcessor
 from .logo_watermark import LogoWatermarkProcessor
 from .security_watermark import SecurityWatermarkProcessor
+from .tiled_processing import TiledWatermarkProcessor
+from .overlay_cache import crop_overlay
+from .mapped_io import close_mapping
+from .events import report_error
 
 
-class WatermarkProcessor(TextWatermarkProcessor, LogoWatermarkProcessor, SecurityWatermarkProcessor):
+logger = logging.getLogger(__name__)
+
+
+class WatermarkProcessor(TextWatermarkProcessor, LogoWatermarkProcessor, SecurityWatermarkProcessor,
+                         TiledWatermarkProcessor):
     """
     水印处理器类，负责添加文字水印和Logo水印
     继承自各个功能模块，提供统一的接口
@@ -18,4 +27,184 @@ class WatermarkProcessor(TextWatermarkProcessor, LogoWatermarkProcessor, Securit
         # 调用各个父类的初始化方法
         TextWatermarkProcessor.__init__(self)
         LogoWatermarkProcessor.__init__(self)
-        SecurityWatermarkProcessor.__init__(self)
\ No newline at end of file
+        SecurityWatermarkProcessor.__init__(self)
+    
+    def apply_style(self, image, style):
+        """
+        按WatermarkStyle向Image对象添加水印
+        
+        参数:
+            image: PIL Image对象
+            style: WatermarkStyle对象，根据watermark_type选择文字或Logo水印
+        """
+        if style.watermark_type == "logo":
+            return self.add_logo_watermark_to_image(image, **style.logo_kwargs())
+        return self.add_text_watermark_to_image(image, **style.text_kwargs())
+    
+    def batch_apply_style(self, image_paths, style, output_dir, progress_callback=None,
+                          encode_profile=None, naming=None, incremental=False, manifest_verify="stat"):
+        """
+        按WatermarkStyle批量添加水印，参数含义与batch_add_text_watermark相同
+        """
+        if style.watermark_type == "logo":
+            return self._batch_with_style("Logo", self._process_single_logo_watermark, image_paths, output_dir,
+                                          style, progress_callback, encode_profile, naming,
+                                          incremental, manifest_verify, self._transform_logo_watermark)
+        return self._batch_with_style("文字", self._process_single_text_watermark, image_paths, output_dir,
+                                      style, progress_callback, encode_profile, naming,
+                                      incremental, manifest_verify, self._transform_text_watermark)
+    
+    def _process_single_text_watermark(self, image_path, output_path, style, encode_profile=None):
+        """
+        处理单张图片的文字水印，超大图片改用分块处理
+        """
+        if self.should_tile(image_path, style):
+            success = self.add_tiled_watermark(image_path, style, output_path, encode_profile)
+            return (image_path, output_path, success)
+        return super()._process_single_text_watermark(image_path, output_path, style, encode_profile)
+    
+    def _process_single_logo_watermark(self, image_path, output_path, style, encode_profile=None):
+        """
+        处理单张图片的Logo水印，超大图片改用分块处理
+        """
+        if self.should_tile(image_path, style):
+            success = self.add_tiled_watermark(image_path, style, output_path, encode_profile)
+            return (image_path, output_path, success)
+        return super()._process_single_logo_watermark(image_path, output_path, style, encode_profile)
+    
+    def apply_layers(self, image, layers, image_path=None, in_place=False):
+        """
+        按顺序将多个水印图层合成到Image对象上
+        
+        普通文字和Logo图层先合成到同一个覆盖层（固定位置时按样式指纹和图片尺寸缓存），
+        再与原图混合一次；
+        分散、隐形和纹理文字直接作用于图片，处理前先混合已累积的覆盖层；
+        启用了安全水印的图层在所有可见水印之后嵌入DCT水印。
+        
+        参数:
+            image: PIL Image对象
+            layers: WatermarkStyle对象列表，靠后的图层绘制在上方
+            image_path: 图片路径，提供时分散和纹理图层的随机种子由样式种子和文件名派生
+            in_place: 图片已是RGB模式时直接在原图上混合，调用方不再需要原图时使用
+        """
+        try:
+            # 整个合成过程只转换或复制一次，之后各图层都原地混合
+            with self._stage("convert"):
+                result = self._get_working_image(image, 'RGB', in_place)
+            overlay_layers = []
+            
+            for style in layers:
+                text = style.text
+                if style.watermark_type == "text" and (text.scattered or text.invisible or text.texture):
+                    result = self._apply_overlay_layers(result, overlay_layers)
+                    overlay_layers = []
+                    kwargs = style.text_kwargs()
+                    if image_path is not None:
+                        kwargs["seed"] = self._derive_seed(kwargs["seed"], image_path)
+                    result = self.add_text_watermark_to_image(result, in_place=True, **kwargs)
+                else:
+                    overlay_layers.append(style)
+            
+            result = self._apply_overlay_layers(result, overlay_layers)
+            
+            # DCT安全水印必须最后嵌入，之后的混合会破坏频域系数
+            for style in layers:
+                if style.security.enabled and style.text.text:
+                    with self._stage("dct"):
+                        result = self.embed_security_watermark(result, style.text.text, style.security.key,
+                                                               style.security.strength)
+            return result
+        except Exception as e:
+            report_error(logger, "合成多图层水印时出错", e)
+            return image
+    
+    def _apply_overlay_layers(self, image, layers):
+        """将一组普通文字和Logo图层合成为一个覆盖层并原地混合到图片上"""
+        if not layers:
+            return image
+        
+        render = lambda: self._render_layers_overlay(image, layers)
+        with self._stage("render"):
+            if any(style.position == "smart" for style in layers):
+                # 智能放置的位置取决于图片内容，不使用缓存
+                overlay = render()
+                entry = crop_overlay(overlay) if overlay is not None else None
+            else:
+                key = ("layers", tuple(style.fingerprint for style in layers),
+                       tuple(self._get_file_signature(style.logo.path)
+                             for style in layers if style.watermark_type == "logo"),
+                       image.size)
+                entry = self.overlay_cache.get_or_render(key, render)
+        with self._stage("composite"):
+            return self._paste_overlay(image, entry)
+    
+    def _render_layers_overlay(self, image, layers):
+        """按顺序渲染各图层并合成为一个整图大小的覆盖层，没有可用图层时返回None"""
+        overlay = None
+        for style in layers:
+            if style.watermark_type == "logo":
+                layer = self._render_logo_overlay(image, **style.logo_kwargs())
+            else:
+                kwargs = style.text_kwargs()
+                for name in ("scattered_watermark", "invisible_watermark", "texture_watermark", "seed"):
+                    kwargs.pop(name)
+                layer = self._render_text_overlay(image, **kwargs)
+            
+            if layer is None:
+                continue
+            if overlay is None:
+                overlay = layer
+            else:
+                overlay.alpha_composite(layer)
+        return overlay
+    
+    def add_layered_watermark(self, image_path, layers, output_path, encode_profile=None):
+        """
+        向图片添加多图层水印，每张图片只解码和编码一次
+        
+        参数:
+            image_path: 原始图片路径
+            layers: WatermarkStyle对象列表
+            output_path: 输出图片路径
+            encode_profile: 输出编码配置（fast、balanced、smallest或参数字典）
+            
+        返回:
+            bool: 是否成功添加水印
+        """
+        try:
+            # 打开原始图片（应用EXIF方向并读取元数据）
+            image, metadata = self.open_image(image_path, output_path=output_path)
+            watermarked_image = self.apply_layers(image, layers, image_path, in_place=True)
+            try:
+                return self._save_image(watermarked_image, output_path, encode_profile, metadata)
+            finally:
+                # 保存完成后立即关闭源文件的内存映射
+                close_mapping(image)
+        except Exception as e:
+            report_error(logger, "添加多图层水印时出错", e)
+            return False
+    
+    def _process_single_layered_watermark(self, image_path, output_path, layers, encode_profile=None):
+        """
+        处理单张图片的多图层水印
+        """
+        success = self.add_layered_watermark(image_path, layers, output_path, encode_profile)
+        return (image_path, output_path, success)
+    
+    def _transform_layered_watermark(self, image, image_path, layers):
+        """
+        批量流水线的处理步骤：向已解码的图片原地合成多图层水印
+        """
+        return self.apply_layers(image, layers, image_path, in_place=True)
+    
+    def batch_apply_layers(self, image_paths, layers, output_dir, progress_callback=None,
+                           encode_profile=None, naming=None, incremental=False, manifest_verify="stat"):
+        """
+        批量添加多图层水印，参数含义与batch_add_text_watermark相同
+        
+        参数:
+            layers: WatermarkStyle对象列表，整批共用
+        """
+        return self._batch_with_style("多图层", self._process_single_layered_watermark, image_paths, output_dir,
+                                      tuple(layers), progress_callback, encode_profile, naming,
+                                      incremental, manifest_verify, self._transform_layered_watermark)
@@ -0,0 +1,298 @@
+"""
+水印样式模块
+用不可变的样式对象统一描述文字、Logo、阴影和安全水印参数，
+可作为缓存键、传递给批量任务，并与样式JSON文件互相转换
+"""
+
+import json
+import hashlib
+
+
+def _freeze(value):
+    """将列表转换为元组，保证样式对象可哈希"""
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _restore(cls, values):
+    """按字段顺序重建样式对象（供pickle使用）"""
+    obj = object.__new__(cls)
+    for (name, _), value in zip(cls.FIELDS, values):
+        object.__setattr__(obj, name, value)
+    return obj
+
+
+class _StyleConfig:
+    """
+    不可变样式配置基类
+
+    子类在FIELDS中按顺序声明 (字段名, 默认值)，并在__slots__中列出相同的字段。
+    """
+
+    __slots__ = ()
+    FIELDS = ()
+
+    def __init__(self, **values):
+        field_names = {name for name, _ in self.FIELDS}
+        unknown = set(values) - field_names
+        if unknown:
+            raise TypeError(f"未知的样式字段: {', '.join(sorted(unknown))}")
+        for name, default in self.FIELDS:
+            object.__setattr__(self, name, _freeze(values.get(name, default)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} 是不可变对象，请使用replace创建新样式")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} 是不可变对象")
+
+    def _values(self):
+        """按字段顺序返回所有字段值"""
+        return tuple(getattr(self, name) for name, _ in self.FIELDS)
+
+    def replace(self, **changes):
+        """返回替换了指定字段的新样式对象"""
+        values = {name: getattr(self, name) for name, _ in self.FIELDS}
+        values.update(changes)
+        return type(self)(**values)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self._values() == other._values()
+
+    def __hash__(self):
+        return hash((type(self).__name__,) + self._values())
+
+    def __reduce__(self):
+        return (_restore, (type(self), self._values()))
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name, _ in self.FIELDS)
+        return f"{type(self).__name__}({fields})"
+
+
+class TextStyle(_StyleConfig):
+    """文字水印样式"""
+
+    __slots__ = ("text", "font_size", "font_color", "font_family", "bold", "italic", "underline",
+                 "scattered", "invisible", "texture", "seed")
+    FIELDS = (
+        ("text", ""),
+        ("font_size", 24),
+        ("font_color", "#000000"),
+        ("font_family", "宋体"),
+        ("bold", False),
+        ("italic", False),
+        ("underline", False),
+        ("scattered", False),
+        ("invisible", False),
+        ("texture", False),
+        ("seed", 0),
+    )
+
+
+class LogoStyle(_StyleConfig):
+    """Logo水印样式"""
+
+    __slots__ = ("path", "size", "recolor_color")
+    FIELDS = (
+        ("path", ""),
+        ("size", 100),
+        ("recolor_color", None),
+    )
+
+
+class ShadowStyle(_StyleConfig):
+    """文字阴影样式"""
+
+    __slots__ = ("enabled", "color", "offset_x", "offset_y", "opacity")
+    FIELDS = (
+        ("enabled", False),
+        ("color", "#000000"),
+        ("offset_x", 2),
+        ("offset_y", 2),
+        ("opacity", 30),
+    )
+
+
+class SecurityStyle(_StyleConfig):
+    """DCT安全水印样式"""
+
+    __slots__ = ("enabled", "key", "strength")
+    FIELDS = (
+        ("enabled", False),
+        ("key", ""),
+        ("strength", 0.02),
+    )
+
+
+class WatermarkStyle(_StyleConfig):
+    """
+    完整的水印样式
+
+    样式对象不可变且可哈希，fingerprint在不同进程和不同运行之间保持稳定，
+    可用于缓存和增量处理。to_dict/from_dict使用与样式JSON文件相同的扁平格式，
+    其中不包含安全水印密钥。
+    """
+
+    __slots__ = ("watermark_type", "text", "logo", "shadow", "security",
+                 "position", "opacity", "rotation", "flip_horizontal", "flip_vertical",
+                 "_fingerprint")
+    FIELDS = (
+        ("watermark_type", "text"),
+        ("text", TextStyle()),
+        ("logo", LogoStyle()),
+        ("shadow", ShadowStyle()),
+        ("security", SecurityStyle()),
+        ("position", "center"),
+        ("opacity", 50),
+        ("rotation", 0),
+        ("flip_horizontal", False),
+        ("flip_vertical", False),
+    )
+
+    @property
+    def fingerprint(self):
+        """样式的稳定指纹（规范化JSON的SHA-256），首次访问后缓存；安全水印密钥以其哈希参与计算"""
+        try:
+            return self._fingerprint
+        except AttributeError:
+            data = self.to_dict()
+            data["security_key_sha256"] = hashlib.sha256(self.security.key.encode("utf-8")).hexdigest()
+            payload = json.dumps(data, sort_keys=True, ensure_ascii=False)
+            fingerprint = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+            object.__setattr__(self, "_fingerprint", fingerprint)
+            return fingerprint
+
+    def text_kwargs(self):
+        """转换为add_text_watermark_to_image的关键字参数"""
+        text, shadow = self.text, self.shadow
+        return {
+            "watermark_text": text.text,
+            "font_size": text.font_size,
+            "font_color": text.font_color,
+            "font_family": text.font_family,
+            "bold": text.bold,
+            "italic": text.italic,
+            "underline": text.underline,
+            "position": self.position,
+            "opacity": self.opacity,
+            "rotation": self.rotation,
+            "flip_horizontal": self.flip_horizontal,
+            "flip_vertical": self.flip_vertical,
+            "scattered_watermark": text.scattered,
+            "invisible_watermark": text.invisible,
+            "texture_watermark": text.texture,
+            "enable_shadow": shadow.enabled,
+            "shadow_color": shadow.color,
+            "shadow_offset_x": shadow.offset_x,
+            "shadow_offset_y": shadow.offset_y,
+            "shadow_opacity": shadow.opacity,
+            "seed": text.seed,
+        }
+
+    def logo_kwargs(self):
+        """转换为add_logo_watermark_to_image的关键字参数"""
+        return {
+            "logo_path": self.logo.path,
+            "logo_size": self.logo.size,
+            "position": self.position,
+            "opacity": self.opacity,
+            "rotation": self.rotation,
+            "flip_horizontal": self.flip_horizontal,
+            "flip_vertical": self.flip_vertical,
+            "recolor_color": self.logo.recolor_color,
+        }
+
+    def to_dict(self):
+        """转换为样式JSON文件使用的扁平字典，安全水印密钥不写入"""
+        text, logo, shadow, security = self.text, self.logo, self.shadow, self.security
+        font_style = " ".join(name for name, enabled in
+                              (("bold", text.bold), ("italic", text.italic), ("underline", text.underline))
+                              if enabled) or "normal"
+        return {
+            "watermark_type": self.watermark_type,
+            "text": text.text,
+            "font_size": text.font_size,
+            "font_color": text.font_color,
+            "font_family": text.font_family,
+            "font_style": font_style,
+            "position": list(self.position) if isinstance(self.position, tuple) else self.position,
+            "opacity": self.opacity,
+            "rotation": self.rotation,
+            "flip_horizontal": self.flip_horizontal,
+            "flip_vertical": self.flip_vertical,
+            "scattered_watermark": text.scattered,
+            "invisible_watermark": text.invisible,
+            "texture_watermark": text.texture,
+            "seed": text.seed,
+            "logo_path": logo.path,
+            "logo_size": logo.size,
+            "logo_recolor_color": logo.recolor_color,
+            "enable_shadow": shadow.enabled,
+            "shadow_color": shadow.color,
+            "shadow_offset_x": shadow.offset_x,
+            "shadow_offset_y": shadow.offset_y,
+            "shadow_opacity": shadow.opacity,
+            "security_watermark": security.enabled,
+            "security_strength": security.strength,
+        }
+
+    @classmethod
+    def from_dict(cls, data, security_key=None):
+        """
+        从样式JSON字典创建样式对象，缺少的字段使用默认值，兼容旧版样式文件
+
+        参数:
+            security_key: 样式文件中没有安全水印密钥时使用的密钥，通常为界面中输入的密钥
+        """
+        defaults = cls()
+        text, logo, shadow, security = defaults.text, defaults.logo, defaults.shadow, defaults.security
+        font_style = data.get("font_style", "normal") or "normal"
+        return cls(
+            watermark_type=data.get("watermark_type", defaults.watermark_type),
+            text=TextStyle(
+                text=data.get("text", text.text),
+                font_size=data.get("font_size", text.font_size),
+                font_color=data.get("font_color", text.font_color),
+                font_family=data.get("font_family", text.font_family),
+                bold="bold" in font_style,
+                italic="italic" in font_style,
+                underline="underline" in font_style,
+                scattered=data.get("scattered_watermark", text.scattered),
+                invisible=data.get("invisible_watermark", text.invisible),
+                texture=data.get("texture_watermark", text.texture),
+                seed=data.get("seed", text.seed),
+            ),
+            logo=LogoStyle(
+                path=data.get("logo_path") or logo.path,
+                size=data.get("logo_size", logo.size),
+                recolor_color=data.get("logo_recolor_color", logo.recolor_color),
+            ),
+            shadow=ShadowStyle(
+                enabled=data.get("enable_shadow", shadow.enabled),
+                color=data.get("shadow_color", shadow.color),
+                offset_x=data.get("shadow_offset_x", shadow.offset_x),
+                offset_y=data.get("shadow_offset_y", shadow.offset_y),
+                opacity=data.get("shadow_opacity", shadow.opacity),
+            ),
+            security=SecurityStyle(
+                enabled=data.get("security_watermark", security.enabled),
+                key=data.get("security_key", security.key if security_key is None else security_key),
+                strength=data.get("security_strength", security.strength),
+            ),
+            position=data.get("position", defaults.position),
+            opacity=data.get("opacity", defaults.opacity),
+            rotation=data.get("rotation", defaults.rotation),
+            flip_horizontal=data.get("flip_horizontal", defaults.flip_horizontal),
+            flip_vertical=data.get("flip_vertical", defaults.flip_vertical),
+        )
+
+    def to_json(self, indent=4):
+        """转换为样式JSON字符串"""
+        return json.dumps(self.to_dict(), indent=indent, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, payload, security_key=None):
+        """从样式JSON字符串创建样式对象，security_key含义同from_dict"""
+        return cls.from_dict(json.loads(payload), security_key)